@@ -0,0 +1,196 @@
+"""
+Persistent cache of encoded driver videos.
+Entries are content-addressed by the video's SHA-256 and hold the base64 data
+URI fragment plus the remote upload reference, so repeat runs and parallel
+processes skip re-reading and re-encoding the driver video. Entries whose
+content no longer belongs to any indexed video are pruned. Index and metadata
+updates and pruning hold a lock file, so processes sharing the cache never
+lose each other's updates.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+from path_utils import path_manager
+
+logger = logging.getLogger(__name__)
+
+
+def _write_atomic(path: Path, data: bytes):
+    """Write a file so concurrent readers never see a partial version."""
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class DriverVideoCache:
+    """Content-addressed on-disk cache of encoded driver videos."""
+
+    HASH_CHUNK_SIZE = 1024 * 1024
+    ENCODE_CHUNK_SIZE = 3 * 256 * 1024  # Multiple of 3 so base64 chunks concatenate cleanly
+    LOCK_TIMEOUT = 30  # Seconds to wait for another process's lock file
+    LOCK_STALE_SECONDS = 120  # A lock file this old was left by a crashed process
+
+    def __init__(self, cache_dir: Optional[Path] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Cache directory (defaults to <project>/cache/driver_videos)
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else path_manager.project_dir / "cache" / "driver_videos"
+        self.index_path = self.cache_dir / "index.json"
+        self.lock_path = self.cache_dir / "index.lock"
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self):
+        """
+        Hold the cache lock across threads and processes
+
+        Threads serialize on an in-process lock; processes on a lock file
+        created with O_CREAT | O_EXCL. A lock file older than
+        LOCK_STALE_SECONDS is taken over, and after LOCK_TIMEOUT the update
+        goes ahead unlocked rather than stalling generation.
+        """
+        with self._lock:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            deadline = time.monotonic() + self.LOCK_TIMEOUT
+            acquired = False
+            while not acquired:
+                try:
+                    os.close(os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                    acquired = True
+                except FileExistsError:
+                    try:
+                        if time.time() - self.lock_path.stat().st_mtime > self.LOCK_STALE_SECONDS:
+                            self.lock_path.unlink()
+                            continue
+                    except OSError:
+                        continue  # Released meanwhile
+                    if time.monotonic() >= deadline:
+                        logger.warning(f"Driver video cache lock {self.lock_path} still held, continuing without it")
+                        break
+                    time.sleep(0.05)
+            try:
+                yield
+            finally:
+                if acquired:
+                    try:
+                        self.lock_path.unlink()
+                    except OSError:
+                        pass
+
+    def _read_json(self, path: Path) -> Dict:
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def content_hash(self, video_path: str) -> str:
+        """
+        SHA-256 of the video file.
+
+        The hash is remembered per path and reused while the file's size and
+        mtime are unchanged, so an unchanged driver video is never re-read.
+        """
+        path = Path(video_path).resolve()
+        stat = path.stat()
+        key = str(path)
+
+        # No lock needed to read: index.json is only ever replaced atomically
+        entry = self._read_json(self.index_path).get(key)
+        if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+            return entry["sha256"]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        sha256 = digest.hexdigest()
+
+        with self._locked():
+            index = self._read_json(self.index_path)
+            previous = index.get(key, {}).get("sha256")
+            index[key] = {"sha256": sha256, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            _write_atomic(self.index_path, json.dumps(index, indent=2).encode('utf-8'))
+            if previous and previous != sha256:
+                self._prune(index)  # The video changed; its old encoding is orphaned
+        return sha256
+
+    def _prune(self, index: Optional[Dict] = None):
+        """Delete fragments and metadata of content no indexed video has any more (caller holds _locked())."""
+        if index is None:
+            index = self._read_json(self.index_path)
+        live = {entry.get("sha256") for entry in index.values()}
+        for path in list(self.cache_dir.glob("*.b64")) + list(self.cache_dir.glob("*.json")):
+            if path == self.index_path or path.stem in live:
+                continue
+            try:
+                path.unlink()
+                logger.info(f"Pruned stale driver video cache entry {path.name[:12]}")
+            except OSError:
+                pass
+
+    def fragment_path(self, video_path: str, mime_type: str) -> Path:
+        """
+        Path of the cached 'data:<mime>;base64,...' fragment, encoding it on a miss.
+
+        The file is written with streaming base64 so the raw video is never
+        fully held in memory.
+        """
+        sha256 = self.content_hash(video_path)
+        fragment = self.cache_dir / f"{sha256}.b64"
+        if fragment.exists():
+            logger.info(f"Driver video cache hit: {Path(video_path).name} ({sha256[:12]})")
+            return fragment
+
+        logger.info(f"Driver video cache miss, encoding: {Path(video_path).name} ({sha256[:12]})")
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = fragment.with_name(f"{fragment.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(video_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            dst.write(f"data:{mime_type};base64,".encode('ascii'))
+            for chunk in iter(lambda: src.read(self.ENCODE_CHUNK_SIZE), b''):
+                dst.write(base64.b64encode(chunk))
+        os.replace(tmp_path, fragment)
+        return fragment
+
+    def _meta_path(self, video_path: str) -> Path:
+        return self.cache_dir / f"{self.content_hash(video_path)}.json"
+
+    def get_reference(self, video_path: str, api_base_url: str) -> Optional[Dict]:
+        """Unexpired upload reference for this video on this API, if one was stored."""
+        reference = self._read_json(self._meta_path(video_path)).get("reference")
+        if not reference or reference.get("api") != api_base_url:
+            return None
+        if reference.get("expires_at", 0) <= time.time():
+            return None
+        return reference
+
+    def store_reference(self, video_path: str, api_base_url: str, uri: str, expires_at: float):
+        """Remember where this video was uploaded so later runs can reuse it."""
+        meta_path = self._meta_path(video_path)
+        with self._locked():
+            meta = self._read_json(meta_path)
+            meta["reference"] = {"uri": uri, "api": api_base_url, "expires_at": expires_at}
+            _write_atomic(meta_path, json.dumps(meta, indent=2).encode('utf-8'))
+            self._prune()
+
+    def clear_reference(self, video_path: str):
+        """Drop a stored upload reference (e.g. after the API rejected it)."""
+        meta_path = self._meta_path(video_path)
+        with self._locked():
+            meta = self._read_json(meta_path)
+            if meta.pop("reference", None) is not None:
+                _write_atomic(meta_path, json.dumps(meta, indent=2).encode('utf-8'))
+            self._prune()
@@ -0,0 +1,254 @@
+"""
+Columnar manifest of scanned image files.
+A dry run over an archive can list millions of files, so instead of a dict
+per file the manifest keeps one interned table of folders and parallel
+arrays: folder index, size, mtime and matched pattern per file, with every
+file name packed into a single byte buffer. A row costs 21 bytes plus
+its UTF-8 name, and sorting, grouping and totals run as passes over the
+columns rather than over per-file objects. Reports page through row indexes
+and exports stream one row at a time, so nothing is materialized in bulk.
+"""
+
+import csv
+import heapq
+import json
+import os
+from array import array
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+# Pattern column value for files that matched no include pattern
+NO_MATCH = 0xFF
+
+# Columns written by FileManifest.export, in order
+EXPORT_FIELDS = ('path', 'folder', 'name', 'size', 'mtime', 'pattern')
+
+
+class FolderStats(NamedTuple):
+    """Per-folder totals over a selection of rows."""
+    folder: str
+    files: int
+    size: int
+
+
+class FileRow(NamedTuple):
+    """One manifest row, materialized on demand."""
+    folder: str
+    name: str
+    size: int
+    mtime: int
+    pattern: Optional[str]
+
+    @property
+    def path(self) -> str:
+        """Path relative to the scanned root"""
+        return os.path.join(self.folder, self.name)
+
+    @property
+    def folder_label(self) -> str:
+        """Folder for display ('root' for the scanned root itself)"""
+        return FileManifest.label(self.folder)
+
+
+class FileManifest:
+    """Append-only columnar table of files found by a scan."""
+
+    # Folder key of files directly in the scanned root; never a relative subfolder path,
+    # so a real subfolder named 'root' stays separate
+    ROOT = ''
+    ROOT_LABEL = 'root'  # How ROOT is displayed
+
+    def __init__(self, patterns: Sequence[str] = ()):
+        """
+        Create an empty manifest.
+
+        Args:
+            patterns: Include patterns, in order; rows store an index into them
+        """
+        self.patterns: Tuple[str, ...] = tuple(patterns)
+        if len(self.patterns) >= NO_MATCH:
+            raise ValueError(f"At most {NO_MATCH - 1} patterns are supported")
+        self._pattern_index = {pattern: position for position, pattern in enumerate(self.patterns)}
+        self.folders: List[str] = []  # Interned folder table
+        self._folder_index: Dict[str, int] = {}
+        self.folder_ids = array('I')
+        self.sizes = array('q')
+        self.mtimes = array('I')  # Whole seconds since the epoch
+        self.pattern_ids = array('B')
+        self._names = bytearray()  # Every file name, encoded back to back
+        self._name_ends = array('I')  # Offset just past each row's name
+
+    @classmethod
+    def label(cls, folder: str) -> str:
+        """Display text for a folder key (a real subfolder named 'root' is shown as 'root/')"""
+        if folder == cls.ROOT:
+            return cls.ROOT_LABEL
+        return folder + os.sep if folder == cls.ROOT_LABEL else folder
+
+    def intern_folder(self, folder: str) -> int:
+        """Index of a folder in the folder table, adding it if new"""
+        folder_id = self._folder_index.get(folder)
+        if folder_id is None:
+            folder_id = self._folder_index[folder] = len(self.folders)
+            self.folders.append(folder)
+        return folder_id
+
+    def add(self, folder: str, name: str, size: int = 0, mtime: float = 0, pattern: Optional[str] = None):
+        """
+        Append a file
+
+        Args:
+            folder: Folder relative to the scanned root (ROOT for the root itself)
+            name: File name
+            size: Size in bytes (0 if not stat'ed)
+            mtime: Modification time in seconds, stored whole (0 if not stat'ed)
+            pattern: Include pattern the file matched, or None
+        """
+        self.folder_ids.append(self.intern_folder(folder))
+        self.sizes.append(size)
+        self.mtimes.append(min(max(int(mtime), 0), 0xFFFFFFFF))
+        self.pattern_ids.append(NO_MATCH if pattern is None else self._pattern_index[pattern])
+        self._names += os.fsencode(name)
+        if len(self._names) > 0xFFFFFFFF and self._name_ends.typecode == 'I':
+            self._name_ends = array('Q', self._name_ends)
+        self._name_ends.append(len(self._names))
+
+    def __len__(self) -> int:
+        return len(self.folder_ids)
+
+    def _name_bytes(self, row: int) -> bytes:
+        start = self._name_ends[row - 1] if row else 0
+        return bytes(self._names[start:self._name_ends[row]])
+
+    def name(self, row: int) -> str:
+        return os.fsdecode(self._name_bytes(row))
+
+    def folder(self, row: int) -> str:
+        return self.folders[self.folder_ids[row]]
+
+    def pattern(self, row: int) -> Optional[str]:
+        pattern_id = self.pattern_ids[row]
+        return None if pattern_id == NO_MATCH else self.patterns[pattern_id]
+
+    def row(self, row: int) -> FileRow:
+        """Materialize one row"""
+        return FileRow(self.folder(row), self.name(row), self.sizes[row], self.mtimes[row], self.pattern(row))
+
+    def rows(self, selection: Optional[Iterable[int]] = None) -> Iterable[FileRow]:
+        """Materialize rows one at a time (all rows in insertion order by default)"""
+        for row in range(len(self)) if selection is None else selection:
+            yield self.row(row)
+
+    def matching(self) -> array:
+        """Indexes of rows that matched an include pattern"""
+        return array('I', (row for row, pattern_id in enumerate(self.pattern_ids) if pattern_id != NO_MATCH))
+
+    def filtered(self) -> array:
+        """Indexes of rows that matched no include pattern"""
+        return array('I', (row for row, pattern_id in enumerate(self.pattern_ids) if pattern_id == NO_MATCH))
+
+    def _sort_key(self):
+        """
+        Folder-then-name sort key for row indexes
+
+        The folder table is ranked once, so each row sorts on an integer rank
+        and its raw name bytes (UTF-8 byte order equals code point order).
+        """
+        folder_rank = array('I', bytes(4 * len(self.folders)))
+        for rank, folder_id in enumerate(sorted(range(len(self.folders)), key=self.folders.__getitem__)):
+            folder_rank[folder_id] = rank
+        folder_ids = self.folder_ids
+        return lambda row: (folder_rank[folder_ids[row]], self._name_bytes(row))
+
+    def sorted_rows(self, selection: Optional[Sequence[int]] = None) -> array:
+        """Row indexes ordered by folder then file name"""
+        rows = range(len(self)) if selection is None else selection
+        return array('I', sorted(rows, key=self._sort_key()))
+
+    def first_rows(self, count: int, selection: Optional[Iterable[int]] = None) -> List[int]:
+        """The first `count` row indexes in folder/name order, without sorting the whole selection"""
+        rows = range(len(self)) if selection is None else selection
+        return heapq.nsmallest(count, rows, key=self._sort_key())
+
+    def total_size(self, selection: Optional[Iterable[int]] = None) -> int:
+        if selection is None:
+            return sum(self.sizes)
+        sizes = self.sizes
+        return sum(sizes[row] for row in selection)
+
+    def pattern_counts(self) -> Dict[str, int]:
+        """Matching rows per include pattern, in pattern order"""
+        counts = [0] * (NO_MATCH + 1)
+        for pattern_id in self.pattern_ids:
+            counts[pattern_id] += 1
+        return {pattern: counts[position] for position, pattern in enumerate(self.patterns)}
+
+    def folder_stats(self, selection: Optional[Iterable[int]] = None) -> List[FolderStats]:
+        """
+        File count and total size per folder over the selected rows
+
+        Returns:
+            Stats for every folder with at least one selected row, sorted by folder
+        """
+        files = [0] * len(self.folders)
+        sizes = [0] * len(self.folders)
+        folder_ids, row_sizes = self.folder_ids, self.sizes
+        for row in range(len(self)) if selection is None else selection:
+            folder_id = folder_ids[row]
+            files[folder_id] += 1
+            sizes[folder_id] += row_sizes[row]
+        return sorted((FolderStats(folder, files[folder_id], sizes[folder_id])
+                       for folder_id, folder in enumerate(self.folders) if files[folder_id]),
+                      key=lambda stats: stats.folder)
+
+    def export(self, path: str, selection: Optional[Iterable[int]] = None) -> int:
+        """
+        Stream rows to a JSON Lines (.jsonl) or CSV (.csv) file
+
+        Rows are written as they are materialized, into a temporary file that
+        replaces the target once complete. The folder column holds '.' for
+        files directly in the scanned root.
+
+        Args:
+            path: Output file; the suffix picks the format
+            selection: Row indexes to write, in order (all rows by default)
+
+        Returns:
+            Number of rows written
+        """
+        suffix = os.path.splitext(str(path))[1].lower()
+        if suffix not in ('.jsonl', '.csv'):
+            raise ValueError(f"Unsupported export format '{suffix}' (use .jsonl or .csv)")
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        written = 0
+        try:
+            with open(tmp_path, 'w', encoding='utf-8', errors='backslashreplace', newline='') as f:
+                if suffix == '.csv':
+                    writer = csv.writer(f)
+                    writer.writerow(EXPORT_FIELDS)
+                    for row in self.rows(selection):
+                        writer.writerow((row.path, row.folder or os.curdir, row.name, row.size, row.mtime,
+                                         row.pattern or ''))
+                        written += 1
+                else:
+                    for row in self.rows(selection):
+                        values = (row.path, row.folder or os.curdir, row.name, row.size, row.mtime, row.pattern)
+                        f.write(json.dumps(dict(zip(EXPORT_FIELDS, values)), ensure_ascii=False) + "\n")
+                        written += 1
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        return written
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the per-row columns and the name buffer"""
+        columns = (self.folder_ids, self.sizes, self.mtimes, self.pattern_ids, self._name_ends)
+        return sum(column.itemsize * len(column) for column in columns) + len(self._names)
+
+    def __repr__(self) -> str:
+        return f"FileManifest({len(self)} files in {len(self.folders)} folders, {self.nbytes} bytes)"
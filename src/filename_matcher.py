@@ -0,0 +1,165 @@
+"""
+Filename pattern matching shared by every image scan.
+The configured search and exclude patterns are compiled once into a
+FilenameMatcher, so the generator, the UI counters, the dry run and the folder
+selector all agree on which files match and pay a single substring test or
+compiled regex search per file, however many patterns are configured.
+"""
+
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Optional, Pattern, Sequence, Tuple, Union
+
+IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp', '.tiff', '.tif'})
+
+
+def is_image_file(filename: str) -> bool:
+    """Whether a filename has one of the supported image extensions"""
+    return os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS
+
+
+def parse_patterns(value) -> Tuple[str, ...]:
+    """
+    Normalize a pattern setting to a tuple of patterns
+
+    Args:
+        value: A single pattern, a comma-separated string or a list of patterns
+
+    Returns:
+        Non-empty patterns in their configured order, without duplicates
+    """
+    if value is None:
+        return ()
+    if isinstance(value, str):
+        value = value.split(',') if ',' in value else [value]
+    patterns = []
+    for pattern in value:
+        pattern = str(pattern).strip()
+        if pattern and pattern not in patterns:
+            patterns.append(pattern)
+    return tuple(patterns)
+
+
+class FilenameMatcher:
+    """
+    Compiled image_search_pattern / exclude_patterns / exact_match setting.
+
+    All include patterns are combined into one regex of named alternatives
+    (and all exclude patterns into another), so a filename is classified
+    against every pattern in a single search and the alternative that hit
+    tells which pattern matched.
+
+    Contains mode matches a pattern anywhere in the lowercased filename. Exact
+    mode requires the pattern to stand as a whole segment: each end of the
+    pattern that is a letter or digit must not touch another letter or digit,
+    so 'genx' matches 'anna_genx.jpg' but not 'genxy.jpg', and '-selfie'
+    matches 'anna-selfie.jpg' but not 'anna-selfies.jpg'.
+    """
+
+    __slots__ = ("patterns", "exclude", "exact_match", "_needle", "_regex", "_exclude_regex")
+
+    def __init__(self, patterns: Union[str, Sequence[str]] = 'genx', exact_match: bool = False,
+                 exclude: Union[str, Sequence[str], None] = None):
+        """
+        Compile the matcher.
+
+        Args:
+            patterns: Search pattern or patterns (case-insensitive); a file matches if any does
+            exact_match: Match whole segments only instead of any substring
+            exclude: Patterns that reject a file even when it matches (same matching mode)
+        """
+        self.patterns = parse_patterns(patterns)
+        self.exclude = parse_patterns(exclude)
+        self.exact_match = bool(exact_match)
+        self._needle = None
+        self._regex = None
+        self._exclude_regex = self._compile(self.exclude) if self.exclude else None
+        if len(self.patterns) == 1 and not self.exact_match:
+            self._needle = self.patterns[0].lower()  # Plain substring test is fastest
+        elif self.patterns:
+            self._regex = self._compile(self.patterns)
+
+    def _compile(self, patterns: Tuple[str, ...]) -> Pattern:
+        """One regex with a named alternative per pattern (p0, p1, ...)."""
+        alternatives = []
+        for position, pattern in enumerate(patterns):
+            needle = pattern.lower()
+            body = re.escape(needle)
+            if self.exact_match:
+                prefix = r'(?<![a-z0-9])' if needle[0].isalnum() else ''
+                suffix = r'(?![a-z0-9])' if needle[-1].isalnum() else ''
+                body = prefix + body + suffix
+            alternatives.append(f"(?P<p{position}>{body})")
+        return re.compile("|".join(alternatives))
+
+    @property
+    def pattern(self) -> str:
+        """Include patterns as display text"""
+        return ", ".join(self.patterns)
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "FilenameMatcher":
+        """Shared matcher for a configuration's image_search_pattern, exclude_patterns and exact_match"""
+        return get_matcher(parse_patterns(config.get('image_search_pattern', 'genx')),
+                           bool(config.get('exact_match', False)),
+                           parse_patterns(config.get('exclude_patterns')))
+
+    def match(self, filename: str) -> Optional[str]:
+        """
+        Classify a filename against every pattern at once
+
+        Args:
+            filename: File name (not a full path)
+
+        Returns:
+            The include pattern that matched (the leftmost hit in the name),
+            or None if none did or an exclude pattern matched
+        """
+        name = filename.lower()
+        if self._exclude_regex is not None and self._exclude_regex.search(name):
+            return None
+        if self._needle is not None:
+            return self.patterns[0] if self._needle in name else None
+        if self._regex is None:
+            return None
+        hit = self._regex.search(name)
+        return self.patterns[int(hit.lastgroup[1:])] if hit else None
+
+    def matches(self, filename: str) -> bool:
+        """
+        Check if a filename matches the pattern
+
+        Args:
+            filename: File name (not a full path)
+
+        Returns:
+            True if the filename matches
+        """
+        return self.match(filename) is not None
+
+    def matches_image(self, filename: str) -> bool:
+        """Check that a filename is a supported image and matches the pattern"""
+        return is_image_file(filename) and self.matches(filename)
+
+    def describe(self) -> str:
+        """Patterns and mode for display, e.g. '"genx", "-selfie" (exact), excluding "draft"'"""
+        text = ", ".join(f'"{pattern}"' for pattern in self.patterns)
+        text += " (exact)" if self.exact_match else " (contains)"
+        if self.exclude:
+            text += ", excluding " + ", ".join(f'"{pattern}"' for pattern in self.exclude)
+        return text
+
+    def __repr__(self) -> str:
+        return f"FilenameMatcher({self.patterns!r}, exact_match={self.exact_match}, exclude={self.exclude!r})"
+
+
+@lru_cache(maxsize=32)
+def _cached_matcher(patterns: Tuple[str, ...], exact_match: bool, exclude: Tuple[str, ...]) -> FilenameMatcher:
+    return FilenameMatcher(patterns, exact_match, exclude)
+
+
+def get_matcher(patterns: Union[str, Sequence[str]] = 'genx', exact_match: bool = False,
+                exclude: Union[str, Sequence[str], None] = None) -> FilenameMatcher:
+    """Matcher for a pattern setting, compiled once and reused by every caller"""
+    return _cached_matcher(parse_patterns(patterns), bool(exact_match), parse_patterns(exclude))
@@ -0,0 +1,290 @@
+"""
+Streamed JSON request bodies for Act-Two submissions.
+A GenerationTemplate compiles the batch configuration and driver reference
+into pre-serialized byte chunks once, so each submission only splices in its
+character image and ratio. Large data URIs are carried as pre-encoded byte chunks instead of Python
+strings, and the driver video fragment is memory-mapped once per process and
+shared read-only by every request. Bodies are serialized lazily as they are
+sent, so memory scales with the images in flight rather than the driver size.
+"""
+
+import base64
+import json
+import mmap
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+Chunk = Union[bytes, memoryview]
+
+# Size of the slices handed to the socket when sending mapped data
+SEND_CHUNK_SIZE = 1024 * 1024
+
+_mapped_lock = threading.Lock()
+_mapped_files: Dict[str, mmap.mmap] = {}
+
+
+def map_file(path) -> memoryview:
+    """
+    Read-only memory map of a file, shared by every caller in the process.
+
+    Args:
+        path: File to map (expected to be immutable, e.g. a content-addressed cache entry)
+
+    Returns:
+        A memoryview over the mapped bytes
+    """
+    key = str(Path(path).resolve())
+    with _mapped_lock:
+        mapped = _mapped_files.get(key)
+        if mapped is None:
+            with open(key, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            _mapped_files[key] = mapped
+        return memoryview(mapped)
+
+
+def _send_slices(chunks) -> Iterator[Chunk]:
+    """Yield chunks, slicing large ones into zero-copy views of SEND_CHUNK_SIZE."""
+    for chunk in chunks:
+        if len(chunk) <= SEND_CHUNK_SIZE:
+            yield chunk
+            continue
+        view = memoryview(chunk)
+        for start in range(0, len(view), SEND_CHUNK_SIZE):
+            yield view[start:start + SEND_CHUNK_SIZE]
+
+
+class InlineData:
+    """
+    A JSON string value (typically a data URI) held as encoded ASCII chunks.
+
+    The chunks must not need JSON escaping, which holds for data URIs and
+    base64 text.
+    """
+
+    __slots__ = ("chunks",)
+
+    def __init__(self, *chunks: Chunk):
+        self.chunks = tuple(chunks)
+
+    @classmethod
+    def from_file(cls, path, mime_type: str) -> "InlineData":
+        """Base64 data URI of a small file, encoded once as bytes."""
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read(), mime_type)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, mime_type: str) -> "InlineData":
+        """Base64 data URI of in-memory file contents."""
+        return cls(f"data:{mime_type};base64,".encode('ascii'), base64.b64encode(data))
+
+    @classmethod
+    def from_mapped_file(cls, path) -> "InlineData":
+        """Value whose text is the whole (memory-mapped) file."""
+        return cls(map_file(path))
+
+    @classmethod
+    def from_str(cls, value: str) -> "InlineData":
+        return cls(value.encode('ascii'))
+
+    def __len__(self) -> int:
+        return sum(len(chunk) for chunk in self.chunks)
+
+    def __iter__(self) -> Iterator[Chunk]:
+        return _send_slices(self.chunks)
+
+    def startswith(self, prefix: str) -> bool:
+        """Cheap prefix test without materializing the value."""
+        encoded = prefix.encode('ascii')
+        if self.chunks and len(self.chunks[0]) >= len(encoded):
+            return bytes(self.chunks[0][:len(encoded)]) == encoded
+        return str(self).startswith(prefix)
+
+    def __str__(self) -> str:
+        return b"".join(bytes(chunk) for chunk in self.chunks).decode('ascii')
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, InlineData):
+            return str(self) == str(other)
+        if isinstance(other, str):
+            return str(self) == other
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __repr__(self) -> str:
+        return f"InlineData({len(self)} bytes)"
+
+
+class StreamingJsonBody:
+    """
+    JSON document sent as a re-iterable sequence of byte chunks.
+
+    requests sends any iterable body with a __len__ as a fixed Content-Length
+    stream, so the document is never joined into a single buffer.
+    """
+
+    def __init__(self, parts: List[Chunk]):
+        self.parts = parts
+        self._length = sum(len(part) for part in parts)
+
+    @staticmethod
+    def _serialize(payload: Dict) -> List[Union[Chunk, InlineData]]:
+        """
+        Serialize a payload, leaving each InlineData value as an object between
+        byte chunks.
+
+        Small values go through json.dumps; each InlineData is replaced by a
+        unique placeholder that the serialized text is then split at.
+        """
+        inline = {}
+
+        def substitute(value):
+            if isinstance(value, InlineData):
+                marker = f"@@inline-{uuid.uuid4().hex}@@"
+                inline[f'"{marker}"'] = value
+                return marker
+            if isinstance(value, dict):
+                return {key: substitute(item) for key, item in value.items()}
+            if isinstance(value, list):
+                return [substitute(item) for item in value]
+            return value
+
+        remaining = json.dumps(substitute(payload))
+        parts: List[Union[Chunk, InlineData]] = []
+        while inline:
+            position, marker = min((remaining.find(marker), marker) for marker in inline)
+            parts.append(remaining[:position + 1].encode('utf-8'))  # Keep the opening quote
+            parts.append(inline.pop(marker))
+            remaining = remaining[position + len(marker) - 1:]  # Keep the closing quote
+        parts.append(remaining.encode('utf-8'))
+        return parts
+
+    @classmethod
+    def from_payload(cls, payload: Dict) -> "StreamingJsonBody":
+        """Body for a payload whose large values are InlineData."""
+        if isinstance(payload, TemplatedPayload):
+            return payload.body
+        parts: List[Chunk] = []
+        for part in cls._serialize(payload):
+            if isinstance(part, InlineData):
+                parts.extend(part.chunks)
+            else:
+                parts.append(part)
+        return cls(parts)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[Chunk]:
+        return _send_slices(self.parts)
+
+    def to_bytes(self) -> bytes:
+        """Materialize the whole document (debugging and tests only)."""
+        return b"".join(bytes(part) for part in self.parts)
+
+
+class TemplatedPayload(dict):
+    """
+    Payload rendered from a GenerationTemplate, carrying its pre-serialized body.
+
+    Treat it as read-only: copying it (e.g. {**payload, ...}) yields a plain
+    dict that is serialized normally.
+    """
+
+    def __init__(self, fields: Dict, body: StreamingJsonBody):
+        super().__init__(fields)
+        self.body = body
+
+
+class GenerationTemplate:
+    """Act-Two payload compiled once per batch configuration and driver reference."""
+
+    def __init__(self, config: Optional[Dict], driver_uri: Union[str, InlineData]):
+        """
+        Compile the template.
+
+        Args:
+            config: Batch configuration dictionary
+            driver_uri: Driver video reference (uploaded URI or InlineData data URI)
+        """
+        self.config = config
+        self.driver_uri = driver_uri
+        self._character_slot = InlineData()
+        self._ratio_slot = InlineData()
+        self.fields = self.build_fields(config or {}, driver_uri)
+
+        # Driver and settings are serialized (and their chunks flattened) once here
+        self._parts: List[Union[Chunk, InlineData]] = []
+        for part in StreamingJsonBody._serialize({
+            "character": {"type": "image", "uri": self._character_slot},
+            **self.fields,
+            "ratio": self._ratio_slot,
+        }):
+            if isinstance(part, InlineData) and part is not self._character_slot and part is not self._ratio_slot:
+                self._parts.extend(part.chunks)
+            else:
+                self._parts.append(part)
+
+    @staticmethod
+    def build_fields(config: Dict, driver_uri: Union[str, InlineData]) -> Dict:
+        """Payload fields that are the same for every image in a batch."""
+        fields = {
+            "reference": {
+                "type": "video",
+                "uri": driver_uri
+            },
+            "bodyControl": config.get('body_control', False),
+            "expressionIntensity": config.get('expression_intensity', 1.0),
+            "model": config.get('model_version', 'act_two'),
+        }
+
+        # Add optional body control parameters if enabled
+        if config.get('body_control', False):
+            fields["motionStrength"] = config.get('motion_strength', 1.0)
+            fields["stabilization"] = config.get('stabilization', True)
+            fields["preservePose"] = config.get('preserve_pose', False)
+            fields["motionSmoothing"] = config.get('motion_smoothing', 0.5)
+
+        # Add quality settings if specified
+        if config.get('quality'):
+            fields["quality"] = config.get('quality', 'standard')
+
+        # Add seed if specified
+        if config.get('seed') is not None:
+            fields["seed"] = config.get('seed')
+
+        # Add prompts if specified
+        if config.get('prompt'):
+            fields["prompt"] = config.get('prompt')
+        if config.get('negative_prompt'):
+            fields["negativePrompt"] = config.get('negative_prompt')
+        return fields
+
+    def matches(self, config: Optional[Dict], driver_uri: Union[str, InlineData]) -> bool:
+        """Whether this template was compiled for exactly this config and driver reference."""
+        return self.config is config and self.driver_uri is driver_uri
+
+    def render(self, character_uri: InlineData, ratio: str) -> TemplatedPayload:
+        """
+        Payload for one image, splicing its data URI and ratio into the template.
+
+        Args:
+            character_uri: Character image data URI
+            ratio: API ratio value, e.g. '1280:720'
+        """
+        ratio_chunk = json.dumps(ratio)[1:-1].encode('utf-8')
+        parts: List[Chunk] = []
+        for part in self._parts:
+            if part is self._character_slot:
+                parts.extend(character_uri.chunks)
+            elif part is self._ratio_slot:
+                parts.append(ratio_chunk)
+            else:
+                parts.append(part)
+
+        fields = {"character": {"type": "image", "uri": character_uri}, **self.fields, "ratio": ratio}
+        return TemplatedPayload(fields, StreamingJsonBody(parts))
@@ -28,8 +28,12 @@ except ImportError:
 
 try:
     from .path_utils import path_manager
+    from .filename_matcher import FilenameMatcher, get_matcher, is_image_file
+    from .tree_walker import TreeWalker, get_scan_cache
 except ImportError:
     from path_utils import path_manager
+    from filename_matcher import FilenameMatcher, get_matcher, is_image_file
+    from tree_walker import TreeWalker, get_scan_cache
 
 class VideoInfo:
     """Utility class for video file information."""
@@ -159,42 +163,7 @@ class GUISelectors:
         Returns:
             True if the filename matches the pattern
         """
-        filename_lower = filename.lower()
-        pattern_lower = pattern.lower()
-
-        if exact_match:
-            import re
-            # Remove file extension for matching
-            name_without_ext = filename_lower.rsplit('.', 1)[0] if '.' in filename_lower else filename_lower
-
-            # Special handling for patterns with leading delimiters like "-selfie"
-            if pattern_lower.startswith('-') or pattern_lower.startswith('_'):
-                delimiter = pattern_lower[0]
-                word = pattern_lower[1:]  # Remove the delimiter
-
-                # The pattern should match only when the word appears after the delimiter
-                # and not at the beginning of the filename
-                # Examples: "person-selfie" matches, "selfie-vacation" doesn't match
-
-                # Look for the exact pattern with delimiter
-                if pattern_lower in name_without_ext:
-                    # Check if it's preceded by other characters (not at start)
-                    pos = name_without_ext.find(pattern_lower)
-                    if pos > 0:  # Must have something before it
-                        # Also check it's not immediately followed by more letters
-                        # to ensure word boundary
-                        end_pos = pos + len(pattern_lower)
-                        if end_pos >= len(name_without_ext) or not name_without_ext[end_pos].isalnum():
-                            return True
-                return False
-            else:
-                # Pattern doesn't include delimiter, look for exact word match
-                # Split by common delimiters and check segments
-                segments = re.split(r'[-_\s.]+', name_without_ext)
-                return pattern_lower in segments
-        else:
-            # Simple substring match
-            return pattern_lower in filename_lower
+        return get_matcher(pattern, exact_match).matches(filename)
 
     def select_driver_video(self, current_video: Optional[str] = None) -> Optional[str]:
         """
@@ -358,26 +327,20 @@ class GUISelectors:
 
         if folder_path:
             path = Path(folder_path)
+            get_scan_cache().use_root(str(path))  # Listings of a previous input folder are dropped
 
-            # Scan for images recursively
-            image_extensions = {'.jpg', '.jpeg', '.png', '.webp', '.bmp', '.gif'}
-            image_files = []
-
-            for ext in image_extensions:
-                image_files.extend(path.rglob(f"*{ext}"))
+            # Scan for images recursively in one walk (listings are reused by the dry run and processing)
+            image_files = sorted((entry for entry in TreeWalker.from_config(self.config).files(str(path))
+                                  if is_image_file(entry.name)), key=lambda entry: entry.path)
 
             # Filter for images matching configured pattern (default to 'genx' if not configured)
-            search_pattern = self.config.get('image_search_pattern', 'genx').lower()
-            exact_match = self.config.get('exact_match', False)
+            matcher = FilenameMatcher.from_config(self.config)
 
-            matching_images = []
-            for img in image_files:
-                if self._matches_pattern(img.name, search_pattern, exact_match):
-                    matching_images.append(img)
+            matching_images = [img for img in image_files if matcher.matches(img.name)]
 
             # Show scan results in console instead of messagebox
             if matching_images:
-                pattern_display = f'"{search_pattern}"' + (" (exact)" if exact_match else " (contains)")
+                pattern_display = matcher.describe()
 
                 # Print to console with rich formatting
                 from rich.console import Console
@@ -416,7 +379,7 @@ class GUISelectors:
                 from rich.prompt import Confirm
 
                 console = Console()
-                pattern_display = f'"{search_pattern}"' + (" (exact)" if exact_match else " (contains)")
+                pattern_display = matcher.describe()
 
                 # Create warning text
                 warning = Text()
@@ -0,0 +1,155 @@
+"""
+On-disk cache of preprocessed character images.
+Entries are keyed by the source file's identity (path, size and mtime), the
+target ratio and the resample/quality settings, and hold the final encoded
+bytes plus metadata. Least recently used entries are evicted once the cache
+grows past its size cap, so reruns skip all image CPU work.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from path_utils import path_manager
+from image_preprocessing import JPEG_QUALITY, REDUCING_GAP
+
+logger = logging.getLogger(__name__)
+
+# Bump when preprocessing output changes so stale entries stop matching
+CACHE_VERSION = 1
+
+
+class PreprocessedImageCache:
+    """Content-addressed, size-capped LRU cache of preprocess_image results."""
+
+    DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_bytes: int = DEFAULT_MAX_BYTES,
+                 quality: int = JPEG_QUALITY):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Cache directory (defaults to <project>/cache/images)
+            max_bytes: Size cap for cached image data; oldest-used entries go first
+            quality: JPEG quality the cached results were encoded with
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else path_manager.project_dir / "cache" / "images"
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None  # Scanned lazily on the first store
+
+    def key(self, image_path: str, target_ratio: Optional[Dict], ratios: Optional[Dict[str, Dict]] = None) -> str:
+        """
+        Cache key for an image and the settings it would be preprocessed with
+
+        Args:
+            image_path: Source image
+            target_ratio: Fixed ratio, or None for smart selection among ratios
+            ratios: Candidate ratios for smart selection
+        """
+        path = Path(image_path).resolve()
+        stat = path.stat()
+        if target_ratio is not None:
+            ratio_key = f"{target_ratio['name']}={target_ratio['width']}x{target_ratio['height']}"
+        else:
+            candidates = sorted((ratios or {}).items())
+            ratio_key = "auto:" + ",".join(f"{name}={r['width']}x{r['height']}" for name, r in candidates)
+        identity = (f"v{CACHE_VERSION}|{path}|{stat.st_size}|{stat.st_mtime_ns}|{ratio_key}|"
+                    f"lanczos|gap={REDUCING_GAP}|q={self.quality}")
+        return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+    def get(self, image_path: str, target_ratio: Optional[Dict],
+            ratios: Optional[Dict[str, Dict]] = None) -> Optional[Dict]:
+        """
+        Cached preprocess_image result, or None on a miss
+
+        A hit is marked as recently used and carries 'cached': True.
+        """
+        key = self.key(image_path, target_ratio, ratios)
+        data_path = self.cache_dir / f"{key}.img"
+        meta_path = self.cache_dir / f"{key}.json"
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            data = data_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+
+        try:
+            os.utime(data_path)  # LRU order is tracked by mtime
+        except OSError:
+            pass
+        logger.info(f"Preprocessed image cache hit: {Path(image_path).name} ({meta['target_ratio']['name']})")
+        return {
+            **meta,
+            "source": str(image_path),
+            "source_size": tuple(meta["source_size"]),
+            "decoded_size": tuple(meta["decoded_size"]),
+            "data": data,
+            "timings": {},
+            "cached": True,
+        }
+
+    def put(self, image_path: str, target_ratio: Optional[Dict], ratios: Optional[Dict[str, Dict]], result: Dict):
+        """Store a preprocess_image result, evicting old entries beyond the size cap."""
+        key = self.key(image_path, target_ratio, ratios)
+        meta = {name: result[name] for name in
+                ("mime_type", "width", "height", "target_ratio", "source_size", "decoded_size", "crop_percent")}
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+
+        with self._lock:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            data_path = self.cache_dir / f"{key}.img"
+            meta_path = self.cache_dir / f"{key}.json"
+            try:
+                replaced_bytes = data_path.stat().st_size  # Overwriting an entry frees its old data
+            except OSError:
+                replaced_bytes = 0
+
+            # Data first, metadata last - an entry only counts once its metadata exists
+            tmp_path = data_path.with_name(data_path.name + suffix)
+            tmp_path.write_bytes(result["data"])
+            os.replace(tmp_path, data_path)
+            tmp_path = meta_path.with_name(meta_path.name + suffix)
+            tmp_path.write_text(json.dumps(meta))
+            os.replace(tmp_path, meta_path)
+
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_bytes()
+            else:
+                self._total_bytes += len(result["data"]) - replaced_bytes
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _scan_bytes(self) -> int:
+        return sum(entry.stat().st_size for entry in self.cache_dir.glob("*.img"))
+
+    def _evict(self):
+        """Delete least recently used entries until the cache fits under max_bytes."""
+        entries = []
+        for data_path in self.cache_dir.glob("*.img"):
+            try:
+                stat = data_path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, data_path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, data_path in entries:
+            if total <= self.max_bytes:
+                break
+            for path in (data_path.with_suffix(".json"), data_path):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+            total -= size
+            logger.info(f"Evicted preprocessed image {data_path.stem[:12]} from cache")
+        self._total_bytes = total
@@ -0,0 +1,294 @@
+"""
+Character image preprocessing for Act-Two submissions.
+Crops an image to the target API ratio, resizes it and encodes it as JPEG
+entirely in memory. The image header is read once for ratio selection, and
+JPEG draft mode / reduce() decode close to the target scale before the final
+LANCZOS filter. Functions here are module-level and return plain data so they
+can run in worker processes; PreprocessPipeline uses that to prepare upcoming
+images in a process pool while earlier tasks render.
+"""
+
+import io
+import logging
+import math
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+JPEG_QUALITY = 95
+
+# Formats the API accepts as-is when an image is already exactly the target size
+PASSTHROUGH_MIME_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+# Decode to at least this multiple of the target size so LANCZOS still has
+# detail to work with (the same gap Pillow's thumbnail() uses)
+REDUCING_GAP = 2.0
+
+
+def select_best_ratio(image_aspect: float, ratios: Dict[str, Dict]) -> Dict:
+    """
+    Ratio whose aspect is closest to the image's
+
+    Args:
+        image_aspect: Image width / height
+        ratios: Mapping of ratio name to configuration ('aspect', 'width', ...)
+
+    Returns:
+        The chosen ratio configuration with its 'name'
+    """
+    name = min(ratios, key=lambda ratio_name: abs(image_aspect - ratios[ratio_name]["aspect"]))
+    return {"name": name, **ratios[name]}
+
+
+def center_crop_box(width: int, height: int, target_aspect: float) -> Tuple[Tuple[int, int, int, int], float, str]:
+    """
+    Centered crop box that gives an image the target aspect ratio
+
+    Args:
+        width: Image width
+        height: Image height
+        target_aspect: Desired width / height
+
+    Returns:
+        Tuple of ((left, top, right, bottom), crop_percent, cropped axis name)
+    """
+    if width / height > target_aspect:
+        # Image is wider than target, crop width
+        new_width = int(height * target_aspect)
+        left = (width - new_width) // 2
+        crop_percent = ((width - new_width) / width) * 100
+        return (left, 0, left + new_width, height), crop_percent, "width"
+
+    # Image is taller than target, crop height
+    new_height = int(width / target_aspect)
+    top = (height - new_height) // 2
+    crop_percent = ((height - new_height) / height) * 100
+    return (0, top, width, top + new_height), crop_percent, "height"
+
+
+def _scale_box(box: Tuple[int, int, int, int], scale_x: float, scale_y: float) -> Tuple[int, int, int, int]:
+    left, top, right, bottom = box
+    return (int(left * scale_x), int(top * scale_y),
+            max(int(left * scale_x) + 1, int(right * scale_x)), max(int(top * scale_y) + 1, int(bottom * scale_y)))
+
+
+def preprocess_image(image_path: str, target_ratio: Optional[Dict] = None,
+                     ratios: Optional[Dict[str, Dict]] = None, quality: int = JPEG_QUALITY,
+                     compare_full_decode: bool = False) -> Dict:
+    """
+    Pick the ratio, crop, resize and JPEG-encode a character image in one pass
+
+    The header is read once; JPEGs are then decoded at a reduced DCT scale via
+    draft() and other formats are shrunk with reduce() before the final filter.
+
+    Args:
+        image_path: Path to the original image
+        target_ratio: Target ratio configuration dict ('name', 'width', 'height', 'aspect');
+            chosen from ratios by closest aspect when None
+        ratios: Candidate ratios for smart selection
+        quality: JPEG quality
+        compare_full_decode: Also time a full-resolution decode to measure the saving
+
+    Returns:
+        Dict with 'data' (JPEG bytes), 'mime_type', 'width', 'height', 'target_ratio',
+        'source_size', 'decoded_size', 'crop_percent' and 'timings' (seconds per stage)
+    """
+    timings = {}
+    started = time.perf_counter()
+
+    with Image.open(image_path) as img:
+        # Header only so far - nothing has been decoded yet
+        source_size = img.size
+        width, height = source_size
+        if target_ratio is None:
+            if not ratios:
+                raise ValueError("either target_ratio or ratios is required")
+            target_ratio = select_best_ratio(width / height, ratios)
+            logger.info(f"Image {Path(image_path).name}: {width}x{height}, "
+                        f"aspect ratio: {width / height:.3f} -> {target_ratio['name']}")
+
+        target_size = (target_ratio["width"], target_ratio["height"])
+        if source_size == target_size and img.format in PASSTHROUGH_MIME_TYPES and img.mode in ("RGB", "L"):
+            # Already what the API wants - send the original bytes, no decode or re-encode
+            timings["decode"] = timings["resize"] = timings["encode"] = 0.0
+            timings["total"] = time.perf_counter() - started
+            result = {
+                "source": str(image_path),
+                "data": Path(image_path).read_bytes(),
+                "mime_type": PASSTHROUGH_MIME_TYPES[img.format],
+                "width": width,
+                "height": height,
+                "target_ratio": target_ratio,
+                "source_size": source_size,
+                "decoded_size": source_size,
+                "crop_percent": 0.0,
+                "timings": timings,
+            }
+            logger.info(f"{Path(image_path).name} is already {width}x{height}, sending it unchanged")
+            return result
+
+        box, crop_percent, axis = center_crop_box(width, height, target_ratio["aspect"])
+        crop_width, crop_height = box[2] - box[0], box[3] - box[1]
+        scale = min(crop_width / target_size[0], crop_height / target_size[1])
+
+        if img.format == "JPEG" and scale > REDUCING_GAP:
+            # Ask libjpeg for the smallest DCT scale still >= REDUCING_GAP x target
+            requested = (math.ceil(width * REDUCING_GAP / scale), math.ceil(height * REDUCING_GAP / scale))
+            img.draft("RGB", requested)
+
+        img.load()
+        decoded_size = img.size
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        timings["decode"] = time.perf_counter() - started
+
+        stage = time.perf_counter()
+        box = _scale_box(box, decoded_size[0] / width, decoded_size[1] / height)
+        cropped = img.crop(box)
+        factor = int(min(cropped.width / target_size[0], cropped.height / target_size[1]) / REDUCING_GAP)
+        if factor > 1:
+            cropped = cropped.reduce(factor)
+        logger.info(f"Cropping {crop_percent:.1f}% from {axis} (centered)")
+        resized = cropped.resize(target_size, Image.LANCZOS)
+        timings["resize"] = time.perf_counter() - stage
+
+    stage = time.perf_counter()
+    buffer = io.BytesIO()
+    resized.save(buffer, "JPEG", quality=quality)
+    timings["encode"] = time.perf_counter() - stage
+    timings["total"] = time.perf_counter() - started
+
+    if compare_full_decode:
+        stage = time.perf_counter()
+        with Image.open(image_path) as full:
+            full.load()
+        timings["full_decode"] = time.perf_counter() - stage
+        timings["decode_saved"] = timings["full_decode"] - timings["decode"]
+
+    result = {
+        "source": str(image_path),
+        "data": buffer.getvalue(),
+        "mime_type": "image/jpeg",
+        "width": resized.width,
+        "height": resized.height,
+        "target_ratio": target_ratio,
+        "source_size": source_size,
+        "decoded_size": decoded_size,
+        "crop_percent": crop_percent,
+        "timings": timings,
+    }
+    logger.info(timing_summary(result))
+    return result
+
+
+def timing_summary(result: Dict) -> str:
+    """One-line description of a preprocess_image result and its stage timings"""
+    width, height = result["source_size"]
+    decoded_width, decoded_height = result["decoded_size"]
+    timings = result["timings"]
+    pixel_saving = 1 - (decoded_width * decoded_height) / (width * height)
+    message = (f"Preprocessed {Path(result['source']).name}: decoded {decoded_width}x{decoded_height} "
+               f"of {width}x{height} ({pixel_saving:.0%} fewer pixels) in {timings['decode']:.3f}s, "
+               f"resize {timings['resize']:.3f}s, encode {timings['encode']:.3f}s")
+    if "decode_saved" in timings:
+        message += f", saved {timings['decode_saved']:.3f}s vs full decode"
+    return message
+
+
+class PreprocessPipeline:
+    """
+    Preprocesses upcoming images in a process pool ahead of submission.
+
+    Only `ahead` images beyond the one being handed out are in the pool or
+    waiting to be consumed, which caps the memory held by encoded results.
+    Frozen (PyInstaller) builds use a thread pool instead, since spawned
+    worker processes there would start the application again.
+    """
+
+    def __init__(self, ahead: int = 2, workers: Optional[int] = None, cache=None,
+                 compare_full_decode: bool = False):
+        """
+        Initialize the pipeline.
+
+        Args:
+            ahead: Images to prepare beyond the current one
+            workers: Worker processes (defaults to min(ahead + 1, CPU count))
+            cache: Optional PreprocessedImageCache; hits never reach the pool
+            compare_full_decode: Also time a full decode of each image (see preprocess_image)
+        """
+        self.ahead = max(0, int(ahead))
+        self.workers = workers or max(1, min(self.ahead + 1, os.cpu_count() or 1))
+        self.cache = cache
+        self.compare_full_decode = compare_full_decode
+        self._executor: Optional[Executor] = None
+
+    def __enter__(self) -> "PreprocessPipeline":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(self, image_path: str, target_ratio: Optional[Dict], ratios: Dict[str, Dict]) -> Future:
+        """Start preprocessing one image; the future resolves to a preprocess_image result."""
+        if self.cache is not None:
+            try:
+                cached = self.cache.get(image_path, target_ratio, ratios)
+            except Exception as e:
+                logger.warning(f"Could not read preprocessed image cache for {image_path}: {str(e)}")
+                cached = None
+            if cached is not None:
+                future = Future()
+                future.set_result(cached)
+                return future
+
+        if self._executor is None:
+            if getattr(sys, 'frozen', False):
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="preprocess")
+            else:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor.submit(preprocess_image, image_path, target_ratio, ratios,
+                                     compare_full_decode=self.compare_full_decode)
+
+    def prefetch(self, jobs: Iterable[Tuple[str, str]], target_ratio: Optional[Dict],
+                 ratios: Dict[str, Dict]) -> Iterator[Tuple[str, str, Optional[Future]]]:
+        """
+        Yield (image_path, output_folder, future) with the next `ahead` images already started
+
+        The first job's future is None: it is cheaper to preprocess it inline
+        than to wait for worker processes to start, so the first submission
+        never queues behind the pool.
+
+        Args:
+            jobs: Iterable of (image_path, output_folder); advanced at most `ahead` jobs early
+            target_ratio: Fixed ratio, or None for smart selection
+            ratios: Candidate ratios for smart selection
+        """
+        jobs = iter(jobs)
+        pending = deque()
+        first = next(jobs, None)
+        if first is not None:
+            pending.append((first[0], first[1], None))
+        while True:
+            while len(pending) <= self.ahead:
+                job = next(jobs, None)
+                if job is None:
+                    break
+                image_path, output_folder = job
+                pending.append((image_path, output_folder, self.submit(image_path, target_ratio, ratios)))
+            if not pending:
+                return
+            yield pending.popleft()
+
+    def close(self):
+        """Stop the worker processes, dropping work nobody will consume."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,311 @@
+"""
+Scan-once job manifest for batch processing.
+One discovery pass lists each input folder, classifies its images against the
+configured patterns and checks every match for existing videos. The resulting
+immutable JobManifest supplies the counts, the progress total and the job
+order, so nothing lists a folder or repeats a duplicate check twice. A
+DiscoveryStream hands out the same entries while the scan is still running,
+and a WorkQueue over the jobs tells the progress panel what comes next.
+"""
+
+import queue
+import threading
+from pathlib import Path
+from types import MappingProxyType
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Tuple
+
+
+class ManifestEntry(NamedTuple):
+    """One image that matched the search patterns."""
+    image_path: str
+    folder: str
+    pattern: str  # Include pattern that matched
+    person_name: Optional[str]  # Name parsed from the filename, if any
+    duplicate: bool  # Videos already exist for this person
+
+
+class FolderSummary(NamedTuple):
+    """Per-folder counts of matched and new (non-duplicate) images."""
+    folder: str
+    matched: int
+    new: int
+
+    @property
+    def duplicates(self) -> int:
+        return self.matched - self.new
+
+
+class JobManifest:
+    """Immutable result of one discovery pass over an input folder."""
+
+    __slots__ = ("root", "_entries", "_jobs", "_folders", "_folder_jobs")
+
+    def __init__(self, root: str, folders: Iterable[str], entries: Iterable[ManifestEntry]):
+        """
+        Freeze a discovery result.
+
+        Args:
+            root: Input folder that was scanned
+            folders: Scanned folders in processing order (including ones without matches)
+            entries: Matching images in processing order
+        """
+        self.root = str(root)
+        self._entries: Tuple[ManifestEntry, ...] = tuple(entries)
+        self._jobs: Tuple[ManifestEntry, ...] = tuple(entry for entry in self._entries if not entry.duplicate)
+
+        matched = {folder: 0 for folder in folders}
+        folder_jobs = {folder: [] for folder in folders}
+        for entry in self._entries:
+            matched[entry.folder] = matched.get(entry.folder, 0) + 1
+            if not entry.duplicate:
+                folder_jobs.setdefault(entry.folder, []).append(entry)
+        self._folder_jobs: Mapping[str, Tuple[ManifestEntry, ...]] = MappingProxyType(
+            {folder: tuple(folder_jobs.get(folder, ())) for folder in matched})
+        self._folders: Mapping[str, FolderSummary] = MappingProxyType(
+            {folder: FolderSummary(folder, count, len(self._folder_jobs[folder])) for folder, count in matched.items()})
+
+    @property
+    def entries(self) -> Tuple[ManifestEntry, ...]:
+        """Every matching image, duplicates included"""
+        return self._entries
+
+    @property
+    def jobs(self) -> Tuple[ManifestEntry, ...]:
+        """Images to generate videos for, in processing order"""
+        return self._jobs
+
+    @property
+    def folders(self) -> Tuple[FolderSummary, ...]:
+        """Per-folder counts in processing order"""
+        return tuple(self._folders.values())
+
+    def folder_summary(self, folder: str) -> Optional[FolderSummary]:
+        return self._folders.get(str(folder))
+
+    def jobs_in(self, folder: str) -> Tuple[ManifestEntry, ...]:
+        """Jobs of one folder, in processing order"""
+        return self._folder_jobs.get(str(folder), ())
+
+    @property
+    def total_matched(self) -> int:
+        return len(self._entries)
+
+    @property
+    def total_new(self) -> int:
+        return len(self._jobs)
+
+    @property
+    def duplicates(self) -> int:
+        return len(self._entries) - len(self._jobs)
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def __iter__(self) -> Iterator[ManifestEntry]:
+        return iter(self._jobs)
+
+    def job_pairs(self, output_folder: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+        """
+        (image_path, output_folder) for each job, as generate_batch expects
+
+        Args:
+            output_folder: Centralized output folder; None saves each video next to its image
+        """
+        for entry in self._jobs:
+            yield entry.image_path, str(output_folder) if output_folder is not None else str(Path(entry.image_path).parent)
+
+    def __repr__(self) -> str:
+        return (f"JobManifest({self.root!r}: {self.total_new} new, {self.duplicates} duplicates "
+                f"in {len(self._folders)} folders)")
+
+
+class DiscoveryStream:
+    """
+    Jobs handed out while discovery is still running.
+
+    After start() the entries are produced on a background thread, so the
+    consumer can submit the first image while later folders are still being
+    listed and checked for duplicates; the counters (and listeners) refine
+    the progress total as the scan continues. Without start() iteration
+    discovers in the caller's thread. Only one consumer should iterate.
+    """
+
+    _END = object()
+
+    def __init__(self, root: str, folders: Iterable[str], entries: Iterable[ManifestEntry]):
+        """
+        Wrap a lazy discovery.
+
+        Args:
+            root: Input folder being scanned
+            folders: Folders that will be scanned, in processing order
+            entries: Lazily produced matching images, in processing order
+        """
+        self.root = str(root)
+        self.folders = tuple(folders)
+        self._source = iter(entries)
+        self._entries: List[ManifestEntry] = []
+        self._listeners: List[Callable[[Optional[ManifestEntry]], None]] = []
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._done = threading.Event()
+        self._error: Optional[BaseException] = None
+        self.matched = 0  # Matching images found so far
+        self.found = 0  # New (non-duplicate) images found so far
+
+    @property
+    def done(self) -> bool:
+        """Whether discovery has finished"""
+        return self._done.is_set()
+
+    def add_listener(self, callback: Callable[[Optional[ManifestEntry]], None]):
+        """
+        Call back with each entry as it is found, then once with None when discovery ends.
+
+        Callbacks run on the discovery thread once started.
+        """
+        self._listeners.append(callback)
+
+    def start(self) -> "DiscoveryStream":
+        """Run discovery on a background thread."""
+        if self._thread is None and not self.done:
+            self._thread = threading.Thread(target=self._run, name="job-discovery", daemon=True)
+            self._thread.start()
+        return self
+
+    def _record(self, entry: ManifestEntry):
+        self._entries.append(entry)
+        self.matched += 1
+        if not entry.duplicate:
+            self.found += 1
+        for callback in self._listeners:
+            callback(entry)
+
+    def _finish(self):
+        self._done.set()
+        for callback in self._listeners:
+            callback(None)
+
+    def _run(self):
+        try:
+            for entry in self._source:
+                self._record(entry)
+                if not entry.duplicate:
+                    self._queue.put(entry)
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._finish()
+            self._queue.put(self._END)
+
+    def __iter__(self) -> Iterator[ManifestEntry]:
+        """New (non-duplicate) images as soon as they are found"""
+        if self._thread is None:
+            if self.done:
+                return
+            for entry in self._source:
+                self._record(entry)
+                if not entry.duplicate:
+                    yield entry
+            self._finish()
+            return
+
+        while True:
+            entry = self._queue.get()
+            if entry is self._END:
+                if self._error is not None:
+                    raise self._error
+                return
+            yield entry
+
+    def job_pairs(self, output_folder: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+        """(image_path, output_folder) for each job as it is found; see JobManifest.job_pairs"""
+        for entry in self:
+            yield entry.image_path, str(output_folder) if output_folder is not None else str(Path(entry.image_path).parent)
+
+    def manifest(self) -> JobManifest:
+        """The complete manifest, waiting for (or running) the rest of discovery"""
+        if self._thread is None:
+            for _ in self:
+                pass
+        else:
+            self._done.wait()
+            if self._error is not None:
+                raise self._error
+        return JobManifest(self.root, self.folders, self._entries)
+
+
+class WorkQueue:
+    """
+    Cursor over the jobs for the live progress panel.
+
+    Folder runs are precomputed as jobs are added, so moving the cursor and
+    asking which folders come next are constant-time and never touch the
+    filesystem. Jobs may be appended (e.g. from a DiscoveryStream listener)
+    while the panel reads it.
+    """
+
+    def __init__(self, jobs: Iterable[ManifestEntry] = ()):
+        """
+        Index the jobs known so far.
+
+        Args:
+            jobs: Jobs in processing order (a JobManifest iterates its jobs)
+        """
+        self.jobs: List[ManifestEntry] = []
+        self._positions: Dict[str, int] = {}
+        self._run_names: List[str] = []  # Folder name of each run of consecutive jobs
+        self._run_of: List[int] = []  # Job index -> run index
+        self._run_ends: List[int] = []  # Run index -> index just past its last job
+        self._lock = threading.Lock()
+        self.cursor = -1  # Index of the most recently started job
+        for entry in jobs:
+            self.append(entry)
+
+    def append(self, entry: Optional[ManifestEntry]):
+        """Add the next job (None and duplicates are ignored, so this can be a stream listener)."""
+        if entry is None or entry.duplicate:
+            return
+        with self._lock:
+            index = len(self.jobs)
+            if not self.jobs or entry.folder != self.jobs[-1].folder:
+                self._run_names.append(Path(entry.folder).name)
+                self._run_ends.append(index)
+            self.jobs.append(entry)
+            self._positions[entry.image_path] = index
+            self._run_of.append(len(self._run_names) - 1)
+            self._run_ends[-1] = index + 1
+
+    def advance(self, image_path: str):
+        """Mark a job as started; the cursor only moves forward."""
+        with self._lock:
+            index = self._positions.get(str(image_path))
+            if index is not None and index > self.cursor:
+                self.cursor = index
+
+    @property
+    def current(self) -> Optional[ManifestEntry]:
+        return self.jobs[self.cursor] if self.cursor >= 0 else None
+
+    @property
+    def remaining(self) -> int:
+        """Known jobs not started yet"""
+        return len(self.jobs) - self.cursor - 1
+
+    def upcoming_folders(self, limit: int = 3) -> Tuple[List[str], int]:
+        """
+        Folders that still have jobs after the current one
+
+        Args:
+            limit: Number of folder names to return
+
+        Returns:
+            Tuple of (first `limit` folder names, total number of such folders)
+        """
+        with self._lock:
+            if self.cursor < 0:
+                first_run = 0
+            else:
+                run = self._run_of[self.cursor]
+                first_run = run if self.cursor + 1 < self._run_ends[run] else run + 1
+            return self._run_names[first_run:first_run + limit], len(self._run_names) - first_run
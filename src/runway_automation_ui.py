@@ -6,6 +6,7 @@ from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, Optional
 import logging
+import multiprocessing
 
 # Import path utilities for dynamic path resolution
 from path_utils import path_manager
@@ -19,7 +20,23 @@ from runway_generator import RunwayActTwoBatchGenerator
 # Import unified UI styling
 from ui_styling import UIStyler
 
+# Compiled image_search_pattern matcher shared by every scan
+from filename_matcher import FilenameMatcher, is_image_file, parse_patterns
+
+# Precomputed job queue behind the live "Next" panel
+from job_manifest import WorkQueue
+
+# Columnar file table behind the dry run report
+from file_manifest import FileManifest
+
+# Parallel os.scandir traversal (exclude globs, symlink policy)
+from tree_walker import TreeWalker, get_scan_cache
+
 class RunwayAutomationUI:
+    # Dry run report: folders shown in the summary, files per page when listing
+    DRY_RUN_FOLDER_ROWS = 20
+    DRY_RUN_PAGE_SIZE = 25
+
     def __init__(self):
         # Determine the base directory based on execution context
         if getattr(sys, 'frozen', False):
@@ -55,9 +72,18 @@ class RunwayAutomationUI:
             "duplicate_detection": True,
             "delay_between_generations": 1,
             "first_run": True,  # Track if this is first time setup
-            "image_search_pattern": "genx",  # Default pattern to search for in image filenames
+            "image_search_pattern": "genx",  # Pattern (or list of patterns) to search for in image filenames
+            "exclude_patterns": [],  # Filenames matching any of these are skipped
+            "scan_exclude_globs": [],  # Files/folders to skip while scanning, e.g. ".*" or "*/archive"
+            "follow_symlinks": True,  # Descend into symlinked folders (cycles are detected)
+            "scan_workers": 8,  # Folder listings in flight at once (helps on network shares)
             "exact_match": False,  # If true, requires exact pattern match (e.g., "-selfie" won't match "selfie")
             "output_location": "centralized",  # "centralized" or "co-located"
+            "max_in_flight": 1,  # Act-Two tasks rendering server-side at the same time
+            "driver_video_upload": False,  # Upload driver video once and reference it by URI
+            "upload_api_url": "",  # Override the /uploads API root (e.g. a local mock)
+            "compare_full_decode": False,  # Also time a full image decode and log the draft-mode saving
+            "save_resized_images": False,  # Debug: also write each preprocessed image to temp_resized/
 
             # Aspect Ratio Settings
             "aspect_ratio_mode": "smart",  # "smart" (auto-select best) or specific ratio
@@ -239,7 +265,7 @@ class RunwayAutomationUI:
         print()
         # Image Selection Section (yellow)
         UIStyler.print_section_box("IMAGE SELECTION", "yellow", "full")
-        pattern = self.config.get('image_search_pattern', 'genx')
+        pattern = FilenameMatcher.from_config(self.config).pattern
         exact = "Exact" if self.config.get('exact_match', False) else "Contains"
         UIStyler.print_menu_option("6", "Configure Search Pattern", f"{pattern} - {exact}")
         UIStyler.print_menu_option("7", "DRY RUN SCAN", "Preview Images")
@@ -564,10 +590,11 @@ class RunwayAutomationUI:
         self.print_cyan("═" * 79)
         print()
 
-        current_pattern = self.config.get('image_search_pattern', 'genx')
-        exact_match = self.config.get('exact_match', False)
+        matcher = FilenameMatcher.from_config(self.config)
+        exact_match = matcher.exact_match
 
-        print(f"  Current pattern: \033[93m{current_pattern}\033[0m")
+        print(f"  Current pattern: \033[93m{matcher.pattern}\033[0m")
+        print(f"  Excluded: \033[93m{', '.join(matcher.exclude) or 'None'}\033[0m")
         print(f"  Exact match: \033[93m{'Yes' if exact_match else 'No'}\033[0m")
         print()
         print("  Examples:")
@@ -578,11 +605,16 @@ class RunwayAutomationUI:
             print(f"    Pattern 'selfie' (exact) matches: selfie.jpg but NOT my-selfie.jpg")
             print(f"    Pattern '-selfie' (exact) matches: test-selfie.jpg but NOT selfie.jpg")
         print()
+        print("  Separate several patterns with commas, e.g. genx, -selfie, _portrait")
         print("  Enter new pattern (or press Enter to keep current):")
 
         new_pattern = input("  > ").strip()
         if new_pattern:
-            self.config['image_search_pattern'] = new_pattern
+            patterns = list(parse_patterns(new_pattern))
+            self.config['image_search_pattern'] = patterns[0] if len(patterns) == 1 else patterns
+            print()
+            print("  Patterns to exclude, comma separated (or press Enter for none):")
+            self.config['exclude_patterns'] = list(parse_patterns(input("  > ").strip()))
             print()
             print("  Enable exact matching? (y/n)")
             print("    Yes = pattern must appear exactly as specified")
@@ -591,7 +623,7 @@ class RunwayAutomationUI:
             self.config['exact_match'] = exact_input == 'y'
 
             self.save_config()
-            self.print_green(f"\n✓ Pattern updated to: '{new_pattern}' (Exact: {'Yes' if self.config['exact_match'] else 'No'})")
+            self.print_green(f"\n✓ Pattern updated to: {FilenameMatcher.from_config(self.config).describe()}")
         else:
             self.print_yellow("\n✓ Pattern unchanged")
 
@@ -633,9 +665,11 @@ class RunwayAutomationUI:
         settings_table.add_column("Value", style="green")
 
         # Display all settings that affect processing
-        pattern = self.config.get('image_search_pattern', 'genx')
-        exact_match = self.config.get('exact_match', False)
+        matcher = FilenameMatcher.from_config(self.config)
+        pattern = matcher.pattern
+        exact_match = matcher.exact_match
         settings_table.add_row("📋 Search Pattern:", f"{pattern}")
+        settings_table.add_row("🚫 Excluded:", f"{', '.join(matcher.exclude) or 'None'}")
         settings_table.add_row("🎯 Match Type:", f"{'Exact word match' if exact_match else 'Contains substring'}")
         settings_table.add_row("🎬 Driver Video:", f"{Path(self.config.get('driver_video', 'Not set')).name}")
         settings_table.add_row("📁 Output Location:", f"{self.config.get('output_location', 'centralized')}")
@@ -650,14 +684,7 @@ class RunwayAutomationUI:
 
         # Scan for matching images with progress tracking
         from rich.progress import Progress, SpinnerColumn, TextColumn
-        image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp', '.tiff', '.tif'}
-        matching_files = []
-        non_matching_files = []
-        total_size = 0
-
-        # Count total files for progress tracking
-        total_files_to_scan = sum(1 for root, dirs, files in os.walk(input_folder)
-                                 for f in files if Path(f).suffix.lower() in image_extensions)
+        manifest = FileManifest(matcher.patterns)
 
         # Scan recursively with progress bar
         with Progress(
@@ -666,121 +693,178 @@ class RunwayAutomationUI:
             console=console,
             transient=True
         ) as progress:
-            scan_task = progress.add_task(
-                f"[cyan]Scanning {total_files_to_scan} image files...[/cyan]",
-                total=None
-            )
+            scan_task = progress.add_task("[cyan]Listing folders...[/cyan]", total=None)
 
+            # Entries go straight into the columnar manifest as the parallel walk yields them;
+            # sorted_rows() restores folder/name order afterwards
+            scan_root = os.path.abspath(input_folder)  # Walked paths are absolute
             scanned_count = 0
-            for root, dirs, files in os.walk(input_folder):
-                for file in files:
-                    file_path = Path(root) / file
-                    if file_path.suffix.lower() in image_extensions:
-                        filename_lower = file.lower()
-                        pattern_lower = pattern.lower()
-                        scanned_count += 1
-
-                        # Update progress
+            for directory, _, _, files in TreeWalker.from_config(self.config).walk(input_folder):
+                relative = os.path.relpath(directory, scan_root)
+                folder = FileManifest.ROOT if relative == '.' else relative
+
+                for entry in files:
+                    file = entry.name
+                    if not is_image_file(file):
+                        continue
+                    scanned_count += 1
+
+                    # Update progress (every file would redraw more than it scans)
+                    if scanned_count % 256 == 1:
                         progress.update(scan_task,
-                            description=f"[cyan]Scanning: {scanned_count}/{total_files_to_scan} - {file}[/cyan]")
-
-                        # Check if file matches pattern
-                        matches = False
-                        if exact_match:
-                            # For exact match, check if pattern appears as a complete word/segment
-                            import re
-                            # Pattern should match as a complete segment (bounded by non-alphanumeric or start/end)
-                            pattern_regex = r'(^|[^a-z0-9])' + re.escape(pattern_lower) + r'([^a-z0-9]|$)'
-                            if re.search(pattern_regex, filename_lower):
-                                matches = True
-                        else:
-                            # Simple contains check
-                            if pattern_lower in filename_lower:
-                                matches = True
-
-                        if matches:
-                            file_size = file_path.stat().st_size
-                            total_size += file_size
-                            relative_path = file_path.relative_to(input_folder)
-                            matching_files.append({
-                                'path': str(relative_path),
-                                'name': file,
-                                'size': file_size,
-                                'folder': str(relative_path.parent) if relative_path.parent != Path('.') else 'root'
-                            })
-                        else:
-                            # Track non-matching files too
-                            relative_path = file_path.relative_to(input_folder)
-                            non_matching_files.append({
-                                'name': file,
-                                'folder': str(relative_path.parent) if relative_path.parent != Path('.') else 'root'
-                            })
+                            description=f"[cyan]Scanning: {scanned_count} images - {file}[/cyan]")
+
+                    # One search classifies the file against every pattern
+                    matched_pattern = matcher.match(file)
+                    if matched_pattern is not None:
+                        stat = entry.stat()
+                        manifest.add(folder, file, stat.st_size, stat.st_mtime, matched_pattern)
+                    else:
+                        # Track non-matching files too (not stat'ed)
+                        manifest.add(folder, file)
+            total_files_to_scan = len(manifest)
 
         # Sort files by folder then by name
-        matching_files.sort(key=lambda x: (x['folder'], x['name']))
+        matching_rows = manifest.sorted_rows(manifest.matching())
+        filtered_count = len(manifest) - len(matching_rows)
+        pattern_counts = manifest.pattern_counts()
+        total_size = manifest.total_size()
 
-        # Show scan summary
+        # Summary first; per-file rows are only rendered on request
+        folder_stats = manifest.folder_stats(matching_rows)
         console.print("\n[bold cyan]═══ Scan Summary ═══[/bold cyan]")
         summary_table = Table(show_header=False, box=None)
         summary_table.add_column("", style="yellow")
         summary_table.add_column("", style="white", justify="right")
         summary_table.add_row("Total Images Scanned:", f"{total_files_to_scan}")
-        summary_table.add_row("[green]✓ Matching Pattern:[/green]", f"[green]{len(matching_files)}[/green]")
-        summary_table.add_row("[red]✗ Filtered Out:[/red]", f"[red]{len(non_matching_files)}[/red]")
+        summary_table.add_row("[green]✓ Matching Pattern:[/green]", f"[green]{len(matching_rows)}[/green]")
+        if len(pattern_counts) > 1:
+            for name, count in pattern_counts.items():
+                summary_table.add_row(f"    [dim]'{name}'[/dim]", f"[green]{count}[/green]")
+        summary_table.add_row("[red]✗ Filtered Out:[/red]", f"[red]{filtered_count}[/red]")
+        summary_table.add_row("Total Size:", f"[blue]{humanize.naturalsize(total_size, binary=True)}[/blue]")
+        summary_table.add_row("Folders with Matches:", f"[yellow]{len(folder_stats)}[/yellow]")
         console.print(summary_table)
 
-        if not matching_files:
-            console.print(Panel(f"[red]No images found matching pattern: '{pattern}'[/red]", style="red"))
+        if not matching_rows:
+            console.print(Panel(f"[red]No images found matching pattern: {matcher.describe()}[/red]", style="red"))
 
             # Show some non-matching files as examples
-            if non_matching_files:
+            if filtered_count:
                 console.print("\n[yellow]Examples of filtered files (first 10):[/yellow]")
-                for i, file_info in enumerate(non_matching_files[:10], 1):
-                    console.print(f"  {i}. {file_info['name']} [dim](in {file_info['folder']})[/dim]")
-                if len(non_matching_files) > 10:
-                    console.print(f"  ... and {len(non_matching_files) - 10} more")
+                examples = manifest.first_rows(10, manifest.filtered())
+                for i, file_info in enumerate(manifest.rows(examples), 1):
+                    console.print(f"  {i}. {file_info.name} [dim](in {file_info.folder_label})[/dim]")
+                if filtered_count > 10:
+                    console.print(f"  ... and {filtered_count - 10} more")
 
             input("\nPress Enter to continue...")
             return
 
-        # Create table for matching files
-        table = Table(title=f"Images to be Processed ({len(matching_files)} files)", show_header=True, header_style="bold magenta")
-        table.add_column("#", style="cyan", width=5)
-        table.add_column("Folder", style="yellow", width=30)
-        table.add_column("Filename", style="green", width=35)
-        table.add_column("Size", style="blue", justify="right", width=10)
-
-        # Add rows
-        for idx, file_info in enumerate(matching_files, 1):
-            size_str = humanize.naturalsize(file_info['size'], binary=True)
-            table.add_row(
-                str(idx),
-                file_info['folder'],
-                file_info['name'],
-                size_str
-            )
+        # Matches aggregated per folder, largest first
+        folder_table = Table(title=f"Images to be Processed by Folder ({len(folder_stats)} folders)",
+                             show_header=True, header_style="bold magenta")
+        folder_table.add_column("Folder", style="yellow", width=50)
+        folder_table.add_column("Images", style="green", justify="right", width=8)
+        folder_table.add_column("Size", style="blue", justify="right", width=10)
+        largest = sorted(folder_stats, key=lambda stats: stats.files, reverse=True)
+        for stats in largest[:self.DRY_RUN_FOLDER_ROWS]:
+            folder_table.add_row(FileManifest.label(stats.folder), str(stats.files), humanize.naturalsize(stats.size, binary=True))
+        console.print(folder_table)
+        if len(largest) > self.DRY_RUN_FOLDER_ROWS:
+            hidden = largest[self.DRY_RUN_FOLDER_ROWS:]
+            console.print(f"  [dim]... and {len(hidden)} more folders "
+                          f"({sum(stats.files for stats in hidden)} images)[/dim]")
 
-        console.print(table)
+        # Ask to proceed
+        while True:
+            console.print(f"\n[bold cyan]Would you like to proceed with processing these {len(matching_rows)} images?[/bold cyan]")
+            console.print("[green]Y[/green] - Yes, start processing")
+            console.print("[yellow]L[/yellow] - List the files page by page")
+            console.print("[yellow]E[/yellow] - Export the full list (JSONL or CSV)")
+            console.print("[red]N[/red] - No, return to menu")
+
+            choice = input("\nYour choice (Y/L/E/N): ").strip().lower()
+
+            if choice == 'l':
+                self.browse_dry_run_files(console, manifest, matching_rows, show_pattern=len(pattern_counts) > 1)
+            elif choice == 'e':
+                self.export_dry_run_files(console, manifest, matching_rows)
+            elif choice == 'y':
+                # Start actual processing
+                self.start_processing(input_folder)
+                return
+            else:
+                console.print("\n[yellow]Returning to menu...[/yellow]")
+                time.sleep(1)
+                return
 
-        # Summary
-        console.print(f"\n📊 [bold]Summary:[/bold]")
-        console.print(f"  • Total Images: [green]{len(matching_files)}[/green]")
-        console.print(f"  • Total Size: [blue]{humanize.naturalsize(total_size, binary=True)}[/blue]")
-        console.print(f"  • Unique Folders: [yellow]{len(set(f['folder'] for f in matching_files))}[/yellow]")
+    def browse_dry_run_files(self, console, manifest: FileManifest, rows, show_pattern: bool = False):
+        """
+        Page through dry run matches, rendering only the visible rows
 
-        # Ask to proceed
-        console.print(f"\n[bold cyan]Would you like to proceed with processing these {len(matching_files)} images?[/bold cyan]")
-        console.print("[green]Y[/green] - Yes, start processing")
-        console.print("[red]N[/red] - No, return to menu")
+        Args:
+            console: Rich console to print to
+            manifest: Dry run file manifest
+            rows: Row indexes to list, in display order
+            show_pattern: Add a column with the pattern each file matched
+        """
+        from rich.table import Table
+        import humanize
 
-        choice = input("\nYour choice (Y/N): ").strip().lower()
+        page_size = self.DRY_RUN_PAGE_SIZE
+        pages = max(1, -(-len(rows) // page_size))
+        page = 0
+        while True:
+            start = page * page_size
+            table = Table(title=f"Images to be Processed - page {page + 1}/{pages} ({len(rows)} files)",
+                          show_header=True, header_style="bold magenta")
+            table.add_column("#", style="cyan", width=7)
+            table.add_column("Folder", style="yellow", width=30)
+            table.add_column("Filename", style="green", width=35)
+            table.add_column("Size", style="blue", justify="right", width=10)
+            if show_pattern:
+                table.add_column("Pattern", style="magenta", width=12)
+
+            for idx, file_info in enumerate(manifest.rows(rows[start:start + page_size]), start + 1):
+                row = [str(idx), file_info.folder_label, file_info.name, humanize.naturalsize(file_info.size, binary=True)]
+                if show_pattern:
+                    row.append(file_info.pattern)
+                table.add_row(*row)
+            console.print(table)
+
+            choice = input("[Enter] next, [p] previous, [page number] jump, [q] back: ").strip().lower()
+            if choice == 'q':
+                return
+            if choice == 'p':
+                page = max(0, page - 1)
+            elif choice.isdigit():
+                page = min(max(int(choice) - 1, 0), pages - 1)
+            elif page + 1 < pages:
+                page += 1
+            else:
+                return
 
-        if choice == 'y':
-            # Start actual processing
-            self.start_processing(input_folder)
-        else:
-            console.print("\n[yellow]Returning to menu...[/yellow]")
-            time.sleep(1)
+    def export_dry_run_files(self, console, manifest: FileManifest, rows):
+        """
+        Stream the full dry run list to a JSONL or CSV file
+
+        Args:
+            console: Rich console to print to
+            manifest: Dry run file manifest
+            rows: Row indexes to export, in order
+        """
+        default_path = path_manager.project_dir / "logs" / f"dry_run_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+        console.print(f"\nExport file (.jsonl or .csv), or press Enter for:\n  [cyan]{default_path}[/cyan]")
+        export_path = Path(input("  > ").strip().strip('"') or default_path)
+        try:
+            export_path.parent.mkdir(parents=True, exist_ok=True)
+            written = manifest.export(str(export_path), rows)
+        except (OSError, ValueError) as e:
+            logging.error(f"Dry run export failed: {str(e)}")
+            console.print(f"[red]✗ Export failed: {str(e)}[/red]")
+            return
+        console.print(f"[green]✓ Exported {written} files to {export_path}[/green]")
 
     def show_detailed_settings(self):
         """Display all current settings in detail"""
@@ -810,11 +894,14 @@ class RunwayAutomationUI:
             ("Driver Video", self.config.get('driver_video', 'Not Set'), "✓" if Path(self.config.get('driver_video', '')).exists() else "✗"),
             ("Output Folder", self.config.get('output_folder', 'Not Set'), "✓" if Path(self.config.get('output_folder', '')).exists() else "✗"),
             ("Output Location", self.config.get('output_location', 'centralized'), "✓"),
-            ("Image Search Pattern", self.config.get('image_search_pattern', 'genx'), "✓"),
+            ("Image Search Pattern", FilenameMatcher.from_config(self.config).pattern, "✓"),
+            ("Exclude Patterns", ", ".join(FilenameMatcher.from_config(self.config).exclude) or "None", "✓"),
             ("Exact Match", "Yes" if self.config.get('exact_match', False) else "No", "✓"),
             ("Verbose Logging", "ON" if self.config.get('verbose_logging', False) else "OFF", "✓"),
             ("Duplicate Detection", "ON" if self.config.get('duplicate_detection', True) else "OFF", "✓"),
             ("Generation Delay", f"{self.config.get('delay_between_generations', 1)} seconds", "✓"),
+            ("Max In-Flight Tasks", f"{self.config.get('max_in_flight', 1)}", "✓"),
+            ("Driver Video Upload", "Upload once" if self.config.get('driver_video_upload', False) else "Inline", "✓"),
             ("─" * 20, "─" * 20, "─"),  # Separator
             ("Aspect Ratio Mode", aspect_display, "✓"),
             ("Expression Intensity", f"{self.config.get('expression_intensity', 1.0)}", "✓"),
@@ -842,8 +929,8 @@ class RunwayAutomationUI:
 
         console.print(table)
 
-        # Show pattern matching examples
-        pattern = self.config.get('image_search_pattern', 'genx')
+        # Show pattern matching examples (for the first pattern)
+        pattern = (FilenameMatcher.from_config(self.config).patterns or ('genx',))[0]
         exact = self.config.get('exact_match', False)
 
         console.print("\n[bold cyan]Pattern Matching Examples:[/bold cyan]")
@@ -995,7 +1082,9 @@ class RunwayAutomationUI:
             ("motion_smoothing", self.config.get('motion_smoothing', 0.5), "Motion smoothness (0-1)"),
             ("model_version", self.config.get('model_version', 'act_two'), "Model version"),
             ("quality", self.config.get('quality', 'standard'), "Processing quality"),
-            ("seed", self.config.get('seed', None), "Random seed (optional)")
+            ("seed", self.config.get('seed', None), "Random seed (optional)"),
+            ("max_in_flight", self.config.get('max_in_flight', 1), "Tasks rendering at once (1-10)"),
+            ("driver_video_upload", self.config.get('driver_video_upload', False), "Upload driver once, reference by URI")
         ]
 
         for param, value, desc in params:
@@ -1013,6 +1102,8 @@ class RunwayAutomationUI:
         console.print("[green]7.[/green] Quality (draft/standard/high)")
         console.print("[green]8.[/green] Random Seed (number or none)")
         console.print("[green]9.[/green] Prompt (text guidance)")
+        console.print("[green]10.[/green] Max In-Flight Tasks (1-10)")
+        console.print("[green]11.[/green] Driver Video Upload (upload once / inline)")
         console.print("[red]C.[/red] Cancel")
 
         choice = input("\nYour choice: ").strip().lower()
@@ -1115,6 +1206,26 @@ class RunwayAutomationUI:
             self.config['negative_prompt'] = neg_prompt
             self.save_config()
             console.print("\n[green]✓[/green] Prompts updated")
+        elif choice == '10':
+            value = input("Enter number of tasks to keep rendering at once (1-10): ").strip()
+            try:
+                new_value = int(value)
+                if 1 <= new_value <= 10:
+                    self.config['max_in_flight'] = new_value
+                    self.save_config()
+                    console.print(f"\n[green]✓[/green] Max in-flight tasks set to {new_value}")
+                else:
+                    console.print("\n[red]Error: Value must be between 1 and 10[/red]")
+            except ValueError:
+                console.print("\n[red]Error: Invalid number format[/red]")
+        elif choice == '11':
+            current = self.config.get('driver_video_upload', False)
+            self.config['driver_video_upload'] = not current
+            if not current:
+                console.print("\n[green]✓[/green] Driver video will be uploaded once per session and referenced by URI")
+            else:
+                console.print("\n[green]✓[/green] Driver video will be sent inline with every request")
+            self.save_config()
         elif choice.lower() == 'c':
             console.print("\n[yellow]Cancelled - no changes made[/yellow]")
         else:
@@ -1217,30 +1328,13 @@ class RunwayAutomationUI:
     def count_genx_files(self, root_directory: str) -> int:
         """Count total files matching the configured pattern"""
         count = 0
-        image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp', '.tiff', '.tif'}
-        pattern = self.config.get('image_search_pattern', 'genx').lower()
-        exact_match = self.config.get('exact_match', False)
+        matcher = FilenameMatcher.from_config(self.config)
 
         try:
-            for folder_path in Path(root_directory).iterdir():
-                if folder_path.is_dir():
-                    for file_path in folder_path.iterdir():
-                        if file_path.is_file() and file_path.suffix.lower() in image_extensions:
-                            filename_lower = file_path.name.lower()
-
-                            # Check pattern match
-                            matches = False
-                            if exact_match:
-                                import re
-                                pattern_regex = r'(^|[^a-z0-9])' + re.escape(pattern) + r'([^a-z0-9]|$)'
-                                if re.search(pattern_regex, filename_lower):
-                                    matches = True
-                            else:
-                                if pattern in filename_lower:
-                                    matches = True
-
-                            if matches:
-                                count += 1
+            # Files of the direct subfolders, listed in parallel
+            for entry in TreeWalker.from_config(self.config).files(root_directory, max_depth=1, min_depth=1):
+                if matcher.matches_image(entry.name):
+                    count += 1
         except Exception:
             pass
         return count
@@ -1258,6 +1352,7 @@ class RunwayAutomationUI:
         import threading
 
         console = Console(force_terminal=True, width=100)  # Standardized width
+        get_scan_cache().use_root(input_folder)  # Listings of a previous input folder are dropped
         UIStyler.clear_screen()
 
         # Use unified styling for header
@@ -1296,20 +1391,19 @@ class RunwayAutomationUI:
                 verbose=self.verbose_logging,
                 driver_video_path=self.config.get('driver_video')
             )
+            generator.tree_walker = TreeWalker.from_config(self.config)
             
-            genx_count = self.count_genx_files(input_folder)
-            folders = self.get_all_folders(input_folder)
-            
-            # Update loading message with new spinner
-            loading_live.update(create_loading_spinner("Filtering out duplicates..."))
-            
-            # Get actual count of files to be processed (after duplicate filtering)
+            # One discovery pass: matches, duplicate verdicts and counts for everything below
             pattern = self.config.get('image_search_pattern', 'genx')
             exact_match = self.config.get('exact_match', False)
-            total_files = 0
-            for folder in folders:
-                genx_images = generator.get_genx_image_files(folder, search_pattern=pattern, exact_match=exact_match)
-                total_files += len(genx_images)
+            exclude_patterns = self.config.get('exclude_patterns', [])
+            discovery = generator.discover_jobs(input_folder, search_pattern=pattern, exact_match=exact_match,
+                                                exclude_patterns=exclude_patterns)
+            work_queue = WorkQueue()
+            discovery.add_listener(work_queue.append)
+            if not self.verbose_logging:
+                # Scan in the background; the first image is submitted as soon as it is found
+                discovery.start()
         
         # FORCE clear screen completely - remove all duplicates and loading messages
         console.clear()
@@ -1330,7 +1424,8 @@ class RunwayAutomationUI:
                 config_table.add_column(style="cyan", justify="left", width=15)
                 config_table.add_column(style="white", justify="left")
                 
-                config_table.add_row("Files Amt:", f"{total_files} GenX files")
+                config_table.add_row("Files Amt:", f"{discovery.found} GenX files" if discovery.done
+                                     else "Counting while processing starts")
                 config_table.add_row("Driver video:", Path(self.config['driver_video']).name)
                 config_table.add_row("Output folder:", "Downloads")
                 config_table.add_row("Verbose mode:", "Hidden")
@@ -1355,7 +1450,15 @@ class RunwayAutomationUI:
                     console=console
                 ) as progress:
                     
-                    main_task = progress.add_task("📊 [cyan]0% complete[/cyan] • 🎬 Processing GenX files... 🚀", total=total_files)
+                    main_task = progress.add_task("📊 [cyan]0% complete[/cyan] • 🎬 Processing GenX files... 🚀",
+                                                  total=discovery.found if discovery.done else None)
+
+                    def refine_total(entry):
+                        # Runs on the discovery thread as images are found
+                        if entry is None or not entry.duplicate:
+                            progress.update(main_task, total=discovery.found)
+
+                    discovery.add_listener(refine_total)
                     
                     # Add colorful spinners below progress bar
                     status_text = "Loading..."
@@ -1396,24 +1499,13 @@ class RunwayAutomationUI:
                         next_text = Text()
                         next_text.append("🔮 Next: ", style="bright_magenta bold")
                         
-                        # Get all remaining files that come AFTER current one
-                        all_remaining = []
-                        current_found = False
-                        for folder in folders:
-                            genx_images = generator.get_genx_image_files(folder, search_pattern=pattern, exact_match=exact_match)
-                            for img in genx_images:
-                                img_name = Path(img).name
-                                if current_found:
-                                    all_remaining.append(Path(folder).name)
-                                    break
-                                elif "Generating:" in status_text and img_name in status_text:
-                                    current_found = True
+                        # Folders with jobs after the current one, read from the precomputed queue
+                        display, remaining_folders = work_queue.upcoming_folders(3)
                         
-                        if all_remaining:
-                            display = all_remaining[:3]
+                        if display:
                             folder_list = ", ".join(display)
-                            if len(all_remaining) > 3:
-                                folder_list += f" (+{len(all_remaining)-3} more)"
+                            if remaining_folders > 3:
+                                folder_list += f" (+{remaining_folders-3} more)"
                             next_text.append(folder_list, style="bright_yellow")
                         else:
                             next_text.append("All processing complete", style="bright_green")
@@ -1430,201 +1522,52 @@ class RunwayAutomationUI:
                             live.update(create_colorful_spinners())
                         
                         # Process files with BOTH progress bar AND spinner updates
-                        for folder in folders:
-                            folder_name = Path(folder).name
-                            genx_images = generator.get_genx_image_files(folder, search_pattern=pattern, exact_match=exact_match)
-                            
-                            if not genx_images:
-                                continue
-                            
-                            specific_output = Path(self.config['output_folder'])
-                            
-                            for image_path in genx_images:
-                                image_name = Path(image_path).name
-                                
-                                # Update progress bar to show percentage during processing
-                                status_text = f"Generating: {image_name}"
-                                current_pct = int((processed / total_files) * 100) if total_files > 0 else 0
-                                progress.update(main_task, description=f"📊 [cyan]{current_pct}% complete[/cyan] • ⏳")
-                                update_spinners(status_text)
-                                
-                                try:
-                                    result = generator.create_act_two_generation(
-                                        character_image_path=image_path,
-                                        output_folder=str(specific_output),
-                                        config=self.config  # Pass all configuration settings
-                                    )
-                                except Exception as e:
-                                    result = None
-                                    # Log detailed error information
-                                    error_msg = f"Failed to process {image_name}: {str(e)}"
-                                    logging.error(error_msg)
-                                    if self.verbose_logging:
-                                        import traceback
-                                        logging.error(f"Full traceback: {traceback.format_exc()}")
-                                        print(f"ERROR: {error_msg}")
-                                        print(f"Traceback: {traceback.format_exc()}")
-                                
-                                processed += 1
-                                completion_pct = int((processed / total_files) * 100) if total_files > 0 else 0
-                                
-                                # Update main progress bar with dynamic percentage
-                                if result:
-                                    progress.update(main_task, 
-                                        completed=processed,
-                                        description=f"📊 [cyan]{completion_pct}% complete[/cyan] • ✅")
-                                    update_spinners(f"Completed: {image_name}")
-                                else:
-                                    progress.update(main_task, 
-                                        completed=processed,
-                                        description=f"📊 [cyan]{completion_pct}% complete[/cyan] • ❌")
-                                    update_spinners(f"Failed: {image_name}")
-                                
-                                if self.config['delay_between_generations'] > 0:
-                                    time.sleep(self.config['delay_between_generations'])
+                        def processing_jobs():
+                            # Determine output folder: None keeps each video next to its image
+                            if self.config.get("output_location", "centralized") == "co-located":
+                                return discovery.job_pairs()
+                            return discovery.job_pairs(str(Path(self.config['output_folder'])))
+
+                        def on_submit(image_path):
+                            work_queue.advance(image_path)
+                            # Update progress bar to show percentage during processing
+                            total_files = discovery.found
+                            current_pct = int((processed / total_files) * 100) if total_files > 0 else 0
+                            progress.update(main_task, description=f"📊 [cyan]{current_pct}% complete[/cyan] • ⏳")
+                            update_spinners(f"Generating: {Path(image_path).name}")
+
+                        for image_path, result in generator.generate_batch(
+                            processing_jobs(),
+                            config=self.config,  # Pass all configuration settings
+                            max_in_flight=self.config.get('max_in_flight', 1),
+                            delay_between_generations=self.config['delay_between_generations'],
+                            on_submit=on_submit
+                        ):
+                            image_name = Path(image_path).name
+                            processed += 1
+                            total_files = discovery.found
+                            completion_pct = int((processed / total_files) * 100) if total_files > 0 else 0
+
+                            # Update main progress bar with dynamic percentage
+                            if result:
+                                progress.update(main_task, 
+                                    completed=processed,
+                                    description=f"📊 [cyan]{completion_pct}% complete[/cyan] • ✅")
+                                update_spinners(f"Completed: {image_name}")
+                            else:
+                                progress.update(main_task, 
+                                    completed=processed,
+                                    description=f"📊 [cyan]{completion_pct}% complete[/cyan] • ❌")
+                                update_spinners(f"Failed: {image_name}")
                         
                         # Final update
+                        total_files = discovery.found
                         if total_files > 0:
-                            progress.update(main_task, completed=total_files, 
+                            progress.update(main_task, completed=total_files, total=total_files,
                                 description="📊 [cyan]100% complete[/cyan] • 🎉 All files processed!")
                             update_spinners("Processing complete!")
                         
                         time.sleep(2)
-                        # Calculate elapsed time
-                        elapsed = time.time() - start_time
-                        elapsed_str = f"{int(elapsed//60)}:{int(elapsed%60):02d}"
-                        
-                        # Main progress with cyan colors
-                        main_text = Text()
-                        if processed > 0:
-                            pct = int((processed / total_files) * 100) if total_files > 0 else 0
-                            main_text.append(f"{pct}% complete • ", style="bright_cyan")
-                            if "Generating:" in status_text:
-                                filename = status_text.replace("Generating: ", "") 
-                                main_text.append("Generating: ", style="bright_cyan bold")
-                                main_text.append(filename, style="white")
-                            else:
-                                main_text.append("Processing GenX files...", style="bright_cyan")
-                            
-                            # Add colorful progress bar
-                            bar_length = 25
-                            filled = int((pct / 100) * bar_length)
-                            bar = "█" * filled + "░" * (bar_length - filled)
-                            main_text.append(f"  {bar}  {processed}/{total_files} • {elapsed_str}", style="bright_cyan")
-                        else:
-                            main_text.append("Processing GenX files... ", style="bright_cyan")
-                            bar = "░" * 25
-                            main_text.append(f"  {bar}  0/{total_files} • {elapsed_str}", style="bright_cyan")
-                        main_spinner = Spinner("dots", text=main_text, style="bright_cyan")
-                        
-                        # Activity with bright green spinner
-                        activity_text = Text()
-                        activity_text.append("Activity: ", style="bright_green bold")
-                        activity_text.append(status_text, style="bright_cyan")
-                        activity_spinner = Spinner("dots", text=activity_text, style="bright_green")
-                        
-                        # Action with bright blue spinner
-                        action_text = Text()
-                        action_text.append("Action: ", style="bright_blue bold")
-                        action_text.append("Monitoring for interrupts...", style="bright_white")
-                        action_spinner = Spinner("dots", text=action_text, style="bright_blue")
-                        
-                        # Next with bright magenta spinner
-                        next_text = Text()
-                        next_text.append("Next: ", style="bright_magenta bold")
-                        remaining = [Path(f).name for f in folders if generator.get_genx_image_files(f, search_pattern=pattern, exact_match=exact_match)]
-                        if remaining and processed < total_files:
-                            display = remaining[:3]
-                            folder_list = ", ".join(display) 
-                            if len(remaining) > 3:
-                                folder_list += f" (+{len(remaining)-3} more)"
-                            next_text.append(folder_list, style="bright_yellow")
-                        else:
-                            next_text.append("All processing complete", style="bright_green")
-                        next_spinner = Spinner("dots", text=next_text, style="bright_magenta")
-                        
-                        return Group(main_spinner, activity_spinner, action_spinner, next_spinner)
-                
-                # Use Rich Live display with Rich Spinners
-                with Live(create_status_display(), console=console, refresh_per_second=10) as live:
-                    def update_status_live(new_text):
-                        nonlocal status_text
-                        status_text = new_text
-                        live.update(create_status_display())
-                    
-                    # Process files with spinner updates only
-                    for folder in folders:
-                            folder_name = Path(folder).name
-                            # Use generator's duplicate-filtered method instead of local method
-                            genx_images = generator.get_genx_image_files(folder, search_pattern=pattern, exact_match=exact_match)
-                            
-                            if not genx_images:
-                                continue
-                            
-                            # Determine output location based on configuration
-                            if self.config.get("output_location", "centralized") == "co-located":
-                                # Save to same folder as source image
-                                specific_output = Path(image_path).parent if genx_images else Path(self.config['output_folder'])
-                            else:
-                                # Save to centralized output folder
-                                specific_output = Path(self.config['output_folder'])
-
-                            status_text = f"Processing folder: {folder_name}"
-                            progress.update(main_task, description=f"📂 Processing: {folder_name}")
-                            update_status_live(status_text)
-
-                            for image_path in genx_images:
-                                image_name = Path(image_path).name
-                                status_text = f"Generating: {image_name}"
-                                progress.update(main_task, description=f"🎬 [cyan]Generating:[/cyan] {image_name}")
-                                update_status_live(status_text)
-
-                                # Determine output folder for this specific image
-                                if self.config.get("output_location", "centralized") == "co-located":
-                                    output_for_this_image = str(Path(image_path).parent)
-                                else:
-                                    output_for_this_image = str(specific_output)
-
-                                try:
-                                    result = generator.create_act_two_generation(
-                                        character_image_path=image_path,
-                                        output_folder=output_for_this_image,
-                                        config=self.config  # Pass all configuration settings
-                                    )
-                                except Exception as e:
-                                    result = None
-                                    # Log detailed error information
-                                    error_msg = f"Failed to process {image_name}: {str(e)}"
-                                    logging.error(error_msg)
-                                    if self.verbose_logging:
-                                        import traceback
-                                        logging.error(f"Full traceback: {traceback.format_exc()}")
-                                        print(f"ERROR: {error_msg}")
-                                        print(f"Traceback: {traceback.format_exc()}")
-                                    update_status_live(f"Error: {image_name} - {str(e)}")
-                                
-                                processed += 1
-                                completion_pct = int((processed / total_files) * 100) if total_files > 0 else 0
-                                
-                                if result:
-                                    progress.update(main_task, 
-                                        completed=processed,
-                                        description=f"📊 [cyan]{completion_pct}% complete[/cyan] • ✅ {image_name}")
-                                    update_status_live(f"Completed: {image_name}")
-                                else:
-                                    progress.update(main_task, 
-                                        completed=processed,
-                                        description=f"📊 [cyan]{completion_pct}% complete[/cyan] • ❌ {image_name}")
-                                    update_status_live(f"Failed: {image_name}")
-                                
-                                if self.config['delay_between_generations'] > 0:
-                                    time.sleep(self.config['delay_between_generations'])
-                    
-                    # Final update
-                    if total_files > 0:
-                        update_status_live("Processing complete!")
-                    
-                    time.sleep(2)
                         
             else:
                 # Verbose processing - let all logs show
@@ -1639,7 +1582,9 @@ class RunwayAutomationUI:
                     target_directory=input_folder,
                     output_directory=self.config['output_folder'] if output_location == "centralized" else None,
                     delay_between_generations=self.config['delay_between_generations'],
-                    co_located_output=(output_location == "co-located")
+                    co_located_output=(output_location == "co-located"),
+                    max_in_flight=self.config.get('max_in_flight', 1),
+                    manifest=discovery.manifest()
                 )
                     
         except Exception as e:
@@ -1679,10 +1624,10 @@ class RunwayAutomationUI:
         """Get all folders that contain images matching the configured pattern"""
         folders = []
         try:
-            for folder_path in Path(root_directory).iterdir():
-                if folder_path.is_dir():
-                    if self.get_genx_files_in_folder(str(folder_path)):
-                        folders.append(str(folder_path))
+            subdirs, _ = TreeWalker.from_config(self.config).scan(root_directory)
+            for entry in subdirs:
+                if self.get_genx_files_in_folder(entry.path):
+                    folders.append(entry.path)
         except Exception:
             pass
         return folders
@@ -1690,28 +1635,11 @@ class RunwayAutomationUI:
     def get_genx_files_in_folder(self, folder_path: str):
         """Get files matching the configured pattern in a specific folder"""
         matching_files = []
-        image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp', '.tiff', '.tif'}
-        pattern = self.config.get('image_search_pattern', 'genx').lower()
-        exact_match = self.config.get('exact_match', False)
+        matcher = FilenameMatcher.from_config(self.config)
 
         try:
-            for file_path in Path(folder_path).iterdir():
-                if file_path.is_file() and file_path.suffix.lower() in image_extensions:
-                    filename_lower = file_path.name.lower()
-
-                    # Check pattern match
-                    matches = False
-                    if exact_match:
-                        import re
-                        pattern_regex = r'(^|[^a-z0-9])' + re.escape(pattern) + r'([^a-z0-9]|$)'
-                        if re.search(pattern_regex, filename_lower):
-                            matches = True
-                    else:
-                        if pattern in filename_lower:
-                            matches = True
-
-                    if matches:
-                        matching_files.append(str(file_path))
+            _, files = TreeWalker.from_config(self.config).scan(folder_path)
+            matching_files.extend(entry.path for entry in files if matcher.matches_image(entry.name))
         except Exception:
             pass
         return matching_files
@@ -1818,4 +1746,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # Image preprocessing workers re-enter here in the frozen build; they must not start the UI
+    multiprocessing.freeze_support()
     main()
@@ -1,18 +1,266 @@
 import os
+import re
 import base64
 import time
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+from typing import List, Dict, Optional, Tuple, Iterable, Iterator, Callable
 import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
 import logging
 from PIL import Image
 
 # Import path utilities
 from path_utils import path_manager
 
+# Shared deadline-ordered task poller with adaptive poll timing
+from task_poller import TaskPoller, RenderLatencyStats
+
+# Content-addressed cache of encoded driver videos and their upload references
+from driver_cache import DriverVideoCache
+
+# Streamed JSON bodies with memory-mapped driver data
+from generation_payload import InlineData, StreamingJsonBody, GenerationTemplate
+
+# In-memory crop/resize/encode of character images
+from image_preprocessing import PreprocessPipeline, preprocess_image, timing_summary, select_best_ratio as closest_ratio
+
+# Reruns reuse preprocessed character images
+from image_cache import PreprocessedImageCache
+
+# Persistent catalog and token index of existing videos for duplicate detection
+from video_catalog import VideoCatalog, VideoIndex, get_video_catalog
+
+# Compiled image_search_pattern matcher shared with the UI scans
+from filename_matcher import FilenameMatcher, get_matcher, is_image_file
+
+# Scan-once job list consumed by the UI and process_all_images
+from job_manifest import DiscoveryStream, JobManifest, ManifestEntry
+
+# Parallel os.scandir traversal of input folders
+from tree_walker import TreeWalker
+
 # Get logger instance (don't configure here - let UI handle it)
 logger = logging.getLogger(__name__)
 
+RUNWAY_API_BASE_URL = "https://api.dev.runwayml.com/v1"
+
+# Ephemeral uploads stay valid for 24 hours; refresh a little early
+DRIVER_UPLOAD_TTL = 23 * 3600
+
+# Error text that blames the uploaded driver reference rather than the character image or settings
+REFERENCE_ERROR_PATTERN = re.compile(r"reference|runway://|asset uri|upload", re.IGNORECASE)
+
+
+class RunwayHttpClient:
+    """
+    Keep-alive HTTP client shared by every generator instance and thread.
+    One requests.Session with connection pools sized per host, so task
+    creation, status polls and downloads reuse TCP+TLS connections.
+    """
+
+    API_POOL_SIZE = 16  # Concurrent connections kept open to the Runway API
+    CDN_POOL_SIZE = 16  # Concurrent connections kept open per download host
+
+    # (connect, read) timeouts in seconds
+    API_TIMEOUT = (10, 120)  # Task creation - large request bodies
+    STATUS_TIMEOUT = (10, 30)  # Task status polls
+    DOWNLOAD_TIMEOUT = (10, 120)  # Video downloads
+
+    DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # Bytes held in memory per download at a time
+    DOWNLOAD_ATTEMPTS = 5  # Connections tried per download (or segment) before giving up
+    SEGMENT_MIN_SIZE = 32 * 1024 * 1024  # Only split downloads at least this large
+
+    def __init__(self, api_base_url: str = RUNWAY_API_BASE_URL, transport: Optional[BaseAdapter] = None):
+        """
+        Initialize the client.
+
+        Args:
+            api_base_url: Base URL of the Runway API, which gets its own pool
+            transport: Optional adapter used for every request instead of the
+                pooled HTTPAdapters (e.g. a local mock or a test double)
+        """
+        self.session = requests.Session()
+        if transport is not None:
+            self.mount("https://", transport)
+            self.mount("http://", transport)
+        else:
+            # Default pools serve the CDN and any other host
+            self.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=self.CDN_POOL_SIZE))
+            self.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=self.CDN_POOL_SIZE))
+            # Most specific prefix wins, so the API host gets a dedicated pool
+            api_url = urlsplit(api_base_url)
+            api_root = f"{api_url.scheme}://{api_url.netloc}/"
+            self.mount(api_root, HTTPAdapter(pool_connections=1, pool_maxsize=self.API_POOL_SIZE))
+
+    def mount(self, prefix: str, adapter: BaseAdapter):
+        """Route requests whose URL starts with prefix through adapter (transport hook)."""
+        self.session.mount(prefix, adapter)
+
+    def request(self, method: str, url: str, timeout=API_TIMEOUT, **kwargs) -> requests.Response:
+        """Send a request over the shared session; always bounded by a timeout."""
+        return self.session.request(method, url, timeout=timeout, **kwargs)
+
+    def get(self, url: str, timeout=STATUS_TIMEOUT, **kwargs) -> requests.Response:
+        """GET with status-poll timeouts unless overridden."""
+        return self.request("GET", url, timeout=timeout, **kwargs)
+
+    def post(self, url: str, timeout=API_TIMEOUT, **kwargs) -> requests.Response:
+        """POST with task-creation timeouts unless overridden."""
+        return self.request("POST", url, timeout=timeout, **kwargs)
+
+    def download(self, url: str, dest_path, segments: int = 1, timeout=DOWNLOAD_TIMEOUT) -> bool:
+        """
+        Stream a file to disk without holding it in memory.
+
+        Data is written in chunks to a '.part' file unique to this download and
+        atomically renamed into place once complete, so concurrent downloads to
+        the same destination never share a partial file. A dropped connection
+        resumes from the bytes already on disk with an HTTP Range request.
+
+        Args:
+            url: URL to download
+            dest_path: Final file path
+            segments: Fetch files of at least SEGMENT_MIN_SIZE bytes in this many
+                parallel ranged segments (1 = single stream)
+            timeout: (connect, read) timeout per request
+
+        Returns:
+            True when the complete file is in place at dest_path
+        """
+        dest_path = Path(dest_path)
+        dest_path.parent.mkdir(parents=True, exist_ok=True)
+        part_path = dest_path.with_name(f"{dest_path.name}.{uuid.uuid4().hex[:12]}.part")
+
+        try:
+            size = self._probe_size(url, timeout) if segments > 1 else None
+            if size and size >= self.SEGMENT_MIN_SIZE:
+                self._download_segments(url, part_path, size, segments, timeout)
+            else:
+                self._download_stream(url, part_path, timeout)
+
+            os.replace(part_path, dest_path)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to download {url}: {str(e)}")
+            try:
+                if part_path.exists():
+                    part_path.unlink()
+            except OSError:
+                pass
+            return False
+
+    def _download_stream(self, url: str, part_path: Path, timeout):
+        """Single-stream download into part_path, resuming after interruptions."""
+        validator = None  # ETag/Last-Modified of the first response, sent as If-Range
+        expected_size = None
+
+        for attempt in range(1, self.DOWNLOAD_ATTEMPTS + 1):
+            offset = part_path.stat().st_size if part_path.exists() else 0
+            headers = {}
+            if offset:
+                headers["Range"] = f"bytes={offset}-"
+                if validator:
+                    headers["If-Range"] = validator
+
+            try:
+                with self.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                    if response.status_code == 206 and offset:
+                        mode = 'ab'
+                    elif response.status_code == 200:
+                        # Fresh start (or the server ignored our Range) - rewrite from zero
+                        mode = 'wb'
+                        etag = response.headers.get("ETag")
+                        validator = etag if etag and not etag.startswith("W/") else response.headers.get("Last-Modified")
+                        length = response.headers.get("Content-Length")
+                        expected_size = int(length) if length and length.isdigit() else None
+                    elif response.status_code == 416 and expected_size == offset:
+                        return
+                    else:
+                        raise IOError(f"HTTP {response.status_code}")
+
+                    with open(part_path, mode) as f:
+                        for chunk in response.iter_content(self.DOWNLOAD_CHUNK_SIZE):
+                            f.write(chunk)
+
+                received = part_path.stat().st_size
+                if expected_size is None or received == expected_size:
+                    return
+                raise requests.ConnectionError(f"connection closed after {received} of {expected_size} bytes")
+
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                received = part_path.stat().st_size if part_path.exists() else 0
+                logger.warning(f"Download interrupted at {received} bytes "
+                               f"(attempt {attempt}/{self.DOWNLOAD_ATTEMPTS}): {str(e)}")
+
+        raise IOError(f"gave up after {self.DOWNLOAD_ATTEMPTS} attempts")
+
+    def _probe_size(self, url: str, timeout) -> Optional[int]:
+        """Total size of a range-capable resource, or None if ranges are unsupported."""
+        # A one-byte ranged GET works with signed CDN URLs that reject HEAD
+        with self.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=timeout) as response:
+            content_range = response.headers.get("Content-Range", "")
+            if response.status_code != 206 or "/" not in content_range:
+                return None
+            total = content_range.rsplit("/", 1)[1]
+            return int(total) if total.isdigit() else None
+
+    def _download_segments(self, url: str, part_path: Path, size: int, segments: int, timeout):
+        """Fetch a file as parallel ranged segments written in place into part_path."""
+        with open(part_path, 'wb') as f:
+            f.truncate(size)
+
+        segment_size = -(-size // segments)
+        ranges = [(start, min(start + segment_size, size) - 1) for start in range(0, size, segment_size)]
+        with ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix="download") as executor:
+            for future in [executor.submit(self._fetch_range, url, part_path, start, end, timeout)
+                           for start, end in ranges]:
+                future.result()
+
+    def _fetch_range(self, url: str, part_path: Path, start: int, end: int, timeout):
+        """Fetch bytes start..end (inclusive) into part_path, resuming within the segment."""
+        position = start
+        for attempt in range(1, self.DOWNLOAD_ATTEMPTS + 1):
+            try:
+                with self.get(url, headers={"Range": f"bytes={position}-{end}"}, stream=True, timeout=timeout) as response:
+                    if response.status_code != 206:
+                        raise IOError(f"HTTP {response.status_code} for range {position}-{end}")
+                    # Each segment writes through its own handle at its own offset
+                    with open(part_path, 'r+b') as f:
+                        f.seek(position)
+                        for chunk in response.iter_content(self.DOWNLOAD_CHUNK_SIZE):
+                            f.write(chunk)
+                            position += len(chunk)
+                if position > end:
+                    return
+                raise requests.ConnectionError(f"segment closed at byte {position} of {end}")
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                logger.warning(f"Segment {start}-{end} interrupted at byte {position} "
+                               f"(attempt {attempt}/{self.DOWNLOAD_ATTEMPTS}): {str(e)}")
+
+        raise IOError(f"segment {start}-{end} gave up after {self.DOWNLOAD_ATTEMPTS} attempts")
+
+    def close(self):
+        """Close all pooled connections."""
+        self.session.close()
+
+
+_shared_http_client: Optional[RunwayHttpClient] = None
+_shared_http_client_lock = threading.Lock()
+
+
+def get_http_client() -> RunwayHttpClient:
+    """Return the process-wide HTTP client, creating it on first use"""
+    global _shared_http_client
+    with _shared_http_client_lock:
+        if _shared_http_client is None:
+            _shared_http_client = RunwayHttpClient()
+        return _shared_http_client
+
+
 class RunwayActTwoBatchGenerator:
     # Available Act Two API ratios with dimensions
     AVAILABLE_RATIOS = {
@@ -35,15 +283,45 @@ class RunwayActTwoBatchGenerator:
             default_video = path_manager.get_default_driver_video()
             self.driver_video_path = str(default_video) if default_video else ""
 
-        self.driver_video_data_uri = None  # Will store encoded driver video
-        self.base_url = "https://api.dev.runwayml.com/v1"
+        self.driver_video_data_uri = None  # InlineData view of the encoded driver video
+        self.driver_video_reference = None  # {"uri", "expires_at"} once uploaded via /uploads
+        self._driver_upload_failed = False  # Stop retrying uploads for this session
+        self._driver_upload_api_url = None  # API root the current driver reference was uploaded through
+        self._driver_lock = threading.RLock()  # Guards lazy driver encoding and uploads across worker threads
+        self._generation_template = None  # Compiled payload for the current batch
+        self.driver_cache = DriverVideoCache()  # Survives across generator instances and processes
+        self.base_url = RUNWAY_API_BASE_URL
+        self.http = get_http_client()  # Pooled keep-alive connections shared by all generators
+        self.download_segments = 1  # Parallel ranged segments for large video downloads
+        self.save_resized_images = False  # Debug: also write preprocessed images to temp_resized/
+        self.preprocess_ahead = 2  # Images preprocessed in worker processes ahead of submission (0 = inline)
+        self.image_cache = PreprocessedImageCache()  # Size-capped LRU of encoded character images
+        self._prefetched = {}  # image path -> Futures of background preprocessing results
+        self._prefetch_lock = threading.Lock()
+        self._reserved_outputs = set()  # Output paths already claimed by this session's jobs
+        self._output_lock = threading.Lock()
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
             "X-Runway-Version": "2024-11-06"
         }
+        # Task polling settings - one shared poller serves every outstanding task
+        self.adaptive_polling = True  # Shape polls around observed render times
+        self.poll_interval = 10  # Seconds between status checks when not adaptive
+        self.max_wait = 600  # 10 minutes - timeout until enough render times are observed
+        self.status_requests_per_second = 5.0  # Rate cap across all outstanding tasks
+        self.latency_stats = RenderLatencyStats(
+            path_manager.project_dir / "cache" / "render_latency.json",
+            default_timeout=self.max_wait
+        )
+        self._task_poller = None
         # Downloads folder for duplicate checking
         self.downloads_folder = str(path_manager.downloads_dir)
+        self.video_catalog: Optional[VideoCatalog] = None  # Shared project catalog, opened on first use
+        self._video_indexes = {}  # folder -> VideoIndex, loaded once per generator
+        self._video_index_lock = threading.Lock()
+        # Input folder traversal: exclude globs, symlink policy and parallel listings
+        self.tree_walker = TreeWalker()
         
     def encode_image_to_data_uri(self, image_path: str) -> str:
         """Convert local image file to base64 data URI"""
@@ -52,16 +330,8 @@ class RunwayActTwoBatchGenerator:
                 image_data = f.read()
             
             # Determine image format
-            ext = Path(image_path).suffix.lower()
-            if ext in ['.jpg', '.jpeg']:
-                mime_type = 'image/jpeg'
-            elif ext == '.png':
-                mime_type = 'image/png'
-            elif ext == '.webp':
-                mime_type = 'image/webp'
-            else:
-                mime_type = 'image/jpeg'  # Default
-            
+            mime_type = self.image_mime_type(image_path)
+
             # Encode to base64
             encoded = base64.b64encode(image_data).decode('utf-8')
             return f"data:{mime_type};base64,{encoded}"
@@ -78,15 +348,7 @@ class RunwayActTwoBatchGenerator:
                 video_data = f.read()
             
             # Determine video format 
-            ext = Path(video_path).suffix.lower()
-            if ext == '.mp4':
-                mime_type = 'video/mp4'
-            elif ext == '.mov':
-                mime_type = 'video/quicktime'
-            elif ext == '.webm':
-                mime_type = 'video/webm'
-            else:
-                mime_type = 'video/mp4'  # Default
+            mime_type = self.video_mime_type(video_path)
             
             # Encode to base64
             encoded = base64.b64encode(video_data).decode('utf-8')
@@ -96,6 +358,28 @@ class RunwayActTwoBatchGenerator:
             logger.error(f"Error encoding video {video_path}: {str(e)}")
             return None
 
+    @staticmethod
+    def image_mime_type(image_path: str) -> str:
+        """MIME type for a character image based on its extension"""
+        ext = Path(image_path).suffix.lower()
+        if ext in ['.jpg', '.jpeg']:
+            return 'image/jpeg'
+        elif ext == '.png':
+            return 'image/png'
+        elif ext == '.webp':
+            return 'image/webp'
+        return 'image/jpeg'  # Default
+
+    @staticmethod
+    def video_mime_type(video_path: str) -> str:
+        """MIME type for a driver video based on its extension"""
+        ext = Path(video_path).suffix.lower()
+        if ext == '.mov':
+            return 'video/quicktime'
+        elif ext == '.webm':
+            return 'video/webm'
+        return 'video/mp4'  # Default (and .mp4)
+
     def analyze_image_aspect_ratio(self, image_path: str) -> Tuple[float, int, int]:
         """
         Analyze the aspect ratio of an input image
@@ -124,19 +408,7 @@ class RunwayActTwoBatchGenerator:
         Returns:
             Dict with the best matching ratio configuration
         """
-        best_ratio = None
-        min_difference = float('inf')
-
-        for ratio_name, ratio_config in self.AVAILABLE_RATIOS.items():
-            # Calculate the difference between image aspect and this ratio
-            difference = abs(image_aspect - ratio_config["aspect"])
-
-            if difference < min_difference:
-                min_difference = difference
-                best_ratio = {
-                    "name": ratio_name,
-                    **ratio_config
-                }
+        best_ratio = closest_ratio(image_aspect, self.AVAILABLE_RATIOS)
 
         logger.info(f"Selected ratio {best_ratio['name']} (aspect: {best_ratio['aspect']:.3f}) "
                    f"for image aspect {image_aspect:.3f}")
@@ -155,66 +427,123 @@ class RunwayActTwoBatchGenerator:
             Path to resized image
         """
         try:
-            # Create temp folder if it doesn't exist
-            temp_path = Path(temp_folder)
-            temp_path.mkdir(exist_ok=True)
+            processed = preprocess_image(image_path, target_ratio)
+            return str(self._save_resized_image(image_path, target_ratio, processed["data"], temp_folder))
 
-            # Open the image
-            with Image.open(image_path) as img:
-                # Convert to RGB if necessary
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
+        except Exception as e:
+            logger.error(f"Error resizing image {image_path}: {str(e)}")
+            return image_path  # Return original if resizing fails
 
-                original_width, original_height = img.size
-                target_width = target_ratio["width"]
-                target_height = target_ratio["height"]
-                target_aspect = target_ratio["aspect"]
-                current_aspect = original_width / original_height
+    def _save_resized_image(self, image_path: str, target_ratio: dict, data: bytes,
+                            temp_folder: str = "temp_resized") -> Path:
+        """Write a preprocessed JPEG to the temp folder (debugging aid)"""
+        temp_path = Path(temp_folder)
+        temp_path.mkdir(exist_ok=True)
+        ratio_name = target_ratio["name"].replace(":", "x")
+        resized_path = temp_path / f"{Path(image_path).stem}_{ratio_name}.jpg"
+        resized_path.write_bytes(data)
+        logger.info(f"Resized image saved: {resized_path}")
+        return resized_path
 
-                logger.info(f"Resizing from {original_width}x{original_height} to {target_width}x{target_height}")
+    def preprocess_character_image(self, image_path: str, target_ratio: Optional[dict] = None,
+                                   compare_full_decode: bool = False,
+                                   save_resized_images: Optional[bool] = None) -> Optional[Dict]:
+        """
+        Pick the ratio, resize and encode the character image as a data URI in memory
 
-                # Calculate crop to match target aspect ratio
-                if current_aspect > target_aspect:
-                    # Image is wider than target, crop width
-                    new_width = int(original_height * target_aspect)
-                    new_height = original_height
-                    left = (original_width - new_width) // 2
-                    top = 0
-                    right = left + new_width
-                    bottom = original_height
+        The image is decoded once, near the target scale, and the result is kept
+        in image_cache so reruns skip the work. Nothing else is written to disk
+        unless save_resized_images is set (the config key, or the attribute of
+        the same name by default). If resizing fails the original image
+        is sent unchanged.
 
-                    crop_percent = ((original_width - new_width) / original_width) * 100
-                    logger.info(f"Cropping {crop_percent:.1f}% from width (centered)")
-                else:
-                    # Image is taller than target, crop height
-                    new_width = original_width
-                    new_height = int(original_width / target_aspect)
-                    left = 0
-                    top = (original_height - new_height) // 2
-                    right = original_width
-                    bottom = top + new_height
+        Args:
+            image_path: Path to the character image
+            target_ratio: Fixed target ratio, or None to pick the closest one
+            compare_full_decode: Also time a full-resolution decode and log the saving
+            save_resized_images: Also write the result to temp_resized/ (None uses self.save_resized_images)
 
-                    crop_percent = ((original_height - new_height) / original_height) * 100
-                    logger.info(f"Cropping {crop_percent:.1f}% from height (centered)")
+        Returns:
+            Dict with 'data_uri' (InlineData) and 'target_ratio', or None if the
+            image could not be read at all
+        """
+        processed = self._take_prefetched(image_path, target_ratio)
+        if processed is None:
+            try:
+                processed = self.image_cache.get(image_path, target_ratio, self.AVAILABLE_RATIOS)
+            except Exception as e:
+                logger.warning(f"Could not read preprocessed image cache for {image_path}: {str(e)}")
+        try:
+            if processed is None:
+                processed = preprocess_image(image_path, target_ratio, ratios=self.AVAILABLE_RATIOS,
+                                             compare_full_decode=compare_full_decode)
+                logger.info(timing_summary(processed))
+        except Exception as e:
+            logger.error(f"Error resizing image {image_path}: {str(e)}")
+            if target_ratio is None:
+                image_aspect, _, _ = self.analyze_image_aspect_ratio(image_path)
+                target_ratio = self.select_best_ratio(image_aspect)
+            try:
+                data_uri = InlineData.from_file(image_path, self.image_mime_type(image_path))
+            except Exception as e:
+                logger.error(f"Failed to encode character image {image_path}: {str(e)}")
+                return None
+            return {"data_uri": data_uri, "target_ratio": target_ratio}
 
-                # Crop the image
-                cropped_img = img.crop((left, top, right, bottom))
+        if not processed.get("cached"):
+            try:
+                self.image_cache.put(image_path, target_ratio, self.AVAILABLE_RATIOS, processed)
+            except Exception as e:
+                logger.warning(f"Could not cache preprocessed image {image_path}: {str(e)}")
 
-                # Resize to target resolution
-                resized_img = cropped_img.resize((target_width, target_height), Image.LANCZOS)
+        if save_resized_images is None:
+            save_resized_images = self.save_resized_images
+        if save_resized_images:
+            try:
+                self._save_resized_image(image_path, processed["target_ratio"], processed["data"])
+            except Exception as e:
+                logger.warning(f"Could not save resized image for {image_path}: {str(e)}")
+        return {
+            "data_uri": InlineData.from_bytes(processed["data"], processed["mime_type"]),
+            "target_ratio": processed["target_ratio"]
+        }
 
-                # Save the resized image
-                original_name = Path(image_path).stem
-                ratio_name = target_ratio["name"].replace(":", "x")
-                resized_path = temp_path / f"{original_name}_{ratio_name}.jpg"
-                resized_img.save(resized_path, "JPEG", quality=95)
+    def _take_prefetched(self, image_path: str, target_ratio: Optional[dict]) -> Optional[Dict]:
+        """
+        Result of background preprocessing for this image, if one was started
 
-                logger.info(f"Resized image saved: {resized_path}")
-                return str(resized_path)
+        Waits for it if it is still running. Returns None (so the caller works
+        inline) when nothing was prefetched, the worker failed, or it used a
+        different ratio.
+        """
+        with self._prefetch_lock:
+            futures = self._prefetched.get(image_path)
+            if not futures:
+                return None
+            future = futures.pop(0)
+            if not futures:
+                del self._prefetched[image_path]
 
+        try:
+            processed = future.result()
         except Exception as e:
-            logger.error(f"Error resizing image {image_path}: {str(e)}")
-            return image_path  # Return original if resizing fails
+            logger.warning(f"Background preprocessing failed for {Path(image_path).name}, retrying inline: {str(e)}")
+            return None
+        if target_ratio is not None and processed["target_ratio"]["name"] != target_ratio["name"]:
+            return None
+        if not processed.get("cached"):
+            logger.info(timing_summary(processed))
+        return processed
+
+    def _prefetch_images(self, jobs: Iterable[Tuple[str, str]], config: Optional[Dict],
+                         pipeline: PreprocessPipeline) -> Iterator[Tuple[str, str]]:
+        """Pass jobs through while their images are preprocessed ahead in the pipeline"""
+        target_ratio = self.target_ratio_for(config)
+        for image_path, output_folder, future in pipeline.prefetch(jobs, target_ratio, self.AVAILABLE_RATIOS):
+            if future is not None:
+                with self._prefetch_lock:
+                    self._prefetched.setdefault(image_path, []).append(future)
+            yield image_path, output_folder
 
     def resize_image_to_16_9(self, image_path: str, temp_folder: str = "temp_resized") -> str:
         """
@@ -295,8 +624,33 @@ class RunwayActTwoBatchGenerator:
             logger.error(f"Error extracting name from filename {filename}: {str(e)}")
             return None
     
+    def _catalog(self) -> Optional[VideoCatalog]:
+        """The persistent video catalog, or None if it cannot be opened (callers then scan)"""
+        with self._video_index_lock:
+            if self.video_catalog is None:
+                try:
+                    self.video_catalog = get_video_catalog()
+                except Exception as e:
+                    logger.warning(f"Could not open video catalog: {str(e)}")
+            return self.video_catalog
+
+    def video_index(self, folder: str) -> VideoIndex:
+        """Token index of the videos under folder, refreshed from the catalog once per run"""
+        key = str(Path(folder).resolve())
+        catalog = self._catalog()
+        with self._video_index_lock:
+            index = self._video_indexes.get(key)
+            if index is None:
+                index = self._video_indexes[key] = VideoIndex(key, catalog)
+            return index
+
     def check_existing_videos(self, name: str, downloads_folder: str = None) -> bool:
-        """Check if videos already exist for this person in downloads folder"""
+        """
+        Check if videos already exist for this person in downloads folder
+
+        A video counts when its file name contains every token of the name
+        (case-insensitive, split on non-alphanumerics).
+        """
         if downloads_folder is None:
             downloads_folder = self.downloads_folder
             
@@ -306,22 +660,12 @@ class RunwayActTwoBatchGenerator:
                 logger.warning(f"Downloads folder does not exist: {downloads_folder}")
                 return False
             
-            # Look for any video files containing this person's name
-            name_parts = name.split()
-            logger.info(f"🔍 Checking for existing videos with name parts: {name_parts}")
-            
-            # Search for video files (mp4, mov, etc.) recursively
-            video_extensions = ['.mp4', '.mov', '.avi', '.mkv', '.webm']
-            
-            for video_ext in video_extensions:
-                for video_file in downloads_path.rglob(f'*{video_ext}'):
-                    video_name = video_file.stem.upper()
-                    logger.info(f"   Checking video: {video_file.name} (stem: {video_name})")
-                    # Check if all name parts are in the video filename
-                    if all(part.upper() in video_name for part in name_parts):
-                        logger.info(f"🔍 DUPLICATE DETECTED: Found existing video for {name}: {video_file.name}")
-                        return True
-            
+            # Look up the person's name tokens in the once-per-run video index
+            video_path = self.video_index(downloads_folder).find(name)
+            if video_path:
+                logger.info(f"🔍 DUPLICATE DETECTED: Found existing video for {name}: {Path(video_path).name}")
+                return True
+
             logger.info(f"✅ NO DUPLICATES: No existing videos found for {name}")
             return False
             
@@ -329,49 +673,127 @@ class RunwayActTwoBatchGenerator:
             logger.error(f"Error checking existing videos for {name}: {str(e)}")
             return False
 
-    def get_genx_image_files(self, folder_path: str, search_pattern: str = 'genx', exact_match: bool = False) -> List[str]:
-        """Get all image files matching the search pattern, excluding duplicates"""
-        image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp', '.tiff', '.tif'}
-        matching_image_files = []
-        pattern_lower = search_pattern.lower()
+    def scan_folder(self, folder_path: str, matcher: FilenameMatcher,
+                    files: Optional[List[os.DirEntry]] = None) -> Iterator[ManifestEntry]:
+        """
+        List one folder, classifying its images and checking each match for existing videos
 
-        folder = Path(folder_path)
-        if not folder.exists():
-            logger.warning(f"Folder {folder_path} does not exist")
-            return matching_image_files
-
-        for file_path in folder.iterdir():
-            if file_path.is_file() and file_path.suffix.lower() in image_extensions:
-                filename_lower = file_path.name.lower()
-
-                # Check if filename matches pattern
-                matches = False
-                if exact_match:
-                    import re
-                    # Pattern should match as a complete segment
-                    pattern_regex = r'(^|[^a-z0-9])' + re.escape(pattern_lower) + r'([^a-z0-9]|$)'
-                    if re.search(pattern_regex, filename_lower):
-                        matches = True
+        The folder is listed up front; duplicate checks run lazily as entries
+        are consumed.
+
+        Args:
+            folder_path: Folder to list (not recursive)
+            matcher: Compiled search/exclude patterns
+            files: The folder's file entries if already listed (e.g. by TreeWalker.scan_many)
+
+        Returns:
+            Iterator of matching images sorted by filename, each with its duplicate verdict
+        """
+        if files is None:
+            _, files = self.tree_walker.scan(folder_path)
+        return self._classify_files(folder_path, sorted((entry.name for entry in files), key=str.upper), matcher)
+
+    def _classify_files(self, folder_path: str, files: List[str], matcher: FilenameMatcher) -> Iterator[ManifestEntry]:
+        """Yield a ManifestEntry, with its duplicate verdict, for each filename the matcher accepts."""
+        for filename in files:
+            matched_pattern = matcher.match(filename) if is_image_file(filename) else None
+            if matched_pattern is None:
+                continue
+
+            # Extract name from filename and check for existing videos
+            person_name = self.extract_name_from_genx_filename(filename)
+            duplicate = False
+            if person_name:
+                duplicate = bool(self.check_existing_videos(person_name))
+                if duplicate:
+                    logger.info(f"⏭️  SKIPPING: {filename} - Videos already exist for {person_name}")
                 else:
-                    if pattern_lower in filename_lower:
-                        matches = True
-
-                if matches:
-                    # Extract name from filename and check for existing videos
-                    person_name = self.extract_name_from_genx_filename(file_path.name)
-                    if person_name:
-                        if self.check_existing_videos(person_name):
-                            logger.info(f"⏭️  SKIPPING: {file_path.name} - Videos already exist for {person_name}")
-                            continue
-                        else:
-                            logger.info(f"✅ ADDING: {file_path.name} - No existing videos found for {person_name}")
-                    else:
-                        logger.warning(f"⚠️  Could not extract name from: {file_path.name} - Processing anyway")
+                    logger.info(f"✅ ADDING: {filename} - No existing videos found for {person_name}")
+            else:
+                logger.warning(f"⚠️  Could not extract name from: {filename} - Processing anyway")
+
+            yield ManifestEntry(os.path.join(folder_path, filename), folder_path, matched_pattern, person_name, duplicate)
 
-                    matching_image_files.append(str(file_path))
+    def get_genx_image_files(self, folder_path: str, search_pattern='genx', exact_match: bool = False,
+                             exclude_patterns=None) -> List[str]:
+        """
+        Get all image files matching the search pattern, excluding duplicates
+
+        Args:
+            folder_path: Folder to list (not recursive)
+            search_pattern: Pattern, or list of patterns, a filename must match
+            exact_match: Match patterns as whole segments only
+            exclude_patterns: Patterns that reject an otherwise matching filename
+
+        Returns:
+            Paths of the matching images that have no existing videos
+        """
+        matcher = get_matcher(search_pattern, exact_match, exclude_patterns)
+        if not Path(folder_path).exists():
+            logger.warning(f"Folder {folder_path} does not exist")
+            return []
+
+        matching_image_files = [entry.image_path for entry in self.scan_folder(str(folder_path), matcher)
+                                if not entry.duplicate]
+        logger.info(f"Found {len(matching_image_files)} new images matching {matcher.describe()} to process in {folder_path}")
+        return matching_image_files
+
+    def discover_jobs(self, root_directory: str, search_pattern='genx', exact_match: bool = False,
+                      exclude_patterns=None) -> DiscoveryStream:
+        """
+        Lazily discover every job under root_directory
+
+        Only the subfolder list is read here; each folder is listed and its
+        matches checked for duplicates as the stream is consumed (or on a
+        background thread after start()), so processing can begin with the
+        first eligible image.
+
+        Args:
+            root_directory: Input folder whose subfolders hold the images
+            search_pattern: Pattern, or list of patterns, a filename must match
+            exact_match: Match patterns as whole segments only
+            exclude_patterns: Patterns that reject an otherwise matching filename
+
+        Returns:
+            DiscoveryStream yielding new images in processing order
+        """
+        matcher = get_matcher(search_pattern, exact_match, exclude_patterns)
+        folders = self.get_all_folders(root_directory)
+
+        def entries():
+            started = time.perf_counter()
+            matched = new = 0
+            # Folder listings are fetched in parallel but consumed in processing order
+            for folder, _, files in self.tree_walker.scan_many(folders):
+                for entry in self.scan_folder(folder, matcher, files):
+                    matched += 1
+                    new += not entry.duplicate
+                    yield entry
+            logger.info(f"Job discovery for {root_directory}: {new} new images, {matched - new} duplicates "
+                        f"in {len(folders)} folders ({time.perf_counter() - started:.2f}s)")
+
+        return DiscoveryStream(root_directory, folders, entries())
+
+    def build_job_manifest(self, root_directory: str, search_pattern='genx', exact_match: bool = False,
+                           exclude_patterns=None) -> JobManifest:
+        """
+        Discover every job under root_directory in a single pass
+
+        Each subfolder is listed once and each matching image is checked for
+        existing videos once; counts, progress totals and processing all read
+        the returned manifest.
+
+        Args:
+            root_directory: Input folder whose subfolders hold the images
+            search_pattern: Pattern, or list of patterns, a filename must match
+            exact_match: Match patterns as whole segments only
+            exclude_patterns: Patterns that reject an otherwise matching filename
+
+        Returns:
+            Immutable JobManifest in processing order
+        """
+        return self.discover_jobs(root_directory, search_pattern, exact_match, exclude_patterns).manifest()
 
-        logger.info(f"Found {len(matching_image_files)} new images matching '{search_pattern}' to process in {folder_path}")
-        return matching_image_files    
     def get_all_folders(self, root_directory: str) -> List[str]:
         """Get all folders in the root directory, sorted alphabetically"""
         folders = []
@@ -381,10 +803,9 @@ class RunwayActTwoBatchGenerator:
             logger.error(f"Root directory {root_directory} does not exist")
             return folders
         
-        # Get all direct subdirectories
-        for folder_path in root_path.iterdir():
-            if folder_path.is_dir():
-                folders.append(str(folder_path))
+        # Get all direct subdirectories (type info comes with the listing, no stat per entry)
+        subdirs, _ = self.tree_walker.scan(str(root_path))
+        folders.extend(entry.path for entry in subdirs)
         
         # Sort alphabetically by folder name
         folders.sort(key=lambda x: Path(x).name.upper())
@@ -393,183 +814,631 @@ class RunwayActTwoBatchGenerator:
             logger.info(f"Found folder: {folder_path}")
         
         return folders        
-    def create_act_two_generation(self, character_image_path: str, output_folder: str, config: Optional[Dict] = None) -> Optional[str]:
+    def ensure_driver_video_encoded(self) -> bool:
+        """Encode the driver video once per generator (safe to call from worker threads)"""
+        with self._driver_lock:
+            if self.driver_video_data_uri:
+                return True
+
+            # Check if driver video exists
+            if not Path(self.driver_video_path).exists():
+                logger.error(f"Driver video not found: {self.driver_video_path}")
+                return False
+
+            try:
+                # Memory-mapped cache entry, shared read-only by every request
+                fragment = self.driver_cache.fragment_path(
+                    self.driver_video_path, self.video_mime_type(self.driver_video_path)
+                )
+                self.driver_video_data_uri = InlineData.from_mapped_file(fragment)
+            except Exception as e:
+                logger.warning(f"Driver video cache unavailable, encoding directly: {str(e)}")
+                logger.info(f"Encoding driver video to data URI: {self.driver_video_path}")
+                data_uri = self.encode_video_to_data_uri(self.driver_video_path)
+                self.driver_video_data_uri = InlineData.from_str(data_uri) if data_uri else None
+            if not self.driver_video_data_uri:
+                logger.error("Failed to encode driver video")
+                return False
+            return True
+
+    def ensure_driver_video_uploaded(self, api_base_url: Optional[str] = None) -> Optional[str]:
         """
-        Generate Act-Two video using driver video and character image with configuration
+        Upload the driver video once through the uploads endpoint
+
+        Args:
+            api_base_url: API root serving /uploads (defaults to the Runway API;
+                point it at a local mock for testing)
+
+        Returns:
+            The runway:// URI referencing the uploaded video, or None if uploading failed
+        """
+        with self._driver_lock:
+            reference = self.driver_video_reference
+            if reference and reference["expires_at"] > time.time():
+                return reference["uri"]
+            if self._driver_upload_failed:
+                return None
+
+            driver_path = Path(self.driver_video_path)
+            if not driver_path.exists():
+                logger.error(f"Driver video not found: {self.driver_video_path}")
+                return None
+
+            api_base_url = api_base_url or self.base_url
+            try:
+                # A still-valid upload from an earlier run or another process
+                cached = self.driver_cache.get_reference(self.driver_video_path, api_base_url)
+                if cached:
+                    self.driver_video_reference = {"uri": cached["uri"], "expires_at": cached["expires_at"],
+                                                   "uploaded_at": 0.0}  # Older than any submission
+                    self._driver_upload_api_url = api_base_url
+                    logger.info(f"Reusing cached driver video upload: {cached['uri']}")
+                    return cached["uri"]
+            except Exception as e:
+                logger.warning(f"Could not read driver video cache: {str(e)}")
+
+            try:
+                logger.info(f"Uploading driver video once for this session: {driver_path.name}")
+                response = self.http.post(
+                    f"{api_base_url}/uploads",
+                    headers=self.headers,
+                    json={"filename": driver_path.name, "type": "ephemeral"}
+                )
+                if response.status_code != 200:
+                    raise IOError(f"upload slot request failed: {response.status_code} {response.text}")
+                upload = response.json()
+
+                # Presigned upload - the file goes straight to storage, no API headers
+                with open(driver_path, 'rb') as f:
+                    upload_response = self.http.post(
+                        upload["uploadUrl"],
+                        data=upload.get("fields", {}),
+                        files={"file": (driver_path.name, f, self.video_mime_type(str(driver_path)))}
+                    )
+                if upload_response.status_code not in (200, 201, 204):
+                    raise IOError(f"upload failed: {upload_response.status_code}")
+
+                self.driver_video_reference = {
+                    "uri": upload["runwayUri"],
+                    "expires_at": time.time() + DRIVER_UPLOAD_TTL,
+                    "uploaded_at": time.time()
+                }
+                self._driver_upload_api_url = api_base_url
+                logger.info(f"Driver video uploaded: {upload['runwayUri']}")
+                try:
+                    self.driver_cache.store_reference(
+                        self.driver_video_path, api_base_url,
+                        upload["runwayUri"], self.driver_video_reference["expires_at"]
+                    )
+                except Exception as e:
+                    logger.warning(f"Could not cache driver video reference: {str(e)}")
+                return upload["runwayUri"]
+
+            except Exception as e:
+                logger.warning(f"Driver video upload failed, using inline data URI instead: {str(e)}")
+                self._driver_upload_failed = True
+                return None
+
+    def invalidate_driver_reference(self, rejected_uri: Optional[str] = None, sent_at: Optional[float] = None,
+                                    disable_uploads: bool = True) -> bool:
+        """
+        Forget the uploaded driver reference
+
+        Args:
+            rejected_uri: Only forget the reference if it is still this URI
+            sent_at: Time the rejected request was sent; a reference uploaded
+                after that is a fresh replacement and is kept
+            disable_uploads: Use inline data URIs for the rest of the session;
+                False lets the next request upload the driver again
+
+        Returns:
+            True if the reference was forgotten
+        """
+        with self._driver_lock:
+            reference = self.driver_video_reference
+            if rejected_uri is not None and reference is not None and (
+                    reference["uri"] != rejected_uri or
+                    (sent_at is not None and reference.get("uploaded_at", 0.0) > sent_at)):
+                return False  # Another thread already replaced it
+            self.driver_video_reference = None
+            if disable_uploads:
+                self._driver_upload_failed = True
+            try:
+                self.driver_cache.clear_reference(self.driver_video_path)
+            except Exception as e:
+                logger.warning(f"Could not clear cached driver video reference: {str(e)}")
+            return True
+
+    def driver_video_uri(self, config: Optional[Dict] = None) -> Optional[str]:
+        """
+        URI to send as the Act-Two reference video
+
+        With 'driver_video_upload' enabled the video is uploaded once and referenced
+        by URI; otherwise (or if the upload is unavailable) it is inlined as a data URI.
+        """
+        config = config or {}
+        if config.get('driver_video_upload', False):
+            reference_uri = self.ensure_driver_video_uploaded(config.get('upload_api_url') or None)
+            if reference_uri:
+                return reference_uri
+
+        if not self.ensure_driver_video_encoded():
+            return None
+        return self.driver_video_data_uri
+
+    def generation_template(self, config: Optional[Dict] = None) -> Optional[GenerationTemplate]:
+        """
+        Payload template for this config and the current driver reference
+
+        The template is compiled once and reused until the config object or the
+        driver reference changes (generate_batch starts each batch fresh).
+        """
+        driver_uri = self.driver_video_uri(config)
+        if not driver_uri:
+            return None
+
+        with self._driver_lock:
+            template = self._generation_template
+            if template is None or not template.matches(config, driver_uri):
+                template = GenerationTemplate(config, driver_uri)
+                self._generation_template = template
+            return template
+
+    def target_ratio_for(self, config: Optional[Dict] = None) -> Optional[dict]:
+        """
+        Fixed target ratio from the config, or None in smart mode (picked per image)
+        """
+        config = config or {}
+
+        # Determine aspect ratio mode
+        if config.get('aspect_ratio_mode', 'smart') == 'smart':
+            return None
+
+        # Fixed ratio from config
+        fixed_ratio = config.get('fixed_aspect_ratio', '16:9')
+        if fixed_ratio in self.AVAILABLE_RATIOS:
+            logger.info(f"Using fixed aspect ratio: {fixed_ratio}")
+            return {"name": fixed_ratio, **self.AVAILABLE_RATIOS[fixed_ratio]}
+
+        # Fallback to 16:9 if invalid ratio
+        logger.warning(f"Invalid fixed ratio {fixed_ratio}, using 16:9")
+        return {"name": "16:9", **self.AVAILABLE_RATIOS["16:9"]}
+
+    def prepare_generation(self, character_image_path: str, output_folder: str, config: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Resize and encode the character image and build the Act-Two payload
 
         Args:
             character_image_path: Path to character image
             output_folder: Folder to save generated video
             config: Optional configuration dictionary with all settings
+
+        Returns:
+            Dict with 'payload', 'output_path' and 'target_ratio', or None on failure
+        """
+        # Use config if provided, otherwise use defaults
+        if config is None:
+            config = {}
+
+        template = self.generation_template(config)
+        if not template:
+            return None
+
+        target_ratio = self.target_ratio_for(config)
+        aspect_mode = 'smart' if target_ratio is None else 'fixed'
+
+        # Select, resize and encode from a single decode, all in memory
+        processed = self.preprocess_character_image(character_image_path, target_ratio,
+                                                    compare_full_decode=config.get("compare_full_decode", False),
+                                                    save_resized_images=config.get("save_resized_images"))
+        if not processed:
+            return None
+        target_ratio = processed["target_ratio"]
+        character_image_data_uri = processed["data_uri"]
+        if aspect_mode == 'smart':
+            logger.info(f"Smart aspect ratio selection: Using {target_ratio['name']} to minimize cropping")
+
+        # Create output filename with ratio info
+        image_name = Path(character_image_path).stem
+        ratio_suffix = target_ratio["name"].replace(":", "x")
+        output_path = self.reserve_output_path(Path(output_folder) / f"{image_name}_act_two_{ratio_suffix}.mp4")
+
+        # Splice this image into the batch's pre-serialized payload
+        payload = template.render(character_image_data_uri, target_ratio["api_value"])
+
+        return {
+            "payload": payload,
+            "output_path": output_path,
+            "target_ratio": target_ratio
+        }
+
+    def reserve_output_path(self, output_path: Path) -> Path:
+        """
+        Claim an output path for this session
+
+        Two jobs can resolve to the same file (e.g. images with the same name in
+        different folders writing to a centralized output folder); later claims
+        get a numbered suffix instead of overwriting the earlier video.
+
+        Args:
+            output_path: Preferred output file
+
+        Returns:
+            output_path, or '<stem>_<n><suffix>' beside it if already claimed
+        """
+        output_path = Path(output_path)
+        with self._output_lock:
+            candidate, number = output_path, 1
+            while os.path.normcase(str(candidate.resolve())) in self._reserved_outputs:
+                number += 1
+                candidate = output_path.with_name(f"{output_path.stem}_{number}{output_path.suffix}")
+            self._reserved_outputs.add(os.path.normcase(str(candidate.resolve())))
+            return candidate
+
+    @staticmethod
+    def reference_rejected(response: requests.Response, reference_uri: str) -> bool:
+        """Whether a failed submission blames the uploaded driver reference (e.g. an expired upload)"""
+        if response.status_code not in (400, 404, 410, 422) or reference_uri.startswith("data:"):
+            return False
+        text = response.text or ""
+        return reference_uri in text or bool(REFERENCE_ERROR_PATTERN.search(text))
+
+    def submit_generation(self, payload: Dict, retry_reference: bool = True) -> Optional[str]:
+        """
+        Submit a character_performance task and return its task ID
+
+        Args:
+            payload: Request payload
+            retry_reference: Re-upload the driver once if the API rejects its uploaded reference
+        """
+        logger.info(f"API Payload settings: Expression={payload.get('expressionIntensity')}, "
+                   f"BodyControl={payload.get('bodyControl')}, Model={payload.get('model')}")
+        # Streamed so the data URIs are sent straight from their buffers
+        sent_at = time.time()
+        response = self.http.post(
+            f"{self.base_url}/character_performance",
+            headers=self.headers,
+            data=StreamingJsonBody.from_payload(payload)
+        )
+
+        if response.status_code != 200:
+            reference_uri = payload.get("reference", {}).get("uri", "")
+            if retry_reference and self.reference_rejected(response, reference_uri):
+                # Uploaded driver reference was rejected (most likely expired) - upload it again
+                logger.warning(f"Driver video reference rejected ({response.status_code}), uploading it again")
+                # Clear and re-upload under one lock: submissions rejected at the same
+                # time then reuse the first thread's fresh upload instead of uploading again
+                with self._driver_lock:
+                    self.invalidate_driver_reference(reference_uri, sent_at, disable_uploads=False)
+                    new_uri = self.ensure_driver_video_uploaded(self._driver_upload_api_url)
+                if not new_uri:
+                    # The upload itself failed (uploads are now off for the session)
+                    logger.warning("Driver video re-upload failed, falling back to inline data URI")
+                    if not self.ensure_driver_video_encoded():
+                        return None
+                    new_uri = self.driver_video_data_uri
+                return self.submit_generation({**payload, "reference": {"type": "video", "uri": new_uri}},
+                                              retry_reference=False)
+            logger.error(f"Failed to create Act-Two task: {response.text}")
+            return None
+
+        task_data = response.json()
+        task_id = task_data['id']
+        logger.info(f"Act-Two task created. Task ID: {task_id}")
+        return task_id
+
+    @property
+    def task_poller(self) -> TaskPoller:
+        """Poller that owns all outstanding task IDs of this generator"""
+        with self._driver_lock:
+            if self._task_poller is None:
+                self._task_poller = TaskPoller(
+                    self.check_task_status,
+                    poll_interval=self.poll_interval,
+                    max_wait=self.max_wait,
+                    max_requests_per_second=self.status_requests_per_second
+                )
+            return self._task_poller
+
+    def check_task_status(self, task_id: str) -> Optional[Dict]:
+        """
+        Fetch the current status of a task
+
+        Dropped connections, rate limiting (429) and server errors (5xx) say
+        nothing about the render, so they report status UNKNOWN (with the
+        server's Retry-After in seconds, if any) and the poller tries again.
+
+        Returns:
+            Status dict, or None when the task cannot be checked at all (e.g. 401, 404)
         """
         try:
-            # Check if driver video exists
-            if not Path(self.driver_video_path).exists():
-                logger.error(f"Driver video not found: {self.driver_video_path}")
-                return None
+            status_response = self.http.get(
+                f"{self.base_url}/tasks/{task_id}",
+                headers=self.headers
+            )
+        except (requests.Timeout, requests.ConnectionError) as e:
+            # A dropped poll says nothing about the render - check again later
+            logger.warning(f"Status check for task {task_id} failed, will retry: {str(e)}")
+            return {"status": "UNKNOWN"}
 
-            # Encode driver video to data URI if not already done
-            if not hasattr(self, 'driver_video_data_uri') or not self.driver_video_data_uri:
-                logger.info(f"Encoding driver video to data URI: {self.driver_video_path}")
-                self.driver_video_data_uri = self.encode_video_to_data_uri(self.driver_video_path)
-                if not self.driver_video_data_uri:
-                    logger.error("Failed to encode driver video")
-                    return None
+        if status_response.status_code == 429 or status_response.status_code >= 500:
+            logger.warning(f"Status check for task {task_id} returned {status_response.status_code}, will retry")
+            retry_after = status_response.headers.get("Retry-After", "")
+            return {"status": "UNKNOWN",
+                    "retry_after": float(retry_after) if retry_after.isdigit() else None}
 
-            # Use config if provided, otherwise use defaults
-            if config is None:
-                config = {}
+        if status_response.status_code != 200:
+            logger.error(f"Failed to check task status: {status_response.text}")
+            return None
 
-            # Determine aspect ratio mode
-            aspect_mode = config.get('aspect_ratio_mode', 'smart')
+        return status_response.json()
 
-            if aspect_mode == 'smart':
-                # Smart selection - analyze image and select best ratio
-                image_aspect, _, _ = self.analyze_image_aspect_ratio(character_image_path)
-                target_ratio = self.select_best_ratio(image_aspect)
-                logger.info(f"Smart aspect ratio selection: Using {target_ratio['name']} to minimize cropping")
-            else:
-                # Fixed ratio from config
-                fixed_ratio = config.get('fixed_aspect_ratio', '16:9')
-                if fixed_ratio in self.AVAILABLE_RATIOS:
-                    target_ratio = self.AVAILABLE_RATIOS[fixed_ratio]
-                    logger.info(f"Using fixed aspect ratio: {fixed_ratio}")
-                else:
-                    # Fallback to 16:9 if invalid ratio
-                    target_ratio = self.AVAILABLE_RATIOS["16:9"]
-                    logger.warning(f"Invalid fixed ratio {fixed_ratio}, using 16:9")
-
-            # Resize image to selected ratio
-            logger.info(f"Resizing image to {target_ratio['name']} ({target_ratio['api_value']})")
-            resized_image_path = self.resize_image_smart(character_image_path, target_ratio)
-
-            # Encode character image to data URI
-            logger.info(f"Encoding character image to data URI: {resized_image_path}")
-            character_image_data_uri = self.encode_image_to_data_uri(resized_image_path)
-            if not character_image_data_uri:
-                logger.error(f"Failed to encode character image: {resized_image_path}")
-                return None
+    def watch_task(self, task_id: str, model_version: str = 'act_two', ratio: Optional[str] = None) -> Future:
+        """
+        Hand a submitted task to the shared poller
+
+        Polls are timed from the render times observed for this model and ratio,
+        and every successful render feeds its duration back into those stats.
+
+        Returns:
+            Future resolving to the status data when the task SUCCEEDED, otherwise None
+        """
+        schedule = self.latency_stats.schedule_for(model_version, ratio) if self.adaptive_polling else None
+        if schedule:
+            logger.info(f"Task {task_id}: expecting ~{schedule.expected:.0f}s render, "
+                       f"timeout {schedule.timeout:.0f}s once running")
+        render_started = [time.monotonic()]  # Moved to the first RUNNING status, so queue time is not counted
+
+        def mark_running():
+            render_started[0] = time.monotonic()
+
+        future = self.task_poller.watch(task_id, schedule, on_running=mark_running)
+
+        def record_latency(done: Future):
+            if not done.cancelled() and done.exception() is None and done.result():
+                self.latency_stats.record(model_version, ratio, time.monotonic() - render_started[0])
+
+        future.add_done_callback(record_latency)
+        return future
+
+    def wait_for_task(self, task_id: str, model_version: str = 'act_two', ratio: Optional[str] = None) -> Optional[Dict]:
+        """
+        Block until the shared poller sees the task finish
 
-            # Create output filename with ratio info
-            image_name = Path(character_image_path).stem
-            ratio_suffix = target_ratio["name"].replace(":", "x")
-            output_path = Path(output_folder) / f"{image_name}_act_two_{ratio_suffix}.mp4"
+        Returns:
+            The task status data when the task SUCCEEDED, otherwise None
+        """
+        return self.watch_task(task_id, model_version, ratio).result()
+
+    def download_generation(self, status_data: Dict, output_path: Path, target_ratio: Dict,
+                            source_image: Optional[str] = None) -> Optional[str]:
+        """Download the video of a SUCCEEDED task to output_path (cataloguing it against source_image)"""
+        # Get video URL
+        video_url = status_data.get('output', [None])[0]
+        if not video_url:
+            logger.error("No video URL in response")
+            return None
+
+        logger.info(f"Act-Two generation completed! URL: {video_url}")
+
+        # Stream the video to disk (resumes after a dropped connection)
+        if not self.http.download(video_url, output_path, segments=self.download_segments):
+            logger.error(f"Failed to download video: {video_url}")
+            return None
+
+        logger.info(f"✅ Video saved to: {output_path}")
+        self._record_output_video(output_path, source_image)
+        logger.info(f"   Output resolution: {target_ratio['width']}x{target_ratio['height']}")
+        return str(output_path)
+
+    def _record_output_video(self, output_path: Path, source_image: Optional[str] = None):
+        """Catalogue a new video and add it to any already-built index whose folder contains it"""
+        resolved = Path(output_path).resolve()
+        catalog = self._catalog()
+        if catalog is not None:
+            try:
+                catalog.record(str(resolved), str(Path(source_image).resolve()) if source_image else None)
+            except Exception as e:
+                logger.warning(f"Could not record {resolved.name} in the video catalog: {str(e)}")
+        with self._video_index_lock:
+            indexes = list(self._video_indexes.values())
+        for index in indexes:
+            if index.root in resolved.parents:
+                index.add(str(resolved))
+
+    def create_act_two_generation(self, character_image_path: str, output_folder: str, config: Optional[Dict] = None) -> Optional[str]:
+        """
+        Generate Act-Two video using driver video and character image with configuration
+
+        Args:
+            character_image_path: Path to character image
+            output_folder: Folder to save generated video
+            config: Optional configuration dictionary with all settings
+        """
+        try:
+            self._generation_template = None  # A single generation is its own batch
+            prepared = self.prepare_generation(character_image_path, output_folder, config)
+            if not prepared:
+                return None
 
+            target_ratio = prepared["target_ratio"]
             logger.info(f"Starting Act-Two generation for: {character_image_path}")
             logger.info(f"Using ratio: {target_ratio['name']} ({target_ratio['api_value']})")
 
-            # Build Act-Two generation payload with all config parameters
-            payload = {
-                "character": {
-                    "type": "image",
-                    "uri": character_image_data_uri
-                },
-                "reference": {
-                    "type": "video",
-                    "uri": self.driver_video_data_uri
-                },
-                "bodyControl": config.get('body_control', False),
-                "expressionIntensity": config.get('expression_intensity', 1.0),
-                "model": config.get('model_version', 'act_two'),
-                "ratio": target_ratio["api_value"]  # Use selected ratio
-            }
-
-            # Add optional body control parameters if enabled
-            if config.get('body_control', False):
-                payload["motionStrength"] = config.get('motion_strength', 1.0)
-                payload["stabilization"] = config.get('stabilization', True)
-                payload["preservePose"] = config.get('preserve_pose', False)
-                payload["motionSmoothing"] = config.get('motion_smoothing', 0.5)
-
-            # Add quality settings if specified
-            if config.get('quality'):
-                payload["quality"] = config.get('quality', 'standard')
-
-            # Add seed if specified
-            if config.get('seed') is not None:
-                payload["seed"] = config.get('seed')
-
-            # Add prompts if specified
-            if config.get('prompt'):
-                payload["prompt"] = config.get('prompt')
-            if config.get('negative_prompt'):
-                payload["negativePrompt"] = config.get('negative_prompt')
-
-            logger.info(f"API Payload settings: Expression={payload.get('expressionIntensity')}, "
-                       f"BodyControl={payload.get('bodyControl')}, Model={payload.get('model')}")            
-            response = requests.post(
-                f"{self.base_url}/character_performance",
-                headers=self.headers,
-                json=payload
-            )
-            
-            if response.status_code != 200:
-                logger.error(f"Failed to create Act-Two task: {response.text}")
+            task_id = self.submit_generation(prepared["payload"])
+            if not task_id:
                 return None
-            
-            task_data = response.json()
-            task_id = task_data['id']
-            logger.info(f"Act-Two task created. Task ID: {task_id}")
-            
+
             # Wait for completion (polling)
-            max_wait = 600  # 10 minutes
-            wait_time = 0
-            
-            while wait_time < max_wait:
-                time.sleep(10)  # Check every 10 seconds
-                wait_time += 10
-                
-                # Check task status
-                status_response = requests.get(
-                    f"{self.base_url}/tasks/{task_id}",
-                    headers=self.headers
-                )
-                
-                if status_response.status_code != 200:
-                    logger.error(f"Failed to check task status: {status_response.text}")
-                    return None
-                
-                status_data = status_response.json()
-                status = status_data.get('status', 'UNKNOWN')
-                
-                logger.info(f"Task {task_id} status: {status}")
-                
-                if status == 'SUCCEEDED':
-                    # Get video URL
-                    video_url = status_data.get('output', [None])[0]
-                    if video_url:
-                        logger.info(f"Act-Two generation completed! URL: {video_url}")
-                        
-                        # Download the video
-                        video_response = requests.get(video_url)
-                        if video_response.status_code == 200:
-                            # Ensure output directory exists
-                            output_path.parent.mkdir(parents=True, exist_ok=True)
-                            
-                            with open(output_path, 'wb') as f:
-                                f.write(video_response.content)
-
-                            logger.info(f"✅ Video saved to: {output_path}")
-                            logger.info(f"   Output resolution: {target_ratio['width']}x{target_ratio['height']}")
-                            return str(output_path)
-                        else:
-                            logger.error(f"Failed to download video: {video_response.status_code}")
-                    else:
-                        logger.error("No video URL in response")
-                    return None
-                    
-                elif status == 'FAILED':
-                    logger.error(f"Task {task_id} failed: {status_data.get('error', 'Unknown error')}")
-                    return None
-            
-            logger.error(f"Task {task_id} timed out after {max_wait} seconds")
-            return None
-            
+            payload = prepared["payload"]
+            status_data = self.wait_for_task(task_id, payload.get("model", "act_two"), payload.get("ratio"))
+            if not status_data:
+                return None
+
+            return self.download_generation(status_data, prepared["output_path"], target_ratio, character_image_path)
+
         except Exception as e:
             logger.error(f"Error in Act-Two generation for {character_image_path}: {str(e)}")
-            return None        
+            return None
+
+    def generate_batch(self, jobs: Iterable[Tuple[str, str]], config: Optional[Dict] = None,
+                       max_in_flight: int = 1, delay_between_generations: float = 0,
+                       on_submit: Optional[Callable[[str], None]] = None,
+                       preprocess_ahead: Optional[int] = None) -> Iterator[Tuple[str, Optional[str]]]:
+        """
+        Generate videos for many images, keeping up to max_in_flight tasks rendering at once
+
+        Jobs are pulled lazily, so a generator of jobs is only advanced when the
+        submission window has room (plus preprocess_ahead jobs whose images are
+        prepared in worker processes meanwhile). Worker threads only prepare,
+        submit and download; while a task renders it is just an entry in the
+        shared poller. With max_in_flight=1 this is the classic one-at-a-time
+        behaviour.
+
+        Args:
+            jobs: Iterable of (character_image_path, output_folder) tuples
+            config: Optional configuration dictionary with all settings
+            max_in_flight: Maximum number of tasks rendering server-side at once
+            delay_between_generations: Seconds to wait between task submissions
+            on_submit: Optional callback invoked with the image path as each job starts
+            preprocess_ahead: Images to preprocess ahead in a process pool
+                (defaults to self.preprocess_ahead; 0 preprocesses inline)
+
+        Yields:
+            (character_image_path, video_path or None) in completion order
+        """
+        max_in_flight = max(1, int(max_in_flight or 1))
+        self._generation_template = None  # Settings may have changed since the last batch
+        in_flight = {}
+        submitted = 0
+
+        if preprocess_ahead is None:
+            preprocess_ahead = self.preprocess_ahead
+        compare_full_decode = (config or {}).get("compare_full_decode", False)
+        pipeline = PreprocessPipeline(preprocess_ahead, cache=self.image_cache,
+                                      compare_full_decode=compare_full_decode) if preprocess_ahead > 0 else None
+        jobs = self._prefetch_images(jobs, config, pipeline) if pipeline else iter(jobs)
+        closed = threading.Event()  # Set once the consumer stops; jobs then schedule no more work
+        watching = set()  # Task IDs of this batch still in the shared poller
+        watching_lock = threading.Lock()
+
+        executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="act-two")
+        try:
+            while True:
+                # Top up the submission window
+                while len(in_flight) < max_in_flight:
+                    job = next(jobs, None)
+                    if job is None:
+                        break
+                    image_path, output_folder = job
+
+                    # Add delay between API calls to avoid rate limiting
+                    if submitted and delay_between_generations > 0:
+                        time.sleep(delay_between_generations)
+
+                    if on_submit:
+                        on_submit(image_path)
+                    future = self._start_job(executor, image_path, output_folder, config,
+                                             closed, watching, watching_lock)
+                    in_flight[future] = image_path
+                    submitted += 1
+
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield in_flight.pop(future), future.result()
+        finally:
+            # Consumer finished or stopped early (break/exception): drop queued jobs,
+            # let running stages end, then take this batch's renders out of the shared poller
+            closed.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+            with watching_lock:
+                abandoned = list(watching)
+                watching.clear()
+            for task_id in abandoned:
+                self.task_poller.cancel(task_id)
+            if pipeline:
+                pipeline.close()
+            with self._prefetch_lock:
+                self._prefetched.clear()
+
+    def _start_job(self, executor: ThreadPoolExecutor, character_image_path: str, output_folder: str,
+                   config: Optional[Dict], closed: threading.Event, watching: set,
+                   watching_lock: threading.Lock) -> Future:
+        """
+        Run one generate_batch job as a chain of stages - never raises
+
+        prepare+submit run on the executor, the render wait is handed to the
+        shared poller, and the download is scheduled back on the executor.
+        Once the batch is closed no further stage is scheduled; task IDs being
+        polled are kept in watching so the batch can cancel them.
+
+        Returns:
+            Future resolving to the saved video path or None
+        """
+        job_future = Future()
+        image_name = Path(character_image_path).name
+
+        def finish(status_future: Future, prepared: Dict):
+            try:
+                status_data = status_future.result()
+                result = None
+                if status_data:
+                    result = self.download_generation(status_data, prepared["output_path"], prepared["target_ratio"],
+                                                      character_image_path)
+                job_future.set_result(result)
+            except Exception:
+                logger.exception(f"Failed to process {image_name}")
+                job_future.set_result(None)
+
+        def start():
+            try:
+                prepared = self.prepare_generation(character_image_path, output_folder, config)
+                if not prepared:
+                    job_future.set_result(None)
+                    return
+
+                target_ratio = prepared["target_ratio"]
+                logger.info(f"Starting Act-Two generation for: {character_image_path}")
+                logger.info(f"Using ratio: {target_ratio['name']} ({target_ratio['api_value']})")
+
+                task_id = self.submit_generation(prepared["payload"])
+                if not task_id:
+                    job_future.set_result(None)
+                    return
+
+                def on_status(status_future: Future):
+                    with watching_lock:
+                        watching.discard(task_id)
+                    if closed.is_set() or status_future.cancelled():
+                        job_future.set_result(None)
+                        return
+                    try:
+                        executor.submit(finish, status_future, prepared)
+                    except RuntimeError:  # Executor shut down since the check
+                        job_future.set_result(None)
+
+                payload = prepared["payload"]
+                with watching_lock:
+                    if closed.is_set():
+                        logger.warning(f"Batch stopped; not waiting for task {task_id} ({image_name})")
+                        job_future.set_result(None)
+                        return
+                    watching.add(task_id)
+                self.watch_task(task_id, payload.get("model", "act_two"), payload.get("ratio")).add_done_callback(
+                    on_status)
+            except Exception:
+                logger.exception(f"Failed to process {image_name}")
+                job_future.set_result(None)
+
+        executor.submit(start)
+        return job_future
+
     def process_all_images(self, target_directory: str, output_directory: str = r"C:\Users\ashrv\Downloads",
-                          delay_between_generations: int = 1, co_located_output: bool = False):
+                          delay_between_generations: int = 1, co_located_output: bool = False,
+                          max_in_flight: int = 1, manifest: Optional[JobManifest] = None):
         """
         Main function to process all images in genx folders using Act-Two
         NOW WITH DUPLICATE DETECTION!
@@ -579,6 +1448,8 @@ class RunwayActTwoBatchGenerator:
             output_directory: Directory to save generated videos (used when co_located_output=False)
             delay_between_generations: Seconds to wait between API calls
             co_located_output: If True, save videos in same folder as source images
+            max_in_flight: Number of Act-Two tasks allowed to render at the same time
+            manifest: Jobs discovered by build_job_manifest; scanned here (for 'genx') when omitted
         """
         
         logger.info("=== RUNWAY ACT-TWO BATCH GENERATOR WITH DUPLICATE DETECTION ===")
@@ -590,6 +1461,7 @@ class RunwayActTwoBatchGenerator:
             logger.info(f"Output directory: {output_directory}")
         logger.info(f"Downloads folder for duplicate checking: {self.downloads_folder}")
         logger.info("🔍 Duplicate detection is ENABLED - checking for existing videos")
+        logger.info(f"Concurrent tasks in flight: {max_in_flight}")
         logger.info("=" * 70)
         
         # ANSI color codes
@@ -607,78 +1479,74 @@ class RunwayActTwoBatchGenerator:
             print(f"{RED}Driver video not found: {self.driver_video_path}{RESET}")
             return
         
-        # Get all folders in the target directory
-        all_folders = self.get_all_folders(target_directory)
-        
-        if not all_folders:
+        # Discover every job once: folders, matches and duplicate verdicts
+        if manifest is None:
+            manifest = self.build_job_manifest(target_directory)
+
+        if not manifest.folders:
             logger.warning("No folders found in target directory!")
             print(f"{YELLOW}No folders found in target directory!{RESET}")
             return        
         # Process each folder looking for genx images
-        total_images = 0
+        total_images = manifest.total_new
         successful_generations = 0
         failed_generations = 0
-        skipped_duplicates = 0
-        
-        for folder in all_folders:
-            logger.info(f"\nProcessing folder: {folder}")
-            print(f"\n{CYAN}🔍 Processing folder: {Path(folder).name}{RESET}")
-            
-            # Get all genx images in this folder (with duplicate filtering)
-            genx_image_files = self.get_genx_image_files(folder)
-            total_found = len([f for f in Path(folder).iterdir() 
-                              if f.is_file() and 'genx' in f.name.lower() 
-                              and f.suffix.lower() in {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp', '.tiff', '.tif'}])
-            skipped_in_folder = total_found - len(genx_image_files)
-            total_images += len(genx_image_files)
-            skipped_duplicates += skipped_in_folder
-            
-            if not genx_image_files and total_found == 0:
-                logger.info(f"No genx image files found in {folder}")
-                print(f"{YELLOW}No genx images found in {Path(folder).name}{RESET}")
-                continue
-            elif not genx_image_files and total_found > 0:
-                logger.info(f"All {total_found} genx images in {folder} were duplicates - skipped")
-                print(f"{YELLOW}All {total_found} genx images were duplicates - skipped{RESET}")
-                continue
-            
-            print(f"{GREEN}Found {len(genx_image_files)} NEW genx images in {Path(folder).name}{RESET}")
-            if skipped_in_folder > 0:
-                print(f"{YELLOW}⏭️  Skipped {skipped_in_folder} duplicates{RESET}")
-            
-            # Process each genx image
-            for i, image_path in enumerate(genx_image_files, 1):
-                logger.info(f"\n[{i}/{len(genx_image_files)}] Processing: {Path(image_path).name}")
-                print(f"\n{MAGENTA}[{i}/{len(genx_image_files)}] Processing: {Path(image_path).name}{RESET}")
-
-                # Determine output folder based on co_located_output setting
-                if co_located_output:
-                    # Save to same folder as source image
-                    specific_output = Path(image_path).parent
-                    logger.info(f"Output will be saved to source folder: {specific_output}")
-                else:
-                    # Save to centralized output directory
-                    specific_output = Path(output_directory)
+        skipped_duplicates = manifest.duplicates
+
+        def folder_jobs():
+            """Yield the manifest's jobs folder by folder as the submission window asks for them"""
+            for summary in manifest.folders:
+                folder = summary.folder
+                logger.info(f"\nProcessing folder: {folder}")
+                print(f"\n{CYAN}🔍 Processing folder: {Path(folder).name}{RESET}")
+
+                genx_image_files = [entry.image_path for entry in manifest.jobs_in(folder)]
+                total_found = summary.matched
+                skipped_in_folder = summary.duplicates
+
+                if not genx_image_files and total_found == 0:
+                    logger.info(f"No genx image files found in {folder}")
+                    print(f"{YELLOW}No genx images found in {Path(folder).name}{RESET}")
+                    continue
+                elif not genx_image_files and total_found > 0:
+                    logger.info(f"All {total_found} genx images in {folder} were duplicates - skipped")
+                    print(f"{YELLOW}All {total_found} genx images were duplicates - skipped{RESET}")
+                    continue
+
+                print(f"{GREEN}Found {len(genx_image_files)} NEW genx images in {Path(folder).name}{RESET}")
+                if skipped_in_folder > 0:
+                    print(f"{YELLOW}⏭️  Skipped {skipped_in_folder} duplicates{RESET}")
+
+                # Queue each genx image
+                for i, image_path in enumerate(genx_image_files, 1):
+                    logger.info(f"\n[{i}/{len(genx_image_files)}] Processing: {Path(image_path).name}")
+                    print(f"\n{MAGENTA}[{i}/{len(genx_image_files)}] Processing: {Path(image_path).name}{RESET}")
+
+                    # Determine output folder based on co_located_output setting
+                    if co_located_output:
+                        # Save to same folder as source image
+                        specific_output = Path(image_path).parent
+                        logger.info(f"Output will be saved to source folder: {specific_output}")
+                    else:
+                        # Save to centralized output directory
+                        specific_output = Path(output_directory)
+
+                    yield image_path, str(specific_output)
+
+        if max_in_flight > 1:
+            print(f"{BLUE}⚡ Keeping up to {max_in_flight} generations in flight{RESET}")
+
+        for image_path, result in self.generate_batch(folder_jobs(), max_in_flight=max_in_flight,
+                                                      delay_between_generations=delay_between_generations):
+            if result:
+                successful_generations += 1
+                logger.info(f"Success: {Path(result).name}")
+                print(f"{GREEN}✅ Success: {Path(result).name}{RESET}")
+            else:
+                failed_generations += 1
+                logger.error(f"Failed: {Path(image_path).name}")
+                print(f"{RED}❌ Failed: {Path(image_path).name}{RESET}")
 
-                result = self.create_act_two_generation(
-                    character_image_path=image_path,
-                    output_folder=str(specific_output)
-                )
-                
-                if result:
-                    successful_generations += 1
-                    logger.info(f"Success: {Path(result).name}")
-                    print(f"{GREEN}✅ Success: {Path(result).name}{RESET}")
-                else:
-                    failed_generations += 1
-                    logger.error(f"Failed: {Path(image_path).name}")
-                    print(f"{RED}❌ Failed: {Path(image_path).name}{RESET}")
-                
-                # Add delay between API calls to avoid rate limiting
-                if i < len(genx_image_files) and delay_between_generations > 0:
-                    logger.info(f"Waiting {delay_between_generations} seconds before next generation...")
-                    print(f"{BLUE}⏳ Waiting {delay_between_generations} seconds...{RESET}")
-                    time.sleep(delay_between_generations)        
         # Final summary
         logger.info("\n" + "=" * 70)
         logger.info("=== BATCH PROCESSING COMPLETE WITH DUPLICATE DETECTION ===")
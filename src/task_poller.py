@@ -0,0 +1,366 @@
+"""
+Shared task poller for RunwayML generation tasks.
+One background thread owns every outstanding task ID and checks only the tasks
+whose next poll is due, using a min-heap keyed by poll deadline. Poll timing
+adapts to render times observed per model and ratio.
+"""
+
+import heapq
+import itertools
+import json
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PollSchedule:
+    """Decides when to poll a task next and when to give up on it."""
+
+    def __init__(self, timeout: float, interval: float = 10, expected: Optional[float] = None,
+                 min_interval: float = 2.0, max_interval: float = 30.0, queue_timeout: Optional[float] = None):
+        """
+        Initialize a schedule.
+
+        Args:
+            timeout: Seconds before the task counts as timed out, counted from
+                submission, or from its first RUNNING status when queue_timeout is set
+            interval: Fixed poll interval, used when no expected render time is known
+            expected: Expected render time in seconds; enables adaptive polling
+            min_interval: Shortest gap between polls around the expected completion
+            max_interval: Longest gap between polls early in a render
+            queue_timeout: Seconds after submission a task may wait in the queue
+                (PENDING/THROTTLED) before it counts as timed out
+        """
+        self.timeout = timeout
+        self.interval = interval
+        self.expected = expected
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.queue_timeout = queue_timeout
+
+    def next_delay(self, elapsed: float) -> float:
+        """Seconds to wait before the next poll, given seconds into the render."""
+        if self.expected is None:
+            return self.interval
+
+        remaining = self.expected - elapsed
+        if remaining > 0:
+            # Poll rarely early on, halving the gap as completion approaches
+            delay = min(max(remaining / 2, self.min_interval), self.max_interval)
+        else:
+            # Dense just after the expected time, backing off as the task runs late
+            delay = min(self.min_interval + (-remaining) * 0.25, self.max_interval)
+        return delay
+
+
+class RenderLatencyStats:
+    """Observed render times per model/ratio, persisted between runs."""
+
+    # Expected render seconds before anything has been observed
+    PRIORS = {"act_two": 120.0, "act_two_turbo": 60.0}
+    DEFAULT_PRIOR = 120.0
+    MAX_SAMPLES = 200  # Most recent samples kept per model/ratio
+    MIN_SAMPLES = 5  # Samples needed before the timeout is derived from p99
+    TIMEOUT_MARGIN = 1.5  # Timeout = p99 * margin
+    MIN_TIMEOUT = 120.0
+
+    def __init__(self, path: Optional[Path] = None, default_timeout: float = 600):
+        """
+        Initialize latency stats.
+
+        Args:
+            path: JSON file used to persist samples (None keeps them in memory only)
+            default_timeout: Timeout used until enough samples exist
+        """
+        self.path = Path(path) if path else None
+        self.default_timeout = default_timeout
+        self._samples: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def _key(model: str, ratio: Optional[str]) -> str:
+        return f"{model}|{ratio or '*'}"
+
+    def _load(self):
+        """Read persisted samples, ignoring a missing or unreadable file."""
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            self._samples = {key: [float(v) for v in values][-self.MAX_SAMPLES:]
+                             for key, values in data.get("samples", {}).items()}
+        except Exception as e:
+            logger.warning(f"Could not load render latency stats from {self.path}: {e}")
+
+    def _save(self):
+        """Persist samples atomically."""
+        if not self.path:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump({"samples": self._samples}, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Could not save render latency stats to {self.path}: {e}")
+
+    def record(self, model: str, ratio: Optional[str], seconds: float):
+        """Record one observed render time."""
+        with self._lock:
+            samples = self._samples.setdefault(self._key(model, ratio), [])
+            samples.append(round(seconds, 2))
+            del samples[:-self.MAX_SAMPLES]
+            self._save()
+
+    def _samples_for(self, model: str, ratio: Optional[str]) -> List[float]:
+        """Samples for this model/ratio, falling back to all ratios of the model."""
+        with self._lock:
+            samples = self._samples.get(self._key(model, ratio), [])
+            if len(samples) >= self.MIN_SAMPLES:
+                return sorted(samples)
+            prefix = f"{model}|"
+            pooled = [v for key, values in self._samples.items() if key.startswith(prefix) for v in values]
+            return sorted(pooled)
+
+    @staticmethod
+    def _percentile(sorted_samples: List[float], pct: float) -> float:
+        index = min(len(sorted_samples) - 1, max(0, math.ceil(pct / 100 * len(sorted_samples)) - 1))
+        return sorted_samples[index]
+
+    def expected(self, model: str, ratio: Optional[str] = None) -> float:
+        """Median observed render time, or the model prior when nothing is known."""
+        samples = self._samples_for(model, ratio)
+        if not samples:
+            return self.PRIORS.get(model, self.DEFAULT_PRIOR)
+        return self._percentile(samples, 50)
+
+    def timeout(self, model: str, ratio: Optional[str] = None) -> float:
+        """Timeout derived from the observed p99 render time (counted from the first RUNNING status)."""
+        samples = self._samples_for(model, ratio)
+        if len(samples) < self.MIN_SAMPLES:
+            return self.default_timeout
+        return max(self._percentile(samples, 99) * self.TIMEOUT_MARGIN, self.MIN_TIMEOUT)
+
+    def schedule_for(self, model: str, ratio: Optional[str] = None) -> PollSchedule:
+        """
+        Adaptive poll schedule for a task of this model and ratio
+
+        Samples are render times, so the derived timeout only starts once the
+        task is RUNNING; until then the task may stay queued for default_timeout.
+        """
+        return PollSchedule(timeout=self.timeout(model, ratio), expected=self.expected(model, ratio),
+                            queue_timeout=self.default_timeout)
+
+
+class _WatchedTask:
+    """Bookkeeping for one outstanding task."""
+
+    __slots__ = ("task_id", "future", "started", "running_since", "polls", "failed_polls", "schedule", "on_running")
+
+    def __init__(self, task_id: str, schedule: PollSchedule, on_running: Optional[Callable[[], None]] = None):
+        self.task_id = task_id
+        self.future = Future()
+        self.started = time.monotonic()
+        self.running_since: Optional[float] = None  # First poll that saw RUNNING
+        self.polls = 0
+        self.failed_polls = 0  # Consecutive polls that returned status UNKNOWN
+        self.schedule = schedule
+        self.on_running = on_running
+
+
+class TaskPoller:
+    """Polls all outstanding tasks from a single thread in deadline order."""
+
+    def __init__(self, check_status: Callable[[str], Optional[Dict]], poll_interval: float = 10,
+                 max_wait: float = 600, max_requests_per_second: float = 5.0):
+        """
+        Initialize the poller.
+
+        Args:
+            check_status: Returns the task status dict, status UNKNOWN (optionally with
+                'retry_after' seconds) when the check should be retried, or None
+                when the task cannot be checked at all
+            poll_interval: Seconds between status checks for tasks watched without a schedule
+            max_wait: Timeout for tasks watched without a schedule
+            max_requests_per_second: Upper bound on status requests across all tasks
+        """
+        self.check_status = check_status
+        self.poll_interval = poll_interval
+        self.max_wait = max_wait
+        self.min_request_gap = 1.0 / max_requests_per_second if max_requests_per_second > 0 else 0.0
+
+        self._heap = []  # (deadline, seq, task_id)
+        self._tasks: Dict[str, _WatchedTask] = {}
+        self._seq = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._last_request = 0.0
+
+    def watch(self, task_id: str, schedule: Optional[PollSchedule] = None,
+              on_running: Optional[Callable[[], None]] = None) -> Future:
+        """
+        Start tracking a submitted task.
+
+        Args:
+            task_id: ID returned when the task was created
+            schedule: Poll timing for this task (fixed poll_interval/max_wait if None)
+            on_running: Called on the poller thread when the task first reports RUNNING
+
+        Returns:
+            Future resolving to the status dict when the task SUCCEEDED, or None
+            when it failed, timed out or its status could not be read
+        """
+        with self._condition:
+            if task_id in self._tasks:
+                return self._tasks[task_id].future
+
+            if schedule is None:
+                schedule = PollSchedule(timeout=self.max_wait, interval=self.poll_interval)
+            watched = _WatchedTask(task_id, schedule, on_running)
+            self._tasks[task_id] = watched
+            self._schedule(task_id, watched.started + schedule.next_delay(0))
+
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="task-poller", daemon=True)
+                self._thread.start()
+            return watched.future
+
+    def cancel(self, task_id: str) -> bool:
+        """
+        Stop polling a task and cancel its future (done callbacks see a cancelled future).
+
+        Returns:
+            True if the task was being polled
+        """
+        with self._condition:
+            watched = self._tasks.pop(task_id, None)
+            if watched is None:
+                return False
+            self._heap = [entry for entry in self._heap if entry[2] != task_id]
+            heapq.heapify(self._heap)
+            self._condition.notify()
+        watched.future.cancel()
+        return True
+
+    @property
+    def outstanding(self) -> int:
+        """Number of tasks still being polled."""
+        with self._condition:
+            return len(self._tasks)
+
+    def _schedule(self, task_id: str, deadline: float):
+        """Push a task onto the heap and wake the poller if it is now the earliest."""
+        heapq.heappush(self._heap, (deadline, next(self._seq), task_id))
+        self._condition.notify()
+
+    def _next_due(self) -> Optional[_WatchedTask]:
+        """Block until the earliest task is due; return None when nothing is left."""
+        with self._condition:
+            while True:
+                if not self._heap:
+                    # Exit when idle; watch() restarts the thread on demand
+                    self._thread = None
+                    return None
+
+                deadline, _, task_id = self._heap[0]
+                now = time.monotonic()
+                if deadline > now:
+                    self._condition.wait(deadline - now)
+                    continue
+
+                heapq.heappop(self._heap)
+                watched = self._tasks.get(task_id)
+                if watched is not None:
+                    return watched
+
+    def _run(self):
+        """Poller thread main loop."""
+        while True:
+            watched = self._next_due()
+            if watched is None:
+                return
+
+            # Keep the request rate bounded regardless of how many tasks are due
+            gap = self._last_request + self.min_request_gap - time.monotonic()
+            if gap > 0:
+                time.sleep(gap)
+            self._last_request = time.monotonic()
+
+            try:
+                status_data = self.check_status(watched.task_id)
+            except Exception as e:
+                logger.error(f"Error checking task {watched.task_id}: {str(e)}")
+                status_data = None
+            watched.polls += 1
+
+            if status_data is None:
+                self._finish(watched, None)
+                continue
+
+            status = status_data.get('status', 'UNKNOWN')
+            logger.info(f"Task {watched.task_id} status: {status}")
+
+            if status == 'SUCCEEDED':
+                self._finish(watched, status_data)
+            elif status == 'FAILED':
+                logger.error(f"Task {watched.task_id} failed: {status_data.get('error', 'Unknown error')}")
+                self._finish(watched, None)
+            elif status == 'CANCELLED':
+                logger.error(f"Task {watched.task_id} was cancelled")
+                self._finish(watched, None)
+            else:
+                now = time.monotonic()
+                watched.failed_polls = watched.failed_polls + 1 if status == 'UNKNOWN' else 0
+                if status == 'RUNNING' and watched.running_since is None:
+                    watched.running_since = now
+                    if watched.on_running is not None:
+                        try:
+                            watched.on_running()
+                        except Exception as e:
+                            logger.warning(f"on_running callback for task {watched.task_id} failed: {str(e)}")
+
+                schedule = watched.schedule
+                if schedule.queue_timeout is None:
+                    # Everything counts from submission
+                    elapsed = limit_elapsed = now - watched.started
+                    limit = schedule.timeout
+                elif watched.running_since is None:
+                    # Still queued: the render-time timeout has not started yet
+                    elapsed, limit_elapsed, limit = 0.0, now - watched.started, schedule.queue_timeout
+                else:
+                    elapsed = limit_elapsed = now - watched.running_since
+                    limit = schedule.timeout
+
+                if limit_elapsed >= limit:
+                    state = "queued" if schedule.queue_timeout is not None and watched.running_since is None else "rendering"
+                    logger.error(f"Task {watched.task_id} timed out after {limit:.0f} seconds {state}")
+                    self._finish(watched, None)
+                    continue
+                delay = schedule.next_delay(elapsed)
+                if watched.failed_polls:
+                    # Back off exponentially while checks fail, honouring any Retry-After
+                    backoff = min(schedule.min_interval * 2 ** (watched.failed_polls - 1), schedule.max_interval)
+                    delay = max(delay, backoff, status_data.get('retry_after') or 0)
+                # Never sleep past the timeout
+                delay = min(delay, limit - limit_elapsed)
+                with self._condition:
+                    self._schedule(watched.task_id, time.monotonic() + delay)
+
+    def _finish(self, watched: _WatchedTask, result: Optional[Dict]):
+        """Stop tracking a task and resolve its future."""
+        with self._condition:
+            self._tasks.pop(watched.task_id, None)
+        try:
+            watched.future.set_result(result)
+        except InvalidStateError:
+            pass  # Cancelled while its last poll was in flight
@@ -0,0 +1,375 @@
+"""
+Parallel directory traversal for input folders.
+Built on os.scandir so file/directory checks reuse the type information
+returned with each listing instead of issuing a stat per entry, and fans
+subdirectory listings out across a thread pool - on network shares each
+listing is a round-trip, so listing many directories at once hides most of
+the latency. Supports a depth limit, exclude globs and a symlink policy.
+Listings are kept in a session-wide ScanCache validated by directory mtimes,
+so the folder selector, the dry run and processing walk a tree at most once
+between changes; the cache holds compact name/type tuples, bounded in size.
+"""
+
+import fnmatch
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+Listing = Tuple[List[os.DirEntry], List[os.DirEntry]]  # (subdirectories, files)
+
+# Returned for directories that cannot be read; never cached
+UNREADABLE: Listing = ([], [])
+
+FILE_ATTRIBUTE_REPARSE_POINT = 0x400
+
+
+def is_link(entry) -> bool:
+    """
+    Whether an entry is a symlink or (on Windows) a junction
+
+    Only these can close a cycle. On Windows the attributes come with the
+    listing, so the check costs no extra round-trip.
+    """
+    if isinstance(entry, WalkEntry):
+        return entry.is_symlink()
+    if entry.is_symlink():
+        return True
+    if os.name == 'nt':
+        attributes = getattr(entry.stat(follow_symlinks=False), 'st_file_attributes', 0)
+        return bool(attributes & FILE_ATTRIBUTE_REPARSE_POINT)
+    return False
+
+
+class WalkEntry:
+    """
+    Stand-in for an os.DirEntry rebuilt from a cached listing.
+
+    Offers the same name, path and type checks (is_symlink() also covers
+    Windows junctions); stat() goes to the filesystem.
+    """
+
+    __slots__ = ("name", "path", "_is_dir", "_is_symlink")
+
+    def __init__(self, directory: str, name: str, is_dir: bool, is_symlink: bool):
+        self.name = name
+        self.path = os.path.join(directory, name)
+        self._is_dir = is_dir
+        self._is_symlink = is_symlink
+
+    def is_dir(self, follow_symlinks: bool = True) -> bool:
+        return self._is_dir
+
+    def is_file(self, follow_symlinks: bool = True) -> bool:
+        return not self._is_dir
+
+    def is_symlink(self) -> bool:
+        return self._is_symlink
+
+    def stat(self, follow_symlinks: bool = True) -> os.stat_result:
+        return os.stat(self.path, follow_symlinks=follow_symlinks)
+
+    def inode(self) -> int:
+        return os.stat(self.path, follow_symlinks=False).st_ino
+
+    def __fspath__(self) -> str:
+        return self.path
+
+    def __repr__(self) -> str:
+        return f"<WalkEntry {self.name!r}>"
+
+
+class ScanCache:
+    """
+    Directory listings kept for the session, revalidated by mtime.
+
+    Reusing a listing costs one stat of the directory instead of a full
+    listing. Only (name, is_dir, is_symlink) tuples are kept, never DirEntry
+    objects or their stat results, and the least recently used directories
+    are dropped beyond max_directories. Picking a different input root
+    clears the cache.
+    """
+
+    # Directories modified this recently are listed again next time, since a
+    # change within the same mtime tick would otherwise go unnoticed
+    RACY_WINDOW_NS = 2_000_000_000
+
+    DEFAULT_MAX_DIRECTORIES = 20_000
+
+    def __init__(self, max_directories: int = DEFAULT_MAX_DIRECTORIES):
+        """
+        Initialize the cache.
+
+        Args:
+            max_directories: Listings kept; least recently used ones go first
+        """
+        self.max_directories = max(1, int(max_directories))
+        self._listings: "OrderedDict[Tuple, Tuple[int, Tuple]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.root: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._listings)
+
+    def use_root(self, root: str):
+        """Note the input root being worked on, dropping every listing if it changed"""
+        root = os.path.abspath(root)
+        with self._lock:
+            if self.root is not None and root != self.root:
+                self._listings.clear()
+            self.root = root
+
+    @staticmethod
+    def _compact(listing: Listing) -> Tuple:
+        subdirs, files = listing
+        return (tuple((entry.name, True, is_link(entry)) for entry in subdirs) +
+                tuple((entry.name, False, is_link(entry)) for entry in files))
+
+    @staticmethod
+    def _expand(directory: str, compact: Tuple) -> Listing:
+        subdirs, files = [], []
+        for name, is_dir, is_symlink in compact:
+            (subdirs if is_dir else files).append(WalkEntry(directory, name, is_dir, is_symlink))
+        return subdirs, files
+
+    def listing(self, key: Tuple, directory: str, scan) -> Listing:
+        """
+        Cached listing of directory, or scan(directory) if it changed
+
+        Args:
+            key: Identifies the directory and the walker settings that filtered it
+            directory: Directory to list
+            scan: Uncached listing function
+        """
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except OSError:
+            with self._lock:
+                self._listings.pop(key, None)
+            return scan(directory)
+
+        with self._lock:
+            cached = self._listings.get(key)
+            if cached is not None and cached[0] == mtime_ns:
+                self._listings.move_to_end(key)
+                self.hits += 1
+                compact = cached[1]
+            else:
+                self.misses += 1
+                compact = None
+        if compact is not None:
+            return self._expand(directory, compact)
+
+        listing = scan(directory)
+        if listing is not UNREADABLE and time.time_ns() - mtime_ns >= self.RACY_WINDOW_NS:
+            compact = self._compact(listing)
+            with self._lock:
+                self._listings[key] = (mtime_ns, compact)
+                self._listings.move_to_end(key)
+                while len(self._listings) > self.max_directories:
+                    self._listings.popitem(last=False)
+        return listing
+
+    def clear(self):
+        with self._lock:
+            self._listings.clear()
+
+
+_shared_cache: Optional[ScanCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_scan_cache() -> ScanCache:
+    """Return the process-wide scan cache, creating it on first use"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ScanCache()
+        return _shared_cache
+
+
+class TreeWalker:
+    """os.scandir-based walker that lists directories on a thread pool."""
+
+    DEFAULT_WORKERS = 8
+
+    def __init__(self, exclude: Sequence[str] = (), follow_symlinks: bool = True,
+                 workers: int = DEFAULT_WORKERS, cache: Optional[ScanCache] = None):
+        """
+        Initialize the walker.
+
+        Args:
+            exclude: Glob patterns; entries whose name or full path matches are skipped
+            follow_symlinks: Descend into symlinked directories (cycles are detected);
+                when False they are skipped, while symlinked files are still listed
+            workers: Directory listings in flight at once (1 = serial)
+            cache: Reuse listings from this cache while their directory mtime is unchanged
+        """
+        self.exclude = tuple(exclude)
+        self.follow_symlinks = bool(follow_symlinks)
+        self.workers = max(1, int(workers))
+        self.cache = cache
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "TreeWalker":
+        """Walker for a configuration's scan settings, sharing the session scan cache"""
+        return cls(exclude=config.get('scan_exclude_globs', []),
+                   follow_symlinks=config.get('follow_symlinks', True),
+                   workers=config.get('scan_workers', cls.DEFAULT_WORKERS),
+                   cache=get_scan_cache())
+
+    def _excluded(self, entry: os.DirEntry) -> bool:
+        if not self.exclude:
+            return False
+        path = entry.path.replace(os.sep, '/')
+        return any(fnmatch.fnmatch(entry.name, pattern) or fnmatch.fnmatch(path, pattern)
+                   for pattern in self.exclude)
+
+    def scan(self, directory: str) -> Listing:
+        """
+        List one directory (from the cache when it has not changed)
+
+        Args:
+            directory: Directory to list
+
+        Returns:
+            Tuple of (subdirectory entries, file entries) in listing order;
+            both empty if the directory cannot be read. Entries are os.DirEntry
+            objects, or WalkEntry objects with the same interface when the
+            listing came from the cache.
+        """
+        if self.cache is None:
+            return self._scan(directory)
+        key = (os.path.abspath(directory), self.exclude, self.follow_symlinks)
+        return self.cache.listing(key, directory, self._scan)
+
+    def _scan(self, directory: str) -> Listing:
+        subdirs, files = [], []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if self._excluded(entry):
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            # Junctions list as plain directories; skip them like symlinks
+                            if self.follow_symlinks or not is_link(entry):
+                                subdirs.append(entry)
+                        elif entry.is_symlink():
+                            if entry.is_dir():
+                                if self.follow_symlinks:
+                                    subdirs.append(entry)
+                            elif entry.is_file():
+                                files.append(entry)
+                        elif entry.is_file(follow_symlinks=False):
+                            files.append(entry)
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.warning(f"Could not list {directory}: {str(e)}")
+            return UNREADABLE
+        return subdirs, files
+
+    def scan_many(self, directories: Iterable[str]) -> Iterator[Tuple[str, List[os.DirEntry], List[os.DirEntry]]]:
+        """
+        List several directories concurrently, yielding them in the given order
+
+        Args:
+            directories: Directories to list
+
+        Returns:
+            Iterator of (directory, subdirectory entries, file entries)
+        """
+        directories = list(directories)
+        if self.workers == 1 or len(directories) < 2:
+            for directory in directories:
+                yield (directory,) + self.scan(directory)
+            return
+
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scan")
+        try:
+            for directory, (subdirs, files) in zip(directories, executor.map(self.scan, directories)):
+                yield directory, subdirs, files
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def walk(self, root: str, max_depth: Optional[int] = None) -> Iterator[Tuple[str, int, List[os.DirEntry], List[os.DirEntry]]]:
+        """
+        Walk a tree, listing subdirectories in parallel
+
+        Directories are yielded as their listings complete, so the order is
+        not deterministic; sort the results where order matters.
+
+        Args:
+            root: Top directory (depth 0)
+            max_depth: Deepest level to list (0 = root only, None = unlimited)
+
+        Returns:
+            Iterator of (directory, depth, subdirectory entries, file entries)
+        """
+        root = os.path.abspath(root)
+        root_real = os.path.realpath(root)
+        visited = {root_real}  # Resolved targets of followed links
+        visited_lock = threading.Lock()
+
+        def first_visit(entry) -> bool:
+            # Only a followed symlink or junction can close a cycle, so plain
+            # directories need no extra stat - just resolve the links
+            if not self.follow_symlinks or not is_link(entry):
+                return True
+            target = os.path.realpath(entry.path)
+            if target.startswith(root_real + os.sep):
+                return False  # Inside the tree, walked through its real path
+            with visited_lock:
+                if target in visited:
+                    return False
+                visited.add(target)
+                return True
+
+        def children(directory_depth: int, subdirs: List[os.DirEntry]) -> List[Tuple[str, int]]:
+            if max_depth is not None and directory_depth >= max_depth:
+                return []
+            return [(entry.path, directory_depth + 1) for entry in subdirs if first_visit(entry)]
+
+        if self.workers == 1:
+            stack = [(root, 0)]
+            while stack:
+                directory, depth = stack.pop()
+                subdirs, files = self.scan(directory)
+                yield directory, depth, subdirs, files
+                stack.extend(reversed(children(depth, subdirs)))
+            return
+
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="walk")
+        try:
+            pending = {executor.submit(self.scan, root): (root, 0)}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    directory, depth = pending.pop(future)
+                    subdirs, files = future.result()
+                    for child in children(depth, subdirs):
+                        pending[executor.submit(self.scan, child[0])] = child
+                    yield directory, depth, subdirs, files
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def files(self, root: str, max_depth: Optional[int] = None, min_depth: int = 0) -> Iterator[os.DirEntry]:
+        """
+        File entries under root
+
+        Args:
+            root: Top directory (depth 0)
+            max_depth: Deepest level whose files are included (None = unlimited)
+            min_depth: Shallowest level whose files are included
+        """
+        for _, depth, _, files in self.walk(root, max_depth):
+            if depth >= min_depth:
+                yield from files
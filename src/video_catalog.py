@@ -0,0 +1,369 @@
+"""
+Index of existing output videos for duplicate detection.
+Known videos are kept in a persistent SQLite catalog (path, stem tokens, size,
+mtime and the source image that produced them). Each run refreshes it
+incrementally - directories whose mtime is unchanged are not listed again -
+and loads it into an in-memory inverted index from normalized name tokens to
+video IDs, so checking whether a person already has a video intersects a few
+posting lists regardless of archive size.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from path_utils import path_manager
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv', '.webm')
+
+_TOKEN_SPLIT = re.compile(r'[\W_]+')
+
+# Bump when name_tokens changes so catalogued tokens are recomputed
+TOKENIZER_VERSION = 2
+
+
+def normalize_name(text: str) -> str:
+    """Casefolded, compatibility-decomposed text with accents removed ('José' -> 'jose')"""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def name_tokens(text: str) -> List[str]:
+    """Normalized alphanumeric tokens (any script) of a name or file stem"""
+    return [token for token in _TOKEN_SPLIT.split(normalize_name(text)) if token]
+
+
+def _walk_videos(root: Path) -> Iterator[str]:
+    """Paths of all videos under root (full walk, no stat calls)."""
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.lower().endswith(VIDEO_EXTENSIONS):
+                yield os.path.join(dirpath, filename)
+
+
+class VideoCatalog:
+    """Persistent SQLite catalog of output videos, refreshed by directory mtime."""
+
+    # Directories modified this recently are rescanned next time, since a
+    # change within the same mtime tick would otherwise go unnoticed
+    RACY_WINDOW_NS = 2_000_000_000
+
+    # Directories synced per commit during refresh
+    BATCH_DIRECTORIES = 64
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS dirs (
+            path TEXT PRIMARY KEY,
+            parent TEXT,
+            mtime_ns INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+        CREATE TABLE IF NOT EXISTS videos (
+            id INTEGER PRIMARY KEY,
+            path TEXT UNIQUE NOT NULL,
+            dir TEXT NOT NULL,
+            stem TEXT NOT NULL,
+            tokens TEXT NOT NULL,
+            size INTEGER,
+            mtime_ns INTEGER,
+            source_image TEXT
+        );
+        CREATE INDEX IF NOT EXISTS videos_dir ON videos(dir);
+        CREATE INDEX IF NOT EXISTS videos_source ON videos(source_image);
+    """
+
+    def __init__(self, db_path: Optional[Path] = None):
+        """
+        Open (or create) the catalog.
+
+        Args:
+            db_path: SQLite file (defaults to <project>/cache/video_catalog.sqlite3)
+        """
+        self.db_path = Path(db_path) if db_path else path_manager.project_dir / "cache" / "video_catalog.sqlite3"
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(self.SCHEMA)
+        self._db.commit()
+        self._migrate_tokens()
+
+    def _migrate_tokens(self):
+        """Recompute stored tokens if they were written by an older tokenizer."""
+        (version,) = self._db.execute("PRAGMA user_version").fetchone()
+        if version == TOKENIZER_VERSION:
+            return
+        with self._lock, self._db:
+            rows = self._db.execute("SELECT id, stem FROM videos").fetchall()
+            self._db.executemany("UPDATE videos SET tokens = ? WHERE id = ?",
+                                 [(" ".join(sorted(set(name_tokens(stem)))), video_id) for video_id, stem in rows])
+            self._db.execute(f"PRAGMA user_version = {TOKENIZER_VERSION}")
+        if rows:
+            logger.info(f"Re-tokenized {len(rows)} catalogued videos")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def refresh(self, root: str) -> Dict[str, int]:
+        """
+        Bring the catalog up to date for everything under root
+
+        Directories whose mtime matches the catalog are not listed; their known
+        subdirectories are still checked, so only changed subtrees are rescanned.
+        (A directory's mtime changes when entries are added, removed or renamed,
+        not when a file is rewritten in place.) The filesystem is read without
+        holding the catalog lock, which is taken briefly per directory, and
+        changes are committed every BATCH_DIRECTORIES directories, so record()
+        calls from download threads are never blocked for the whole walk.
+
+        Returns:
+            Counts of 'checked' and 'rescanned' directories
+        """
+        root = os.path.abspath(root)
+        checked = rescanned = pending = 0
+        now_ns = time.time_ns()
+        stack = [root]
+        try:
+            while stack:
+                directory = stack.pop()
+                checked += 1
+                try:
+                    mtime_ns = os.stat(directory).st_mtime_ns
+                except OSError:
+                    with self._lock:
+                        self._forget_tree(directory)
+                        pending += 1
+                    continue
+
+                with self._lock:
+                    row = self._db.execute("SELECT mtime_ns FROM dirs WHERE path = ?", (directory,)).fetchone()
+                    if row and row[0] == mtime_ns:
+                        stack.extend(sub for (sub,) in self._db.execute(
+                            "SELECT path FROM dirs WHERE parent = ?", (directory,)))
+                        continue
+
+                try:
+                    subdirs, videos = self._list(directory)
+                except OSError as e:
+                    logger.warning(f"Could not list {directory} for the video catalog: {str(e)}")
+                    continue
+
+                rescanned += 1
+                stored_mtime = -1 if now_ns - mtime_ns < self.RACY_WINDOW_NS else mtime_ns
+                with self._lock:
+                    self._sync(directory, subdirs, videos)
+                    self._db.execute(
+                        "INSERT INTO dirs (path, parent, mtime_ns) VALUES (?, ?, ?) "
+                        "ON CONFLICT(path) DO UPDATE SET parent = excluded.parent, mtime_ns = excluded.mtime_ns",
+                        (directory, os.path.dirname(directory), stored_mtime))
+                    pending += 1
+                    if pending >= self.BATCH_DIRECTORIES:
+                        self._db.commit()
+                        pending = 0
+                stack.extend(subdirs)
+        finally:
+            with self._lock:
+                self._db.commit()
+
+        logger.info(f"Video catalog refreshed for {root}: {checked} folders checked, {rescanned} rescanned")
+        return {"checked": checked, "rescanned": rescanned}
+
+    @staticmethod
+    def _list(directory: str) -> Tuple[List[str], Dict[str, Tuple[int, int]]]:
+        """List one directory. Returns its subdirectories and {video path: (size, mtime_ns)}."""
+        subdirs, videos = [], {}
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.name.lower().endswith(VIDEO_EXTENSIONS):
+                        stat = entry.stat()
+                        videos[entry.path] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    continue
+        return subdirs, videos
+
+    def _sync(self, directory: str, subdirs: List[str], videos: Dict[str, Tuple[int, int]]):
+        """Make the catalog match one directory's listing (caller holds the lock)."""
+        known = {path for (path,) in self._db.execute("SELECT path FROM videos WHERE dir = ?", (directory,))}
+        for path in known - videos.keys():
+            self._db.execute("DELETE FROM videos WHERE path = ?", (path,))
+        for path, (size, mtime_ns) in videos.items():
+            self._upsert(path, directory, size, mtime_ns)
+
+        known_subdirs = {path for (path,) in self._db.execute("SELECT path FROM dirs WHERE parent = ?", (directory,))}
+        for path in known_subdirs - set(subdirs):
+            self._forget_tree(path)
+
+    def _upsert(self, path: str, directory: str, size: int, mtime_ns: int, source_image: Optional[str] = None):
+        stem = Path(path).stem
+        self._db.execute(
+            "INSERT INTO videos (path, dir, stem, tokens, size, mtime_ns, source_image) VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, "
+            "source_image = COALESCE(excluded.source_image, videos.source_image)",
+            (path, directory, stem, " ".join(sorted(set(name_tokens(stem)))), size, mtime_ns, source_image))
+
+    @staticmethod
+    def _subtree_range(directory: str) -> Tuple[str, str]:
+        """Bounds (inclusive, exclusive) of every path strictly below directory."""
+        prefix = directory.rstrip(os.sep) + os.sep
+        return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+    def _forget_tree(self, directory: str):
+        """Drop a directory and everything catalogued below it."""
+        low, high = self._subtree_range(directory)
+        self._db.execute("DELETE FROM videos WHERE dir = ? OR (dir >= ? AND dir < ?)", (directory, low, high))
+        self._db.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (directory, low, high))
+
+    def record(self, video_path: str, source_image: Optional[str] = None):
+        """Add a video written by this tool, remembering the image it was made from."""
+        path = os.path.abspath(video_path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        with self._lock, self._db:
+            self._upsert(path, os.path.dirname(path), stat.st_size, stat.st_mtime_ns, source_image)
+
+    def videos_under(self, root: str) -> Iterator[Tuple[int, str, str]]:
+        """(id, path, space-separated tokens) of every catalogued video under root."""
+        low, high = self._subtree_range(os.path.abspath(root))
+        with self._lock:
+            rows = self._db.execute("SELECT id, path, tokens FROM videos WHERE path >= ? AND path < ?",
+                                    (low, high)).fetchall()
+        yield from rows
+
+    def videos_for_source(self, source_image: str) -> List[str]:
+        """Videos previously produced from this image."""
+        with self._lock:
+            rows = self._db.execute("SELECT path FROM videos WHERE source_image = ?",
+                                    (os.path.abspath(source_image),)).fetchall()
+        return [path for (path,) in rows]
+
+
+_shared_catalog: Optional[VideoCatalog] = None
+_shared_catalog_lock = threading.Lock()
+
+
+def get_video_catalog() -> VideoCatalog:
+    """Return the process-wide catalog in the project cache, opening it on first use"""
+    global _shared_catalog
+    with _shared_catalog_lock:
+        if _shared_catalog is None:
+            _shared_catalog = VideoCatalog()
+        return _shared_catalog
+
+
+class VideoIndex:
+    """Inverted index from normalized name tokens to the videos under a folder."""
+
+    def __init__(self, root: str, catalog: Optional[VideoCatalog] = None):
+        """
+        Initialize the index (loaded on first use).
+
+        Args:
+            root: Folder searched recursively for videos
+            catalog: Persistent catalog to refresh and load from; without one
+                the folder is walked in full
+        """
+        self.root = Path(root)
+        self.catalog = catalog
+        self._postings: Dict[str, List[int]] = {}  # token -> ascending video IDs
+        self._paths: List[str] = []  # video ID -> path
+        self._ids: Dict[str, int] = {}  # path -> video ID
+        self._built = False
+        self._lock = threading.Lock()
+
+    def _ensure_built(self):
+        with self._lock:
+            if self._built:
+                return
+            started = time.perf_counter()
+            loaded = False
+            if self.catalog is not None:
+                try:
+                    self.catalog.refresh(str(self.root))
+                    for _, path, tokens in self.catalog.videos_under(str(self.root)):
+                        self._add(path, tokens.split())
+                    loaded = True
+                except (sqlite3.Error, OSError) as e:
+                    logger.warning(f"Video catalog unavailable, scanning {self.root} instead: {e}")
+                    self._postings.clear()
+                    self._paths.clear()
+                    self._ids.clear()
+            if not loaded:
+                for path in _walk_videos(self.root):
+                    self._add(path)
+            self._built = True
+            logger.info(f"Indexed {len(self._paths)} existing videos under {self.root} "
+                        f"in {time.perf_counter() - started:.2f}s")
+
+    def _add(self, video_path: str, tokens: Optional[Iterable[str]] = None):
+        if video_path in self._ids:
+            return
+        if tokens is None:
+            tokens = name_tokens(Path(video_path).stem)
+        # IDs only grow, so appending keeps every posting list sorted
+        video_id = len(self._paths)
+        self._paths.append(video_path)
+        self._ids[video_path] = video_id
+        for token in set(tokens):
+            self._postings.setdefault(token, []).append(video_id)
+
+    def add(self, video_path: str):
+        """Record a video written during this run (no-op until the index is built)."""
+        with self._lock:
+            if self._built and str(video_path).lower().endswith(VIDEO_EXTENSIONS):
+                self._add(str(video_path))
+
+    @staticmethod
+    def _contains(postings: List[int], video_id: int) -> bool:
+        position = bisect_left(postings, video_id)
+        return position < len(postings) and postings[position] == video_id
+
+    def find(self, name: str) -> Optional[str]:
+        """
+        A video whose stem contains every token of the name
+
+        Posting lists are intersected smallest first, so the cost depends on
+        the rarest token rather than on the number of videos.
+
+        Args:
+            name: Person name, e.g. 'CIRILA MUNYON'
+
+        Returns:
+            Path of a matching video, or None
+        """
+        tokens = set(name_tokens(name))
+        if not tokens:
+            return None
+        self._ensure_built()
+        with self._lock:
+            postings = []
+            for token in tokens:
+                posting = self._postings.get(token)
+                if not posting:
+                    return None
+                postings.append(posting)
+            postings.sort(key=len)
+
+            smallest, rest = postings[0], postings[1:]
+            for video_id in smallest:
+                if all(self._contains(posting, video_id) for posting in rest):
+                    return self._paths[video_id]
+        return None
+
+    def __len__(self) -> int:
+        self._ensure_built()
+        return len(self._paths)
@@ -0,0 +1,1432 @@
+"""
+Tests for the batch generation pipeline (no network access required)
+"""
+import sys
+import io
+import json
+import time
+import tempfile
+import threading
+from pathlib import Path
+
+import requests
+from requests.adapters import BaseAdapter
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from runway_generator import RunwayActTwoBatchGenerator, RunwayHttpClient, get_http_client
+from task_poller import TaskPoller, PollSchedule, RenderLatencyStats
+from driver_cache import DriverVideoCache
+from generation_payload import InlineData, StreamingJsonBody
+from image_cache import PreprocessedImageCache
+from video_catalog import VideoCatalog
+
+
+class FakeRenderGenerator(RunwayActTwoBatchGenerator):
+    """Generator whose 'render' is a timer, recording peak concurrency"""
+
+    def __init__(self, render_seconds=0.05):
+        super().__init__("key_test", verbose=False, driver_video_path="assets/main_lr.mp4")
+        self.render_seconds = render_seconds
+        self.adaptive_polling = False
+        self.latency_stats = RenderLatencyStats()  # In-memory only
+        self.poll_interval = 0.01
+        self.status_requests_per_second = 0  # No rate cap in tests
+        self.preprocess_ahead = 0  # Fake jobs have no images to preprocess
+        self.image_cache = PreprocessedImageCache(tempfile.mkdtemp())
+        self.started = {}
+        self.status_checks = 0
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def prepare_generation(self, character_image_path, output_folder, config=None):
+        return {
+            "payload": {"image": character_image_path},
+            "output_path": Path(output_folder) / f"{Path(character_image_path).stem}.mp4",
+            "target_ratio": {"name": "16:9", "api_value": "1280:720"},
+        }
+
+    def submit_generation(self, payload):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            self.started[payload["image"]] = time.monotonic()
+        return payload["image"]
+
+    def check_task_status(self, task_id):
+        self.status_checks += 1
+        if time.monotonic() - self.started[task_id] < self.render_seconds:
+            return {"status": "RUNNING"}
+        with self.lock:
+            self.active -= 1
+        if "fail" in task_id:
+            return {"status": "FAILED", "error": "boom"}
+        return {"status": "SUCCEEDED", "output": [task_id]}
+
+    def download_generation(self, status_data, output_path, target_ratio, source_image=None):
+        return str(output_path)
+
+
+def test_generate_batch_bounded_window():
+    """At most max_in_flight jobs render at once and every job is reported"""
+    print("Testing bounded submission window...")
+    generator = FakeRenderGenerator()
+    jobs = [(f"img_{i}.jpg", "out") for i in range(9)] + [("img_fail.jpg", "out")]
+
+    started = time.time()
+    results = dict(generator.generate_batch(iter(jobs), max_in_flight=3))
+    elapsed = time.time() - started
+
+    assert len(results) == 10
+    assert results["img_fail.jpg"] is None
+    assert results["img_0.jpg"].endswith("img_0.mp4")
+    assert generator.peak == 3
+    # 10 jobs of 50ms with 3 in flight finish in ~4 rounds, not 10
+    assert elapsed < 10 * generator.render_seconds
+    print(f"✅ {len(results)} jobs, peak {generator.peak} in flight, {elapsed:.2f}s")
+
+
+def test_generate_batch_sequential_default():
+    """max_in_flight=1 keeps the classic one-at-a-time behaviour"""
+    print("Testing sequential mode...")
+    generator = FakeRenderGenerator(render_seconds=0.01)
+    submitted = []
+    results = list(generator.generate_batch(
+        [(f"img_{i}.jpg", "out") for i in range(4)],
+        on_submit=submitted.append
+    ))
+
+    assert generator.peak == 1
+    assert [path for path, _ in results] == submitted
+    print("✅ Sequential mode preserves submission order")
+
+
+def test_generate_batch_early_stop():
+    """A consumer that stops early leaves no tasks in the poller and no callbacks on a dead executor"""
+    print("Testing early stop of a batch...")
+
+    class EarlyStopGenerator(FakeRenderGenerator):
+        def check_task_status(self, task_id):
+            if task_id.startswith("fast"):
+                return {"status": "SUCCEEDED", "output": [task_id]}
+            return super().check_task_status(task_id)
+
+    generator = EarlyStopGenerator(render_seconds=60)
+    jobs = [("fast.jpg", "out")] + [(f"slow_{i}.jpg", "out") for i in range(5)]
+    for image_path, result in generator.generate_batch(iter(jobs), max_in_flight=3):
+        assert image_path == "fast.jpg"
+        break
+
+    assert generator.task_poller.outstanding == 0  # Slow renders cancelled, not polled for 60s
+    assert len(generator.started) == 3  # Queued jobs never submitted after the stop
+    print("✅ Early stop cancelled outstanding watches")
+
+
+def test_task_poller_shared_heap():
+    """One poller resolves many tasks, checking each only when its deadline is due"""
+    print("Testing shared task poller...")
+    checks = {}
+
+    def check_status(task_id):
+        checks[task_id] = checks.get(task_id, 0) + 1
+        if task_id == "stuck":
+            return {"status": "RUNNING"}
+        if checks[task_id] < 2:
+            return {"status": "PENDING"}
+        return {"status": "SUCCEEDED", "output": [f"https://cdn/{task_id}.mp4"]}
+
+    poller = TaskPoller(check_status, poll_interval=0.02, max_wait=0.1, max_requests_per_second=0)
+    futures = {f"task_{i}": poller.watch(f"task_{i}") for i in range(200)}
+    stuck = poller.watch("stuck")
+
+    for task_id, future in futures.items():
+        assert future.result(timeout=5)["output"][0].endswith(f"{task_id}.mp4")
+        assert checks[task_id] == 2
+    assert stuck.result(timeout=5) is None
+    assert poller.outstanding == 0
+    print(f"✅ 200 tasks resolved with {sum(checks.values())} status checks")
+
+
+def test_adaptive_poll_schedule():
+    """Polls are sparse early, dense near the expected time, timeout follows p99"""
+    print("Testing adaptive poll schedule...")
+    stats = RenderLatencyStats(default_timeout=600)
+
+    # Priors apply before anything is observed
+    assert stats.expected("act_two_turbo") < stats.expected("act_two")
+    assert stats.timeout("act_two", "1280:720") == 600
+
+    for seconds in [80, 90, 95, 100, 100, 105, 110, 200]:
+        stats.record("act_two", "1280:720", seconds)
+    schedule = stats.schedule_for("act_two", "1280:720")
+    assert schedule.expected == 100
+    assert schedule.timeout == 300  # p99 (200s) * 1.5
+    assert schedule.queue_timeout == 600  # Queued tasks keep the old cap
+
+    early = schedule.next_delay(0)
+    near = schedule.next_delay(98)
+    late = schedule.next_delay(160)
+    assert early == schedule.max_interval
+    assert near == schedule.min_interval
+    assert near < late < early
+
+    # Other ratios of the same model fall back to the pooled samples
+    assert stats.expected("act_two", "720:1280") == 100
+    assert PollSchedule(timeout=600, interval=10).next_delay(50) == 10
+    print(f"✅ delays early={early}s near={near}s late={late}s, timeout={schedule.timeout}s")
+
+
+class MockRunwayAdapter(BaseAdapter):
+    """Transport hook standing in for the Runway API"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def send(self, request, timeout=None, **kwargs):
+        self.calls.append((request.method, request.url, timeout))
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        response.status_code = 200
+        if request.method == "POST":
+            body = {"id": "task-123"}
+        else:
+            body = {"id": "task-123", "status": "SUCCEEDED", "output": ["https://cdn/x.mp4"]}
+        response._content = json.dumps(body).encode()
+        return response
+
+    def close(self):
+        pass
+
+
+def test_http_client_transport_hook():
+    """Generator traffic goes through the shared client with per-call timeouts"""
+    print("Testing pooled HTTP client...")
+    assert get_http_client() is get_http_client()
+    assert RunwayActTwoBatchGenerator("key_a").http is RunwayActTwoBatchGenerator("key_b").http
+
+    adapter = MockRunwayAdapter()
+    generator = RunwayActTwoBatchGenerator("key_test", verbose=False)
+    generator.http = RunwayHttpClient(transport=adapter)
+
+    assert generator.submit_generation({"model": "act_two"}) == "task-123"
+    assert generator.check_task_status("task-123")["status"] == "SUCCEEDED"
+    assert [call[0] for call in adapter.calls] == ["POST", "GET"]
+    assert adapter.calls[0][2] == RunwayHttpClient.API_TIMEOUT
+    assert adapter.calls[1][2] == RunwayHttpClient.STATUS_TIMEOUT
+    print("✅ Shared client, transport hook and timeouts in place")
+
+
+class FlakyRawBody(io.BytesIO):
+    """Response body that drops the connection after drop_after bytes"""
+
+    def __init__(self, data, drop_after=None):
+        super().__init__(data)
+        self.drop_after = drop_after
+
+    def read(self, size=-1):
+        if self.drop_after is not None and self.tell() >= self.drop_after:
+            raise requests.ConnectionError("connection reset by peer")
+        if self.drop_after is not None and size > 0:
+            size = min(size, self.drop_after - self.tell())
+        return super().read(size)
+
+
+class MockCdnAdapter(BaseAdapter):
+    """Range-capable file server whose first full GET drops halfway"""
+
+    def __init__(self, data, drop_first=True):
+        super().__init__()
+        self.data = data
+        self.drop_first = drop_first
+        self.ranges = []
+
+    def send(self, request, timeout=None, stream=False, **kwargs):
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        response.headers["ETag"] = '"v1"'
+        range_header = request.headers.get("Range")
+        self.ranges.append(range_header)
+        if range_header:
+            start, end = range_header.split("=")[1].split("-")
+            end = int(end) if end else len(self.data) - 1
+            body = self.data[int(start):end + 1]
+            response.status_code = 206
+            response.headers["Content-Range"] = f"bytes {start}-{end}/{len(self.data)}"
+            response.raw = FlakyRawBody(body)
+        else:
+            response.status_code = 200
+            drop_after = len(self.data) // 2 if self.drop_first else None
+            self.drop_first = False
+            response.raw = FlakyRawBody(self.data, drop_after)
+        response.headers["Content-Length"] = str(len(response.raw.getvalue()))
+        return response
+
+    def close(self):
+        pass
+
+
+def test_streaming_resumable_download():
+    """Downloads stream to .part, resume with Range after a drop, then rename"""
+    print("Testing resumable download...")
+    data = bytes(range(256)) * 12000  # ~3 MB
+    with tempfile.TemporaryDirectory() as tmp:
+        adapter = MockCdnAdapter(data)
+        client = RunwayHttpClient(transport=adapter)
+        dest = Path(tmp) / "out" / "video.mp4"
+
+        assert client.download("https://cdn.example/video.mp4", dest)
+        assert dest.read_bytes() == data
+        assert not list(dest.parent.glob("*.part"))
+        assert adapter.ranges == [None, f"bytes={len(data) // 2}-"]
+
+        # Parallel ranged segments for large files
+        adapter = MockCdnAdapter(data, drop_first=False)
+        client = RunwayHttpClient(transport=adapter)
+        client.SEGMENT_MIN_SIZE = 1024
+        assert client.download("https://cdn.example/video.mp4", dest, segments=4)
+        assert dest.read_bytes() == data
+        assert len(adapter.ranges) == 5  # size probe + 4 segments
+
+        # Concurrent downloads to one destination never share a partial file
+        client = RunwayHttpClient(transport=MockCdnAdapter(data, drop_first=False))
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            client.download("https://cdn.example/video.mp4", dest))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=30)
+        assert results == [True] * 4 and dest.read_bytes() == data
+        assert not list(dest.parent.glob("*.part"))
+    print("✅ Resumed after a dropped connection and reassembled 4 segments")
+
+
+def test_output_paths_unique_per_session():
+    """Jobs resolving to the same output file get numbered names"""
+    print("Testing unique output paths...")
+    generator = RunwayActTwoBatchGenerator("key_test", verbose=False)
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / "face_act_two_16x9.mp4"
+        claimed = [generator.reserve_output_path(output) for _ in range(3)]
+        assert [path.name for path in claimed] == [
+            "face_act_two_16x9.mp4", "face_act_two_16x9_2.mp4", "face_act_two_16x9_3.mp4"]
+        other = Path(tmp) / "other" / "face_act_two_16x9.mp4"
+        assert generator.reserve_output_path(other) == other  # Different folder, no clash
+    print("✅ Same-named images in different folders keep separate videos")
+
+
+class MockUploadAdapter(BaseAdapter):
+    """Local stand-in for the /uploads flow and character_performance"""
+
+    def __init__(self):
+        super().__init__()
+        self.uploads = 0
+        self.submitted_references = []
+        self.reference_expired = False  # Until the next upload
+        self.fail_uploads = False
+        self.moderation_error = False
+        self.reject_barrier = None  # Rejects every submitter before any re-upload
+        self.uploaded = threading.Event()
+
+    def send(self, request, timeout=None, **kwargs):
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        response.status_code = 200
+        body = {}
+        if request.url.endswith("/uploads"):
+            body = {"uploadUrl": "http://storage.local/put", "fields": {"key": "driver"},
+                    "runwayUri": "runway://uploads/driver.mp4"}
+        elif request.url == "http://storage.local/put":
+            if self.fail_uploads:
+                response.status_code = 500
+            else:
+                self.uploads += 1
+                self.reference_expired = False
+                self.uploaded.set()
+                response.status_code = 204
+        elif request.url.endswith("/character_performance"):
+            body = request.body if isinstance(request.body, bytes) else b"".join(request.body)
+            uri = json.loads(body)["reference"]["uri"]
+            self.submitted_references.append(uri[:30])
+            if uri.startswith("runway://") and self.reference_expired:
+                if self.reject_barrier is not None and self.reject_barrier.wait(timeout=10):
+                    self.uploaded.wait(timeout=10)  # Late rejections land after the first re-upload
+                response.status_code = 400
+                body = {"error": "Invalid asset URI"}
+            elif self.moderation_error:
+                response.status_code = 400
+                body = {"error": "Character image failed content moderation"}
+            else:
+                body = {"id": f"task-{len(self.submitted_references)}"}
+        response._content = json.dumps(body).encode()
+        return response
+
+    def close(self):
+        pass
+
+
+def test_driver_video_uploaded_once():
+    """Driver video is uploaded once, referenced by URI, re-uploaded once when rejected"""
+    print("Testing upload-once driver reference...")
+    adapter = MockUploadAdapter()
+    generator = RunwayActTwoBatchGenerator("key_test", verbose=False, driver_video_path="assets/blink_4sec.mp4")
+    generator.http = RunwayHttpClient(transport=adapter)
+    generator.driver_cache = DriverVideoCache(tempfile.mkdtemp())
+    config = {"driver_video_upload": True, "upload_api_url": "http://mock.local/v1"}
+
+    uris = [generator.driver_video_uri(config) for _ in range(3)]
+    assert uris == ["runway://uploads/driver.mp4"] * 3
+    assert adapter.uploads == 1
+    assert generator.driver_video_data_uri is None  # Never encoded inline
+
+    assert generator.submit_generation({"reference": {"type": "video", "uri": uris[0]}}) == "task-1"
+
+    # An image's own validation error leaves the driver reference alone
+    adapter.moderation_error = True
+    assert generator.submit_generation({"reference": {"type": "video", "uri": uris[0]}}) is None
+    assert adapter.uploads == 1 and generator.driver_video_uri(config) == uris[0]
+    adapter.moderation_error = False
+
+    # An expired reference is uploaded again, and uploads stay on
+    adapter.reference_expired = True
+    assert generator.submit_generation({"reference": {"type": "video", "uri": uris[0]}}) == "task-4"
+    assert adapter.uploads == 2
+    assert adapter.submitted_references[-1].startswith("runway://")
+    assert generator.driver_video_uri(config) == uris[0]
+
+    # Only when the re-upload itself fails does the batch fall back to inline data
+    adapter.reference_expired = adapter.fail_uploads = True
+    assert generator.submit_generation({"reference": {"type": "video", "uri": uris[0]}}) == "task-6"
+    assert adapter.submitted_references[-1].startswith("data:video/mp4;base64,")
+    assert generator.driver_video_uri(config).startswith("data:video/mp4")
+    print("✅ One upload for the session, re-uploaded once after rejection")
+
+
+def test_concurrent_reference_rejections_upload_once():
+    """Submissions rejected at the same time share a single re-upload"""
+    print("Testing concurrent driver reference rejections...")
+    adapter = MockUploadAdapter()
+    generator = RunwayActTwoBatchGenerator("key_test", verbose=False, driver_video_path="assets/blink_4sec.mp4")
+    generator.http = RunwayHttpClient(transport=adapter)
+    generator.driver_cache = DriverVideoCache(tempfile.mkdtemp())
+    config = {"driver_video_upload": True, "upload_api_url": "http://mock.local/v1"}
+    uri = generator.driver_video_uri(config)
+    assert adapter.uploads == 1
+
+    workers = 4
+    adapter.reference_expired = True
+    adapter.reject_barrier = threading.Barrier(workers)
+    adapter.uploaded.clear()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        generator.submit_generation({"reference": {"type": "video", "uri": uri}}))) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+
+    assert len(results) == workers and all(results)
+    assert adapter.uploads == 2  # One re-upload for all rejected submissions
+    assert generator.driver_video_uri(config) == uri and adapter.uploads == 2
+    print("✅ Concurrent rejections share one re-upload")
+
+
+def test_driver_video_cache_across_instances():
+    """A second generator reuses the cached encoding and upload reference"""
+    print("Testing persistent driver video cache...")
+    cache_dir = tempfile.mkdtemp()
+    video = Path(cache_dir) / "driver.mp4"
+    video.write_bytes(b"driver-video-bytes" * 1000)
+    config = {"driver_video_upload": True, "upload_api_url": "http://mock.local/v1"}
+
+    adapter = MockUploadAdapter()
+    first = RunwayActTwoBatchGenerator("key_test", verbose=False, driver_video_path=str(video))
+    first.http = RunwayHttpClient(transport=adapter)
+    first.driver_cache = DriverVideoCache(cache_dir)
+    assert first.driver_video_uri({}).startswith("data:video/mp4;base64,")
+    assert first.driver_video_uri(config) == "runway://uploads/driver.mp4"
+
+    second = RunwayActTwoBatchGenerator("key_test", verbose=False, driver_video_path=str(video))
+    second.http = RunwayHttpClient(transport=adapter)
+    second.driver_cache = DriverVideoCache(cache_dir)
+    second.encode_video_to_data_uri = None  # Must not re-encode
+    assert second.driver_video_uri(config) == "runway://uploads/driver.mp4"
+    assert second.driver_video_uri({}) == first.driver_video_data_uri
+    assert adapter.uploads == 1
+    assert len(list(Path(cache_dir).glob("*.b64"))) == 1
+
+    # Changed content gets a new entry and no stale reference
+    video.write_bytes(b"edited-driver-video" * 1000)
+    third = RunwayActTwoBatchGenerator("key_test", verbose=False, driver_video_path=str(video))
+    third.driver_cache = DriverVideoCache(cache_dir)
+    assert third.driver_cache.get_reference(str(video), "http://mock.local/v1") is None
+    assert third.driver_video_uri({}) != first.driver_video_data_uri
+
+    # The old encoding and its upload reference are pruned rather than kept forever
+    assert len(list(Path(cache_dir).glob("*.b64"))) == 1
+    third.driver_cache.store_reference(str(video), "http://mock.local/v1", "runway://uploads/new.mp4", time.time() + 60)
+    assert sorted(path.name for path in Path(cache_dir).glob("*.json")) == sorted(
+        ["index.json", f"{third.driver_cache.content_hash(str(video))}.json"])
+    print("✅ Encoding and upload reused across instances, invalidated on change")
+
+
+def _index_driver_videos(cache_dir, videos):
+    """Process-pool worker: index and reference several driver videos in a shared cache"""
+    cache = DriverVideoCache(cache_dir)
+    for video in videos:
+        cache.content_hash(video)
+        cache.store_reference(video, "http://mock.local/v1", f"runway://uploads/{Path(video).name}", time.time() + 60)
+
+
+def test_driver_cache_shared_across_processes():
+    """Processes updating one driver cache never lose each other's index entries"""
+    print("Testing driver cache across processes...")
+    from concurrent.futures import ProcessPoolExecutor
+    cache_dir = tempfile.mkdtemp()
+    videos = []
+    for i in range(24):
+        video = Path(cache_dir) / f"driver_{i}.mp4"
+        video.write_bytes(f"driver-{i}".encode() * 100)
+        videos.append(str(video))
+
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        list(executor.map(_index_driver_videos, [cache_dir] * 4, [videos[i::4] for i in range(4)]))
+
+    cache = DriverVideoCache(cache_dir)
+    assert len(json.loads((Path(cache_dir) / "index.json").read_text())) == len(videos)
+    assert all(cache.get_reference(video, "http://mock.local/v1") for video in videos)
+    assert not (Path(cache_dir) / "index.lock").exists()
+    print(f"✅ {len(videos)} videos indexed from 4 processes, none lost")
+
+
+def test_streaming_json_body():
+    """Payload bodies stream inline data chunks and match plain JSON serialization"""
+    print("Testing streamed request bodies...")
+    import http.server
+
+    cache_dir = tempfile.mkdtemp()
+    video = Path(cache_dir) / "driver.mp4"
+    video.write_bytes(bytes(range(256)) * 8000)
+    cache = DriverVideoCache(cache_dir)
+
+    first = RunwayActTwoBatchGenerator("key_test", verbose=False, driver_video_path=str(video))
+    first.driver_cache = cache
+    second = RunwayActTwoBatchGenerator("key_test", verbose=False, driver_video_path=str(video))
+    second.driver_cache = cache
+    driver = first.driver_video_uri({})
+    assert isinstance(driver, InlineData)
+    # Both generators see the same read-only mapping, not copies
+    assert second.driver_video_uri({}).chunks[0].obj is driver.chunks[0].obj
+
+    payload = {
+        "character": {"type": "image", "uri": InlineData(b"data:image/png;base64,", b"QUJD")},
+        "reference": {"type": "video", "uri": driver},
+        "prompt": 'say "hi"',
+        "ratio": "1280:720",
+    }
+    body = StreamingJsonBody.from_payload(payload)
+    expected = json.dumps({**payload, "character": {"type": "image", "uri": "data:image/png;base64,QUJD"},
+                           "reference": {"type": "video", "uri": str(driver)}}).encode()
+    assert body.to_bytes() == expected
+    assert len(body) == len(expected)
+    assert max(len(chunk) for chunk in body) <= 1024 * 1024
+
+    received = {}
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            received["length"] = int(self.headers["Content-Length"])
+            received["body"] = self.rfile.read(received["length"])
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.handle_request, daemon=True).start()
+    response = requests.post(f"http://127.0.0.1:{server.server_port}/", data=body)
+    server.server_close()
+    assert response.status_code == 200
+    assert received["length"] == len(expected)
+    assert json.loads(received["body"])["reference"]["uri"] == str(driver)
+    print("✅ Body streamed with Content-Length from shared mapped driver data")
+
+
+def test_generation_template_reused_per_batch():
+    """Config and driver are compiled once; submissions only splice image and ratio"""
+    print("Testing pre-serialized payload template...")
+    cache_dir = tempfile.mkdtemp()
+    video = Path(cache_dir) / "driver.mp4"
+    video.write_bytes(b"driver" * 5000)
+    generator = RunwayActTwoBatchGenerator("key_test", verbose=False, driver_video_path=str(video))
+    generator.driver_cache = DriverVideoCache(cache_dir)
+    config = {"body_control": True, "seed": 7, "prompt": "smile \"wide\"", "model_version": "act_two"}
+
+    template = generator.generation_template(config)
+    assert generator.generation_template(config) is template
+    assert generator.generation_template(dict(config)) is not template
+
+    character = InlineData(b"data:image/png;base64,", b"QUJD")
+    payload = template.render(character, "1280:720")
+    assert payload["ratio"] == "1280:720" and payload["seed"] == 7 and payload["motionStrength"] == 1.0
+    plain = json.loads(StreamingJsonBody.from_payload(dict(payload)).to_bytes())
+    assert json.loads(StreamingJsonBody.from_payload(payload).to_bytes()) == plain
+    assert plain["reference"]["uri"] == str(generator.driver_video_data_uri)
+    assert plain["character"]["uri"] == "data:image/png;base64,QUJD"
+
+    # The driver chunks are shared, not copied, between rendered bodies
+    other = template.render(InlineData(b"data:image/png;base64,", b"REVG"), "720:1280")
+    driver_view = generator.driver_video_data_uri.chunks[0]
+    assert any(part is driver_view for part in payload.body.parts)
+    assert any(part is driver_view for part in other.body.parts)
+    assert json.loads(other.body.to_bytes())["ratio"] == "720:1280"
+    print("✅ Template compiled once and spliced per image")
+
+
+def test_in_memory_image_preprocessing():
+    """Character images are resized and encoded without temp files unless debugging"""
+    print("Testing in-memory image preprocessing...")
+    import base64
+    import os
+    from PIL import Image
+
+    work_dir = tempfile.mkdtemp()
+    image_path = Path(work_dir) / "face.png"
+    Image.new("RGBA", (900, 1600), (200, 120, 80, 255)).save(image_path)
+    generator = RunwayActTwoBatchGenerator("key_test", verbose=False)
+    generator.image_cache = PreprocessedImageCache(tempfile.mkdtemp())
+    target = {"name": "9:16", **generator.AVAILABLE_RATIOS["9:16"]}
+
+    previous_cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        encoded = generator.preprocess_character_image(str(image_path), target)["data_uri"]
+        assert not Path("temp_resized").exists()
+
+        generator.save_resized_images = True
+        generator.preprocess_character_image(str(image_path), target)
+        assert (Path("temp_resized") / "face_9x16.jpg").exists()
+
+        # The config key turns it on from the UI settings
+        generator.save_resized_images = False
+        (Path("temp_resized") / "face_9x16.jpg").unlink()
+        generator.driver_video_data_uri = "data:video/mp4;base64,AAAA"
+        config = {"aspect_ratio_mode": "9:16", "fixed_aspect_ratio": "9:16", "save_resized_images": True}
+        assert generator.prepare_generation(str(image_path), work_dir, config)
+        assert (Path("temp_resized") / "face_9x16.jpg").exists()
+    finally:
+        os.chdir(previous_cwd)
+
+    assert encoded.startswith("data:image/jpeg;base64,")
+    jpeg = base64.b64decode(str(encoded).split(",", 1)[1])
+    with Image.open(io.BytesIO(jpeg)) as img:
+        assert img.format == "JPEG"
+        assert img.size == (target["width"], target["height"])
+    print("✅ Resized and encoded in memory; temp file only in debug mode")
+
+
+def test_single_decode_preprocessing():
+    """Large JPEGs are decoded near target scale and the ratio comes from the header"""
+    print("Testing draft/reduce preprocessing...")
+    from PIL import Image
+    from image_preprocessing import preprocess_image
+
+    work_dir = tempfile.mkdtemp()
+    photo = Path(work_dir) / "selfie.jpg"
+    Image.new("RGB", (6000, 8000), (90, 140, 200)).save(photo, quality=90)
+    png = Path(work_dir) / "selfie.png"
+    Image.new("RGB", (3000, 4000), (90, 140, 200)).save(png)
+    ratios = RunwayActTwoBatchGenerator.AVAILABLE_RATIOS
+
+    result = preprocess_image(str(photo), ratios=ratios, compare_full_decode=True)
+    assert result["target_ratio"]["name"] == "3:4"
+    assert (result["width"], result["height"]) == (832, 1104)
+    assert result["decoded_size"] == (3000, 4000)  # 1/2 DCT scale, still >= 2x target
+    assert {"decode", "resize", "encode", "full_decode", "decode_saved"} <= set(result["timings"])
+
+    result = preprocess_image(str(png), target_ratio={"name": "16:9", **ratios["16:9"]})
+    assert (result["width"], result["height"]) == (1280, 720)
+    assert result["decoded_size"] == (3000, 4000)  # No draft for PNG; reduce() shrinks after decode
+
+    # The compare_full_decode config key reaches the pipeline and its saving is reported
+    from image_preprocessing import PreprocessPipeline, timing_summary
+    with PreprocessPipeline(ahead=1, compare_full_decode=True) as pipeline:
+        result = pipeline.submit(str(photo), None, ratios).result(timeout=60)
+    assert "decode_saved" in result["timings"]
+    assert "vs full decode" in timing_summary(result)
+    print("✅ One decode near target scale with stage timings")
+
+
+class PrefetchingGenerator(FakeRenderGenerator):
+    """Fake renders, but with real image preprocessing ahead in the process pool"""
+
+    def __init__(self):
+        super().__init__(render_seconds=0.01)
+        self.preprocess_ahead = 2
+        self.prefetched_jobs = 0
+        self.encoded = {}
+
+    def prepare_generation(self, character_image_path, output_folder, config=None):
+        with self.lock:
+            if character_image_path in self._prefetched:
+                self.prefetched_jobs += 1
+        processed = self.preprocess_character_image(character_image_path)
+        self.encoded[character_image_path] = processed["target_ratio"]["name"]
+        return super().prepare_generation(character_image_path, output_folder, config)
+
+
+def test_process_pool_preprocessing_pipeline():
+    """Upcoming images are preprocessed in worker processes, a bounded number ahead"""
+    print("Testing pipelined process-pool preprocessing...")
+    from PIL import Image
+    from image_preprocessing import PreprocessPipeline
+
+    work_dir = Path(tempfile.mkdtemp())
+    images = []
+    for i in range(5):
+        path = work_dir / f"face_{i}.png"
+        Image.new("RGB", (720 + 300 * (i % 2), 1280), (i * 40, 90, 160)).save(path)
+        images.append(str(path))
+
+    pulled = []
+
+    def counted_jobs():
+        for path in images:
+            pulled.append(path)
+            yield path, str(work_dir)
+
+    with PreprocessPipeline(ahead=2) as pipeline:
+        stream = pipeline.prefetch(counted_jobs(), None, RunwayActTwoBatchGenerator.AVAILABLE_RATIOS)
+        first_path, _, first_future = next(stream)
+        assert first_future is None  # First image is prepared inline, never waiting on the pool
+        assert len(pulled) == 3  # Current job plus two ahead - memory stays bounded
+        _, _, second_future = next(stream)
+        assert second_future.result()["target_ratio"]["name"] == "3:4"
+
+    generator = PrefetchingGenerator()
+    results = dict(generator.generate_batch(((path, str(work_dir)) for path in images)))
+    assert all(results[path] for path in images)
+    assert generator.prefetched_jobs == 4
+    assert generator.encoded[images[0]] == "9:16" and generator.encoded[images[1]] == "3:4"
+    assert generator._prefetched == {}
+
+    # Frozen builds must not spawn processes that would re-run the UI entry point
+    from concurrent.futures import ThreadPoolExecutor
+    sys.frozen = True
+    try:
+        with PreprocessPipeline(ahead=1) as pipeline:
+            assert pipeline.submit(images[0], None, RunwayActTwoBatchGenerator.AVAILABLE_RATIOS).result()["data"]
+            assert isinstance(pipeline._executor, ThreadPoolExecutor)
+    finally:
+        del sys.frozen
+    print("✅ Images 2..N preprocessed in the pool while earlier tasks rendered")
+
+
+def test_preprocessed_image_cache():
+    """Reruns reuse encoded images, the cache stays under its cap, exact sizes pass through"""
+    print("Testing preprocessed image cache...")
+    from unittest import mock
+    from PIL import Image
+
+    work_dir = Path(tempfile.mkdtemp())
+    generator = RunwayActTwoBatchGenerator("key_test", verbose=False)
+    generator.image_cache = PreprocessedImageCache(work_dir / "cache")
+    images = []
+    for i in range(3):
+        path = work_dir / f"face_{i}.png"
+        Image.new("RGB", (1000, 1400), (i * 60, 80, 120)).save(path)
+        images.append(str(path))
+
+    first = generator.preprocess_character_image(images[0])
+    with mock.patch("runway_generator.preprocess_image", side_effect=AssertionError("re-encoded")):
+        again = generator.preprocess_character_image(images[0])
+    assert str(again["data_uri"]) == str(first["data_uri"])
+    assert again["target_ratio"]["name"] == first["target_ratio"]["name"] == "3:4"
+
+    # A different ratio is a different entry; a modified source misses
+    fixed = {"name": "16:9", **generator.AVAILABLE_RATIOS["16:9"]}
+    assert generator.image_cache.get(images[0], fixed) is None
+    Image.new("RGB", (1000, 1401), (0, 0, 0)).save(images[0])
+    assert generator.image_cache.get(images[0], None, generator.AVAILABLE_RATIOS) is None
+
+    # LRU eviction under the size cap keeps the most recently used entries
+    entry_size = max(path.stat().st_size for path in (work_dir / "cache").glob("*.img"))
+    generator.image_cache.max_bytes = int(entry_size * 1.5)  # Room for one entry only
+    for path in images[1:]:
+        generator.preprocess_character_image(path)
+    assert len(list((work_dir / "cache").glob("*.img"))) == 1
+    assert generator.image_cache.get(images[2], None, generator.AVAILABLE_RATIOS) is not None
+    assert generator.image_cache.get(images[1], None, generator.AVAILABLE_RATIOS) is None
+
+    # Storing the same entry again replaces its bytes instead of adding to the total
+    cache = generator.image_cache
+    cache.max_bytes = entry_size * 100
+    before = cache._total_bytes
+    for _ in range(3):
+        cache.put(images[2], None, generator.AVAILABLE_RATIOS, {**cache.get(images[2], None, generator.AVAILABLE_RATIOS)})
+    assert cache._total_bytes == before == cache._scan_bytes()
+
+    # An image already at the target size is sent byte-for-byte
+    exact = work_dir / "exact.jpg"
+    Image.new("RGB", (1280, 720), (10, 20, 30)).save(exact, quality=80)
+    with mock.patch("PIL.Image.Image.save", side_effect=AssertionError("re-encoded")):
+        result = generator.preprocess_character_image(str(exact), fixed)
+    assert str(result["data_uri"]) == str(InlineData.from_file(exact, "image/jpeg"))
+    print("✅ Cache hits skip image work, LRU cap enforced, exact sizes pass through")
+
+
+def test_duplicate_index_walks_once():
+    """Duplicate checks for a whole folder cost one catalog refresh of the downloads tree"""
+    print("Testing once-per-run duplicate index...")
+    from unittest import mock
+
+    downloads = Path(tempfile.mkdtemp())
+    (downloads / "batch" / "old").mkdir(parents=True)
+    (downloads / "batch" / "old" / "genx CIRILA MUNYON self_act_two_9x16.mp4").write_bytes(b"")
+    (downloads / "JOHANNA SMITH.mov").write_bytes(b"")
+    (downloads / "notes.txt").write_bytes(b"")
+    images = Path(tempfile.mkdtemp())
+    for name in ("genx CIRILA MUNYON self.jpg", "genx ANNA SMITH self.jpg", "genx NEW PERSON self.jpg"):
+        (images / name).write_bytes(b"")
+
+    generator = RunwayActTwoBatchGenerator("key_test", verbose=False)
+    generator.downloads_folder = str(downloads)
+    generator.video_catalog = VideoCatalog(Path(tempfile.mkdtemp()) / "catalog.sqlite3")
+    walks = []
+    real_refresh = generator.video_catalog.refresh
+
+    def counting_refresh(root):
+        walks.append(root)
+        return real_refresh(root)
+
+    with mock.patch.object(generator.video_catalog, "refresh", counting_refresh):
+        found = [Path(p).name for p in generator.get_genx_image_files(str(images))]
+        assert sorted(found) == ["genx ANNA SMITH self.jpg", "genx NEW PERSON self.jpg"]
+        assert generator.check_existing_videos("cirila munyon")
+        assert not generator.check_existing_videos("ANNA")  # Whole tokens, not substrings of JOHANNA
+
+        # Videos downloaded during the run are seen without another walk
+        (downloads / "genx NEW PERSON self_act_two_16x9.mp4").write_bytes(b"")
+        generator._record_output_video(downloads / "genx NEW PERSON self_act_two_16x9.mp4")
+        assert generator.check_existing_videos("NEW PERSON")
+    assert len(walks) == 1
+    print("✅ One walk per run, token lookups afterwards")
+
+
+def test_incremental_video_catalog():
+    """The catalog persists, rescans only changed folders and remembers source images"""
+    print("Testing persistent incremental video catalog...")
+    import shutil
+
+    root = Path(tempfile.mkdtemp())
+    for sub in ("a/x", "a/y", "b"):
+        (root / sub).mkdir(parents=True)
+        (root / sub / f"genx {sub.replace('/', ' ')} self_act_two_9x16.mp4").write_bytes(b"v")
+    db_path = Path(tempfile.mkdtemp()) / "catalog.sqlite3"
+
+    catalog = VideoCatalog(db_path)
+    catalog.RACY_WINDOW_NS = 0  # Test folders are brand new
+    assert catalog.refresh(str(root)) == {"checked": 5, "rescanned": 5}
+    assert catalog.refresh(str(root)) == {"checked": 5, "rescanned": 0}
+
+    (root / "a" / "y" / "genx NEW ONE self_act_two_16x9.mp4").write_bytes(b"v")
+    assert catalog.refresh(str(root))["rescanned"] == 1
+    shutil.rmtree(root / "b")
+    catalog.refresh(str(root))
+    catalog.record(str(root / "a" / "y" / "genx NEW ONE self_act_two_16x9.mp4"), str(root / "genx NEW ONE self.jpg"))
+    catalog.close()
+
+    reopened = VideoCatalog(db_path)
+    paths = sorted(Path(path).name for _, path, _ in reopened.videos_under(str(root)))
+    assert paths == ["genx NEW ONE self_act_two_16x9.mp4", "genx a x self_act_two_9x16.mp4",
+                     "genx a y self_act_two_9x16.mp4"]
+    assert [Path(p).name for p in reopened.videos_for_source(str(root / "genx NEW ONE self.jpg"))] == \
+        ["genx NEW ONE self_act_two_16x9.mp4"]
+
+    generator = RunwayActTwoBatchGenerator("key_test", verbose=False)
+    generator.video_catalog = reopened
+    generator.downloads_folder = str(root)
+    assert generator.check_existing_videos("NEW ONE")
+    assert not generator.check_existing_videos("b")
+
+    # A slow listing does not hold the catalog lock, so downloads can still be recorded
+    (root / "a" / "x" / "genx SLOW self_act_two_9x16.mp4").write_bytes(b"v")
+    listing, release = threading.Event(), threading.Event()
+    real_list = VideoCatalog._list
+
+    def slow_list(directory):
+        listing.set()
+        release.wait(5)
+        return real_list(directory)
+
+    reopened._list = slow_list
+    refresher = threading.Thread(target=reopened.refresh, args=(str(root),))
+    refresher.start()
+    assert listing.wait(5)
+    recorded = threading.Thread(target=reopened.record, args=(str(root / "a" / "x" / "genx SLOW self_act_two_9x16.mp4"),))
+    recorded.start()
+    recorded.join(2)
+    assert not recorded.is_alive()
+    release.set()
+    refresher.join(5)
+    assert any(path.endswith("genx SLOW self_act_two_9x16.mp4") for _, path, _ in reopened.videos_under(str(root)))
+    print("✅ Only changed folders rescanned; catalog survives across runs")
+
+
+def test_normalized_inverted_index():
+    """Lookups match casefolded, accent-free tokens and scan only the rarest posting list"""
+    print("Testing normalized token inverted index...")
+    from unittest import mock
+    from video_catalog import VideoIndex, name_tokens
+
+    assert name_tokens("genx JOSÉ Núñez-STRAßE self") == ["genx", "jose", "nunez", "strasse", "self"]
+    assert name_tokens("Ｚｏë_ÅSA") == ["zoe", "asa"]
+
+    root = Path(tempfile.mkdtemp())
+    for i in range(300):
+        (root / f"genx PERSON{i} self_act_two_9x16.mp4").write_bytes(b"")
+    (root / "genx José NÚÑEZ self_act_two_16x9.mp4").write_bytes(b"")
+    (root / "genx ANNA JOHANNA self_act_two_16x9.mp4").write_bytes(b"")
+    index = VideoIndex(str(root))
+
+    assert Path(index.find("jose nunez")).name == "genx José NÚÑEZ self_act_two_16x9.mp4"
+    assert index.find("JOSÉ NÚÑEZ") and index.find("Jose Nunez")
+    assert index.find("JOHANNA ANNA") and not index.find("ANN")
+    assert index.find("PERSON7") and not index.find("PERSON7 NUNEZ")
+
+    # "genx" and "self" are in every video, but only the rare token's list is walked
+    with mock.patch.object(VideoIndex, "_contains", wraps=VideoIndex._contains) as contains:
+        assert index.find("genx PERSON42 self")
+    assert contains.call_count == 2
+    print("✅ Unicode-normalized tokens, smallest-first intersection")
+
+
+def test_shared_filename_matcher():
+    """Generator, UI counters and folder selector agree on which files match"""
+    print("Testing shared filename matcher...")
+    from unittest import mock
+    from filename_matcher import FilenameMatcher, get_matcher
+    from gui_selectors import GUISelectors
+    from runway_automation_ui import RunwayAutomationUI
+
+    names = ["ANNA genx self.jpg", "BOB_genx.PNG", "carl genxy.jpg", "genx.tif", "dana-selfie.jpg",
+             "dana-selfies.jpg", "selfie-eve.jpg", "fay_selfie.webp", "genx notes.txt"]
+    root = Path(tempfile.mkdtemp())
+    folder = root / "people"
+    folder.mkdir()
+    for name in names:
+        (folder / name).write_bytes(b"")
+
+    expected = {
+        ("genx", False): {"ANNA genx self.jpg", "BOB_genx.PNG", "carl genxy.jpg", "genx.tif"},
+        ("genx", True): {"ANNA genx self.jpg", "BOB_genx.PNG", "genx.tif"},
+        ("-selfie", True): {"dana-selfie.jpg"},
+        ("selfie", True): {"dana-selfie.jpg", "selfie-eve.jpg", "fay_selfie.webp"},
+    }
+
+    generator = FakeRenderGenerator()
+    ui = RunwayAutomationUI.__new__(RunwayAutomationUI)
+    selector = GUISelectors()
+    with mock.patch.object(RunwayActTwoBatchGenerator, "check_existing_videos", return_value=None):
+        for (pattern, exact), matched in expected.items():
+            ui.config = selector.config = {"image_search_pattern": pattern, "exact_match": exact}
+            from_generator = {Path(p).name for p in generator.get_genx_image_files(str(folder), pattern, exact)}
+            from_ui = {Path(p).name for p in ui.get_genx_files_in_folder(str(folder))}
+            from_selector = {n for n in names if n != "genx notes.txt" and selector._matches_pattern(n, pattern, exact)}
+            assert from_generator == from_ui == from_selector == matched, (pattern, exact, from_generator)
+            assert ui.count_genx_files(str(root)) == len(matched)
+
+    # Compiled once per setting and shared by every caller
+    assert FilenameMatcher.from_config({"image_search_pattern": "genx", "exact_match": True}) is get_matcher("genx", True)
+    print("✅ One compiled matcher, identical results on every scan path")
+
+
+def test_multi_pattern_matcher():
+    """Several include/exclude patterns classify each file in one search"""
+    print("Testing multi-pattern filename matching...")
+    from unittest import mock
+    from filename_matcher import FilenameMatcher
+
+    config = {"image_search_pattern": ["genx", "-selfie", "_portrait"], "exact_match": True,
+              "exclude_patterns": "draft, old"}
+    matcher = FilenameMatcher.from_config(config)
+    assert matcher.match("ANNA genx self.jpg") == "genx"
+    assert matcher.match("bob-selfie.png") == "-selfie"
+    assert matcher.match("carl_portrait.webp") == "_portrait"
+    assert matcher.match("dana_portraits.jpg") is None
+    assert matcher.match("eve genx draft.jpg") is None
+    assert matcher.match("fay-selfie old.jpg") is None
+    assert FilenameMatcher.from_config(dict(config, image_search_pattern="genx, -selfie, _portrait")) is matcher
+
+    # One compiled regex search per file, however many patterns there are
+    with mock.patch.object(matcher, "_regex", wraps=matcher._regex) as regex:
+        matcher.match("bob-selfie.png")
+    assert regex.search.call_count == 1
+
+    folder = Path(tempfile.mkdtemp())
+    for name in ("ANNA genx self.jpg", "bob-selfie.png", "carl_portrait.webp", "eve genx draft.jpg", "zed.jpg"):
+        (folder / name).write_bytes(b"")
+    generator = FakeRenderGenerator()
+    with mock.patch.object(RunwayActTwoBatchGenerator, "check_existing_videos", return_value=None):
+        found = generator.get_genx_image_files(str(folder), config["image_search_pattern"], True, config["exclude_patterns"])
+    assert sorted(Path(p).name for p in found) == ["ANNA genx self.jpg", "bob-selfie.png", "carl_portrait.webp"]
+    print("✅ Combined include/exclude patterns, matching pattern reported")
+
+
+def test_job_manifest_single_pass():
+    """One discovery pass lists each folder and checks each image for duplicates exactly once"""
+    print("Testing scan-once job manifest...")
+    from unittest import mock
+
+    downloads = Path(tempfile.mkdtemp())
+    (downloads / "genx CIRILA MUNYON self_act_two_9x16.mp4").write_bytes(b"")
+    root = Path(tempfile.mkdtemp())
+    layout = {
+        "b_folder": ["genx ZOE KIM self.jpg", "genx CIRILA MUNYON self.png", "notes.txt"],
+        "a_folder": ["genx BEN LEE self.jpg", "genx AMY LEE self.jpg", "portrait.jpg"],
+        "empty": [],
+    }
+    for folder, names in layout.items():
+        (root / folder).mkdir()
+        for name in names:
+            (root / folder / name).write_bytes(b"")
+
+    generator = RunwayActTwoBatchGenerator("key_test", verbose=False)
+    generator.downloads_folder = str(downloads)
+    generator.video_catalog = VideoCatalog(Path(tempfile.mkdtemp()) / "catalog.sqlite3")
+    with mock.patch.object(generator, "scan_folder", wraps=generator.scan_folder) as scans, \
+            mock.patch.object(generator, "check_existing_videos", wraps=generator.check_existing_videos) as checks:
+        manifest = generator.build_job_manifest(str(root))
+    assert scans.call_count == 3 and checks.call_count == 4
+
+    assert [Path(entry.image_path).name for entry in manifest.jobs] == [
+        "genx AMY LEE self.jpg", "genx BEN LEE self.jpg", "genx ZOE KIM self.jpg"]
+    assert (manifest.total_matched, manifest.total_new, manifest.duplicates) == (4, 3, 1)
+    assert [(Path(s.folder).name, s.matched, s.new) for s in manifest.folders] == [
+        ("a_folder", 2, 2), ("b_folder", 2, 1), ("empty", 0, 0)]
+    assert manifest.folder_summary(str(root / "b_folder")).duplicates == 1
+    assert [entry.person_name for entry in manifest.jobs_in(str(root / "a_folder"))] == ["AMY LEE", "BEN LEE"]
+
+    out = str(root / "out")
+    assert all(folder == out for _, folder in manifest.job_pairs(out))
+    assert [folder for _, folder in manifest.job_pairs()][0] == str(root / "a_folder")
+    print("✅ Counts, totals and job order come from one pass")
+
+
+def test_work_queue_next_folders():
+    """The "Next" panel reads upcoming folders from a cursor, not from the filesystem"""
+    print("Testing work queue cursor...")
+    from unittest import mock
+    from job_manifest import JobManifest, ManifestEntry, WorkQueue
+
+    layout = [("/in/a", ["a1", "a2"]), ("/in/b", ["b1"]), ("/in/c", []), ("/in/d", ["d1", "d2"]), ("/in/e", ["e1"])]
+    entries = [ManifestEntry(f"{folder}/{name}.jpg", folder, "genx", None, False)
+               for folder, names in layout for name in names]
+    manifest = JobManifest("/in", [folder for folder, _ in layout], entries)
+
+    with mock.patch("os.scandir", side_effect=AssertionError("filesystem touched")):
+        queue = WorkQueue(manifest)
+        assert queue.upcoming_folders(3) == (["a", "b", "d"], 4)
+        queue.advance("/in/a/a1.jpg")
+        assert queue.upcoming_folders(3) == (["a", "b", "d"], 4)  # a2 still to come
+        queue.advance("/in/a/a2.jpg")
+        assert queue.upcoming_folders(3) == (["b", "d", "e"], 3)
+        queue.advance("/in/d/d1.jpg")
+        queue.advance("/in/b/b1.jpg")  # Cursor never moves back
+        assert queue.current.image_path == "/in/d/d1.jpg" and queue.remaining == 2
+        assert queue.upcoming_folders(3) == (["d", "e"], 2)
+        queue.advance("/in/e/e1.jpg")
+        assert queue.upcoming_folders(3) == ([], 0) and queue.remaining == 0
+    print("✅ Constant-time next-folder lookups")
+
+
+def test_streaming_job_discovery():
+    """The first job is handed out while later folders are still being scanned"""
+    print("Testing streaming job discovery...")
+    from unittest import mock
+    from job_manifest import WorkQueue
+
+    root = Path(tempfile.mkdtemp())
+    for folder in ("a", "b", "c"):
+        (root / folder).mkdir()
+        for person in ("ONE", "TWO"):
+            (root / folder / f"genx {folder.upper()} {person} self.jpg").write_bytes(b"")
+
+    generator = RunwayActTwoBatchGenerator("key_test", verbose=False)
+    first_job_taken = threading.Event()
+    real_scan = generator.scan_folder
+
+    def gated_scan(folder, matcher, files=None):
+        if not folder.endswith("a"):
+            assert first_job_taken.wait(5), "discovery blocked the first submission"
+        return real_scan(folder, matcher, files)
+
+    totals = []
+    with mock.patch.object(generator, "scan_folder", gated_scan), \
+            mock.patch.object(RunwayActTwoBatchGenerator, "check_existing_videos", return_value=False):
+        discovery = generator.discover_jobs(str(root))
+        queue = WorkQueue()
+        discovery.add_listener(queue.append)
+        discovery.add_listener(lambda entry: totals.append(discovery.found))
+        jobs = discovery.start().job_pairs(str(root / "out"))
+
+        first_image, output = next(jobs)
+        assert Path(first_image).name == "genx A ONE self.jpg" and output == str(root / "out")
+        assert not discovery.done
+        first_job_taken.set()
+        rest = [Path(image).name for image, _ in jobs]
+
+    assert len(rest) == 5 and discovery.done
+    assert totals == [1, 2, 3, 4, 5, 6, 6]  # Refined per image, then once more when finished
+    assert len(queue.jobs) == 6 and queue.upcoming_folders(3) == (["a", "b", "c"], 3)
+    manifest = discovery.manifest()
+    assert manifest.total_new == 6 and [s.new for s in manifest.folders] == [2, 2, 2]
+    print("✅ Jobs stream out as they are found, totals refine as the scan runs")
+
+
+def test_parallel_tree_walker():
+    """Parallel scandir walk matches os.walk, honouring depth, excludes and symlink policy"""
+    print("Testing parallel tree walker...")
+    import os
+    from tree_walker import TreeWalker
+
+    root = Path(tempfile.mkdtemp())
+    for folder in ("a", "a/deep", "a/deep/deeper", "b", ".cache", "c/archive"):
+        (root / folder).mkdir(parents=True, exist_ok=True)
+        for name in ("one.jpg", "two.png"):
+            (root / folder / name).write_bytes(b"")
+    (root / "top.jpg").write_bytes(b"")
+    os.symlink(root, root / "b" / "loop")  # Cycle back to the root
+
+    expected = {os.path.join(dirpath, name) for dirpath, _, names in os.walk(root) for name in names}
+    for workers in (1, 8):
+        walker = TreeWalker(follow_symlinks=False, workers=workers)
+        assert {entry.path for entry in walker.files(str(root))} == expected
+
+    # Following symlinks terminates despite the cycle and lists each real folder once
+    followed = [directory for directory, _, _, _ in TreeWalker(follow_symlinks=True).walk(str(root))]
+    assert len(followed) == len(set(os.path.realpath(d) for d in followed)) == 8
+
+    # Links leaving the tree are followed once, however many point at the same target,
+    # and plain folders are never stat'ed for cycle detection
+    outside = Path(tempfile.mkdtemp())
+    (outside / "shared").mkdir()
+    (outside / "shared" / "three.jpg").write_bytes(b"")
+    os.symlink(outside / "shared", root / "a" / "link_one")
+    os.symlink(outside / "shared", root / "c" / "link_two")
+    os.symlink(outside / "shared", outside / "shared" / "self")
+    real_stat, stats = os.stat, []
+    os.stat = lambda path, *args, **kwargs: (stats.append(str(path)), real_stat(path, *args, **kwargs))[1]
+    try:
+        followed = [directory for directory, _, _, _ in TreeWalker(follow_symlinks=True, workers=1).walk(str(root))]
+    finally:
+        os.stat = real_stat
+    assert len(followed) == 9
+    assert not any(os.path.join("a", "deep") in path for path in stats)
+
+    depth_one = TreeWalker(follow_symlinks=False).files(str(root), max_depth=1, min_depth=1)
+    assert len(list(depth_one)) == 6  # a, b and .cache - not the root, a/deep or c/archive
+
+    walker = TreeWalker(exclude=[".*", "*/c/archive"], follow_symlinks=False)
+    found = {os.path.relpath(entry.path, root) for entry in walker.files(str(root))}
+    assert not any(path.startswith((".cache", os.path.join("c", "archive"))) for path in found)
+    assert os.path.join("a", "deep", "deeper", "one.jpg") in found
+
+    folders = [str(root / name) for name in ("b", "a", "c")]
+    assert [directory for directory, _, _ in walker.scan_many(folders)] == folders
+
+    # Windows junctions list as plain directories; they are still not followed
+    import tree_walker
+    (root / "b" / "junction").mkdir()
+    (root / "b" / "junction" / "four.jpg").write_bytes(b"")
+    real_is_link = tree_walker.is_link
+    tree_walker.is_link = lambda entry: entry.name == "junction" or real_is_link(entry)
+    try:
+        found = {entry.name for entry in TreeWalker(follow_symlinks=False).files(str(root))}
+    finally:
+        tree_walker.is_link = real_is_link
+    assert "four.jpg" not in found
+    print("✅ Parallel walk with depth, exclude and symlink policies")
+
+
+def test_session_scan_cache():
+    """Repeat walks reuse listings until a directory's mtime changes"""
+    print("Testing session scan cache...")
+    import os
+    from tree_walker import ScanCache, TreeWalker
+
+    root = Path(tempfile.mkdtemp())
+    for folder in ("a", "b", "b/inner"):
+        (root / folder).mkdir()
+        (root / folder / "genx X Y self.jpg").write_bytes(b"")
+    cache = ScanCache()
+    cache.RACY_WINDOW_NS = 0  # The folders were just created
+
+    selector_walk = TreeWalker(cache=cache)
+    assert len(list(selector_walk.files(str(root)))) == 3
+    assert (cache.hits, cache.misses) == (0, 4)
+
+    # The dry run and processing (same settings) reuse every listing
+    dry_run_walk = TreeWalker(cache=cache, workers=1)
+    assert len(list(dry_run_walk.files(str(root)))) == 3
+    assert [d for d, _, _ in dry_run_walk.scan_many([str(root / "a"), str(root / "b")])]
+    assert (cache.hits, cache.misses) == (6, 4)
+
+    # Adding a file changes only that folder's mtime, so only it is listed again
+    (root / "b" / "inner" / "genx NEW ONE self.jpg").write_bytes(b"")
+    stat = os.stat(root / "b" / "inner")
+    os.utime(root / "b" / "inner", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert len(list(dry_run_walk.files(str(root)))) == 4
+    assert (cache.hits, cache.misses) == (9, 5)
+
+    # Different exclude settings never see listings filtered for other settings
+    assert len(list(TreeWalker(exclude=["inner"], cache=cache).files(str(root)))) == 2
+
+    # Cached listings hold name/type tuples, not DirEntry objects, and are rebuilt on a hit
+    assert all(isinstance(item, tuple) for _, listing in cache._listings.values() for item in listing)
+    cached_files = list(dry_run_walk.files(str(root)))
+    assert {entry.name for entry in cached_files} >= {"genx NEW ONE self.jpg"}
+    assert all(entry.stat().st_size == 0 for entry in cached_files)
+
+    # The cache is bounded, and a new input root drops the previous root's listings
+    small = ScanCache(max_directories=2)
+    small.RACY_WINDOW_NS = 0
+    list(TreeWalker(cache=small).files(str(root)))
+    assert len(small) == 2
+    cache.use_root(str(root))
+    assert len(cache) > 0
+    cache.use_root(str(root / "a"))
+    assert len(cache) == 0
+    print("✅ Listings reused across walks, changed folders rescanned")
+
+
+def test_columnar_file_manifest():
+    """Dry run file table stores rows in packed columns"""
+    print("Testing columnar file manifest...")
+    import os
+    from file_manifest import FileManifest
+
+    manifest = FileManifest(["genx", "-selfie"])
+    manifest.add("b", "zed genx.jpg", 300, 1.5, "genx")
+    manifest.add("a", "anna-selfie.png", 100, 2.5, "-selfie")
+    manifest.add("a", "notes.jpg")
+    manifest.add(FileManifest.ROOT, "ärger genx.jpg", 50, 3.0, "genx")
+    manifest.add("a", "aaa genx.jpg", 20, 4.0, "genx")
+
+    assert len(manifest) == 5 and manifest.folders == ["b", "a", FileManifest.ROOT]
+    matching = manifest.sorted_rows(manifest.matching())
+    assert [manifest.row(row).path for row in matching] == [
+        "ärger genx.jpg", os.path.join("a", "aaa genx.jpg"), os.path.join("a", "anna-selfie.png"),
+        os.path.join("b", "zed genx.jpg")]
+    assert [row.name for row in manifest.rows(manifest.filtered())] == ["notes.jpg"]
+    assert manifest.first_rows(2) == list(manifest.sorted_rows()[:2])
+    assert manifest.row(1).pattern == "-selfie" and manifest.row(2).pattern is None
+    assert manifest.pattern_counts() == {"genx": 3, "-selfie": 1}
+    assert manifest.total_size(matching) == manifest.total_size() == 470
+    assert [tuple(stats) for stats in manifest.folder_stats(matching)] == [
+        (FileManifest.ROOT, 1, 50), ("a", 2, 120), ("b", 1, 300)]
+
+    # A real subfolder named 'root' is not merged with the scanned root
+    manifest.add("root", "genx Z Y self.jpg", 7, 5.0, "genx")
+    last = manifest.row(len(manifest) - 1)
+    assert last.path == os.path.join("root", "genx Z Y self.jpg") and last.folder_label == "root" + os.sep
+    assert manifest.row(3).folder_label == "root" and manifest.row(3).path == "ärger genx.jpg"
+    assert [(stats.folder, stats.files) for stats in manifest.folder_stats(manifest.matching())] == [
+        (FileManifest.ROOT, 1), ("a", 2), ("b", 1), ("root", 1)]
+
+    # Fixed cost per row stays well under a dict per file
+    bulk = FileManifest(["genx"])
+    for index in range(10000):
+        bulk.add(f"folder {index % 50}", f"{index:06d} genx.jpg", index, 0.0, "genx")
+    assert bulk.nbytes / len(bulk) < 40
+    print(f"✅ Columnar manifest: {bulk.nbytes / len(bulk):.1f} bytes per row")
+
+
+def test_dry_run_report_export():
+    """Dry run matches stream to JSONL/CSV and page without materializing all rows"""
+    print("Testing dry run report export...")
+    import csv
+    import os
+    from file_manifest import EXPORT_FIELDS, FileManifest
+
+    manifest = FileManifest(["genx"])
+    manifest.add("b", "zed genx.jpg", 300, 1700000000, "genx")
+    manifest.add("a", "notes.jpg")
+    manifest.add(FileManifest.ROOT, "ärger, \"genx\".jpg", 50, 1700000001, "genx")
+    rows = manifest.sorted_rows(manifest.matching())
+
+    out_dir = Path(tempfile.mkdtemp())
+    assert manifest.export(str(out_dir / "list.jsonl"), rows) == 2
+    lines = [json.loads(line) for line in (out_dir / "list.jsonl").read_text(encoding='utf-8').splitlines()]
+    assert lines[1] == {"path": os.path.join("b", "zed genx.jpg"), "folder": "b", "name": "zed genx.jpg",
+                        "size": 300, "mtime": 1700000000, "pattern": "genx"}
+    assert lines[0]["name"] == 'ärger, "genx".jpg' and lines[0]["folder"] == os.curdir
+
+    assert manifest.export(str(out_dir / "all.csv")) == 3
+    with open(out_dir / "all.csv", newline='', encoding='utf-8') as f:
+        records = list(csv.reader(f))
+    assert tuple(records[0]) == EXPORT_FIELDS
+    assert records[2][2] == "notes.jpg" and records[2][5] == "" and records[3][2] == 'ärger, "genx".jpg'
+
+    try:
+        manifest.export(str(out_dir / "list.txt"))
+        assert False, "Unknown formats are rejected"
+    except ValueError:
+        pass
+    assert sorted(os.listdir(out_dir)) == ["all.csv", "list.jsonl"]
+
+    # A page is a slice of row indexes; only its rows are materialized
+    assert [row.name for row in manifest.rows(rows[1:2])] == ["zed genx.jpg"]
+    print("✅ Dry run list exported as JSONL and CSV")
+
+
+def test_render_timeout_starts_when_running():
+    """Queue time does not count against the render timeout; CANCELLED ends polling"""
+    print("Testing render timeout after queueing...")
+    polls = {}
+    sequences = {
+        "throttled": ["THROTTLED"] * 6 + ["RUNNING", "RUNNING", "SUCCEEDED"],
+        "cancelled": ["PENDING", "CANCELLED"],
+        "queued_forever": ["PENDING"] * 1000,
+        "slow_render": ["RUNNING"] * 1000,
+    }
+
+    def check_status(task_id):
+        polls[task_id] = polls.get(task_id, 0) + 1
+        status = sequences[task_id][min(polls[task_id], len(sequences[task_id])) - 1]
+        return {"status": status, "output": ["https://cdn/x.mp4"]}
+
+    def schedule():
+        # Render timeout 0.1s; a task may wait 1s in the queue
+        return PollSchedule(timeout=0.1, interval=0.02, queue_timeout=1.0)
+
+    poller = TaskPoller(check_status, max_requests_per_second=0)
+    started = []
+    throttled = poller.watch("throttled", schedule(), on_running=lambda: started.append("throttled"))
+    cancelled = poller.watch("cancelled", schedule())
+    queued_forever = poller.watch("queued_forever", schedule())
+    slow_render = poller.watch("slow_render", schedule())
+
+    # Six queued polls (~0.12s) exceed the render timeout, yet the task completes
+    assert throttled.result(timeout=5)["status"] == "SUCCEEDED"
+    assert started == ["throttled"]
+    assert cancelled.result(timeout=5) is None and polls["cancelled"] == 2
+    assert slow_render.result(timeout=5) is None and polls["slow_render"] < 20
+    assert queued_forever.result(timeout=5) is None and polls["queued_forever"] >= 40
+    print("✅ Throttled task finished, cancelled and stuck tasks released")
+
+
+class MockStatusAdapter(BaseAdapter):
+    """Serves /tasks/<id> with a scripted sequence of HTTP status codes"""
+
+    def __init__(self, codes):
+        super().__init__()
+        self.codes = list(codes)
+
+    def send(self, request, timeout=None, **kwargs):
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        response.status_code = self.codes.pop(0) if self.codes else 200
+        if response.status_code == 429:
+            response.headers["Retry-After"] = "0"
+        body = {"status": "SUCCEEDED", "output": ["https://cdn/x.mp4"]} if response.status_code == 200 else {}
+        response._content = json.dumps(body).encode()
+        return response
+
+    def close(self):
+        pass
+
+
+def test_transient_status_errors_retried():
+    """429 and 5xx status checks are retried until the deadline; 4xx gives up"""
+    print("Testing transient status check errors...")
+    generator = RunwayActTwoBatchGenerator("key_test", verbose=False)
+    generator.http = RunwayHttpClient(transport=MockStatusAdapter([429, 503, 500, 200, 404, 401]))
+    assert generator.check_task_status("t") == {"status": "UNKNOWN", "retry_after": 0.0}
+    assert generator.check_task_status("t") == {"status": "UNKNOWN", "retry_after": None}
+    assert generator.check_task_status("t")["status"] == "UNKNOWN"
+    assert generator.check_task_status("t")["status"] == "SUCCEEDED"
+    assert generator.check_task_status("t") is None
+    assert generator.check_task_status("t") is None
+
+    # The poller keeps polling through transient errors, backing off between them
+    generator.http = RunwayHttpClient(transport=MockStatusAdapter([429, 503, 502]))
+    poll_times = []
+
+    def check_status(task_id):
+        poll_times.append(time.monotonic())
+        return generator.check_task_status(task_id)
+
+    poller = TaskPoller(check_status, max_requests_per_second=0)
+    future = poller.watch("t", PollSchedule(timeout=5, interval=0.01, min_interval=0.02, max_interval=1))
+    assert future.result(timeout=5)["status"] == "SUCCEEDED"
+    gaps = [later - earlier for earlier, later in zip(poll_times, poll_times[1:])]
+    assert len(poll_times) == 4 and gaps[1] >= 0.04 and gaps[2] >= 0.08  # Doubles per failure
+
+    # Until the task's deadline
+    generator.http = RunwayHttpClient(transport=MockStatusAdapter([503] * 1000))
+    future = poller.watch("t", PollSchedule(timeout=0.2, interval=0.01, min_interval=0.01, max_interval=0.05))
+    assert future.result(timeout=5) is None
+    print("✅ Rate limits and server errors retried, missing tasks released")
+
+
+def run_all_tests():
+    """Run all tests"""
+    tests = [
+        test_generate_batch_bounded_window,
+        test_generate_batch_sequential_default,
+        test_generate_batch_early_stop,
+        test_task_poller_shared_heap,
+        test_adaptive_poll_schedule,
+        test_http_client_transport_hook,
+        test_streaming_resumable_download,
+        test_output_paths_unique_per_session,
+        test_driver_video_uploaded_once,
+        test_concurrent_reference_rejections_upload_once,
+        test_driver_video_cache_across_instances,
+        test_driver_cache_shared_across_processes,
+        test_streaming_json_body,
+        test_generation_template_reused_per_batch,
+        test_in_memory_image_preprocessing,
+        test_single_decode_preprocessing,
+        test_process_pool_preprocessing_pipeline,
+        test_preprocessed_image_cache,
+        test_duplicate_index_walks_once,
+        test_incremental_video_catalog,
+        test_normalized_inverted_index,
+        test_shared_filename_matcher,
+        test_multi_pattern_matcher,
+        test_job_manifest_single_pass,
+        test_work_queue_next_folders,
+        test_streaming_job_discovery,
+        test_parallel_tree_walker,
+        test_session_scan_cache,
+        test_columnar_file_manifest,
+        test_dry_run_report_export,
+        test_render_timeout_starts_when_running,
+        test_transient_status_errors_retried,
+    ]
+    failures = 0
+    for test in tests:
+        try:
+            test()
+        except AssertionError as e:
+            failures += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\nTotal: {len(tests) - failures}/{len(tests)} passed")
+    return failures == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)